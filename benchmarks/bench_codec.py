@@ -0,0 +1,63 @@
+# benchmarks/bench_codec.py
+"""
+Generated to_dict/from_dict versus ``dataclasses.asdict`` on a large farm:
+
+    python -m benchmarks.bench_codec --herd 100000
+
+``asdict`` cannot deep-copy the shared read-only genotypes, so its armadillo
+column runs on the pre-slots layout (bench_memory.PlainArmadillo).
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import asdict
+from typing import Callable, List
+
+from benchmarks.bench_memory import PlainArmadillo, _records
+from models.armadillo import Armadillo
+from models.breeding import BreedingJob
+from models.habitat import Habitat, Occupancy
+
+
+def _best(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serializer throughput on a large farm.")
+    parser.add_argument("--herd", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    records = list(_records(args.herd))
+    dillos = [Armadillo.from_dict(d) for d in records]
+    plain = [PlainArmadillo(**d) for d in records]
+    habitats = [
+        Habitat(id=f"h{i}", name=f"Habitat {i}", level=1, capacity=6,
+                occupants=Occupancy(r["id"] for r in records[i * 6:(i + 1) * 6]))
+        for i in range(args.herd // 6)
+    ]
+    jobs = [BreedingJob(f"job_{i}", "d0", "d1", 0.0, 60, "incubating") for i in range(args.herd // 10)]
+
+    rows: List = [
+        ("armadillos", lambda: [asdict(a) for a in plain], lambda: [a.to_dict() for a in dillos]),
+        ("habitats", lambda: [asdict(h) for h in habitats], lambda: [h.to_dict() for h in habitats]),
+        ("breeding jobs", lambda: [asdict(j) for j in jobs], lambda: [j.to_dict() for j in jobs]),
+    ]
+    print(f"{'encode':<14} {'asdict ms':>10} {'codec ms':>10} {'speedup':>8}")
+    for name, slow, fast in rows:
+        a, b = _best(slow, args.repeat), _best(fast, args.repeat)
+        print(f"{name:<14} {a * 1000:>10.1f} {b * 1000:>10.1f} {a / b:>7.1f}x")
+    dec = _best(lambda: [Armadillo.from_dict(d) for d in records], args.repeat)
+    print(f"decode {args.herd} armadillos: {dec * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
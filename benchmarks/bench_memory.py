@@ -0,0 +1,77 @@
+# benchmarks/bench_memory.py
+"""
+Bytes per armadillo for a loaded herd, measured with tracemalloc:
+
+    python -m benchmarks.bench_memory --sizes 10000 100000 1000000
+
+Records go through JSON like a save file, so every string is a fresh object
+as it would be after load. ``plain`` is the pre-slots layout (a regular
+dataclass with a dict per animal and no interning) for comparison.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import random
+import tracemalloc
+from dataclasses import make_dataclass
+from typing import Callable, Dict, Iterator, List
+
+from models.armadillo import Armadillo
+
+PlainArmadillo = make_dataclass("PlainArmadillo", [
+    "id", "name", "sex", "age_days", "hunger", "happiness", "genes", "color", "is_baby", "is_adult",
+])
+
+GENOTYPES = (("AA", "Brown"), ("Aa", "Brown"), ("aa", "Albino"), ("AB", "Blue"), ("BB", "Blue"))
+CHUNK = 10_000
+
+
+def _records(n: int, seed: int = 7) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    for start in range(0, n, CHUNK):
+        chunk = []
+        for i in range(start, min(n, start + CHUNK)):
+            genes, color = rng.choice(GENOTYPES)
+            adult = rng.random() < 0.7
+            chunk.append({
+                "id": f"dillo_{i}", "name": f"Dillo {i}", "sex": rng.choice("MF"),
+                "age_days": rng.randint(0, 60), "hunger": rng.randint(0, 100),
+                "happiness": rng.randint(0, 100), "genes": {"color": genes}, "color": color,
+                "is_baby": not adult, "is_adult": adult,
+            })
+        yield from json.loads(json.dumps(chunk))
+
+
+def _plain(d: Dict):
+    return PlainArmadillo(**d)
+
+
+def measure(build: Callable[[Dict], object], n: int) -> float:
+    """Retained bytes per animal for ``n`` animals built with ``build``."""
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    herd: List[object] = [build(d) for d in _records(n)]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del herd
+    return used / n
+
+
+def main(argv=None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Memory per armadillo by herd size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args(argv)
+
+    print(f"{'herd':>10} {'plain B/dillo':>14} {'slots B/dillo':>14} {'saved':>7}")
+    for n in args.sizes:
+        plain = measure(_plain, n)
+        slots = measure(Armadillo.from_dict, n)
+        print(f"{n:>10} {plain:>14.1f} {slots:>14.1f} {1 - slots / plain:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_save.py
+"""
+Binary save container (schema 2) versus the ujson save path:
+
+    python -m benchmarks.bench_save --herd 100000
+
+Reports file size, full save/load time, and a cold-start style query
+(mean hunger) that the binary file answers from one mmap'd column. The
+binary file is smaller and wins that query; a full save is slower than
+ujson's and a full load about even, since both still build every record
+in Python.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+import ujson
+
+from benchmarks.bench_codec import _best
+from benchmarks.bench_memory import _records
+from services import binfmt
+
+
+def _farm(herd: int) -> Dict:
+    records = list(_records(herd))
+    return {
+        "coins": 1000,
+        "inventory": {"food": 3, "toy": 1},
+        "armadillos": records,
+        "habitats": [
+            {"id": f"h{i}", "name": f"Habitat {i}", "level": 1, "capacity": 6,
+             "occupants": [r["id"] for r in records[i * 6:(i + 1) * 6]]}
+            for i in range(herd // 6)
+        ],
+        "breeding_queue": [],
+        "dex_colors": ["Brown", "Albino", "Blue"],
+        "selected_id": None,
+        "meta": {},
+    }
+
+
+def _mean_hunger(path: str) -> float:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with binfmt.SaveReader(mm) as r:
+            return sum(r.column("hunger")) / max(1, r.rows)
+
+
+def main(argv=None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Save/load cost: ujson vs binary container.")
+    parser.add_argument("--herd", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    farm = _farm(args.herd)
+    text = ujson.dumps(farm)
+    blob = binfmt.dumps(farm)
+    assert binfmt.loads(blob) == ujson.loads(text)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "save.json")
+        bin_path = os.path.join(tmp, "save.bin")
+        Path(json_path).write_text(text, encoding="utf-8")
+        Path(bin_path).write_bytes(blob)
+
+        def load_json():
+            with open(json_path, "r", encoding="utf-8") as f:
+                return ujson.loads(f.read())
+
+        rows = [
+            ("save", lambda: ujson.dumps(farm), lambda: binfmt.dumps(farm)),
+            ("load", load_json, lambda: binfmt.read(bin_path)),
+            ("mean hunger", lambda: sum(a["hunger"] for a in load_json()["armadillos"]),
+             lambda: _mean_hunger(bin_path)),
+        ]
+        print(f"herd {args.herd}: json {len(text.encode('utf-8')) / 1e6:.2f} MB, "
+              f"binary {len(blob) / 1e6:.2f} MB")
+        print(f"{'':<12} {'ujson ms':>10} {'binary ms':>10} {'ujson/bin':>9}")
+        for name, with_json, with_binary in rows:
+            a, b = _best(with_json, args.repeat), _best(with_binary, args.repeat)
+            print(f"{name:<12} {a * 1000:>10.1f} {b * 1000:>10.1f} {a / b:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
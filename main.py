@@ -6,7 +6,7 @@ import json
 import logging
 import os
 import time
-from typing import Optional
+from typing import Any, Callable, List, Optional, Tuple
 
 from kivy import __version__ as kivy_version
 from kivy.clock import Clock
@@ -27,9 +27,17 @@ except Exception:  # KivyMD might be missing on desktop; still run.
     MDDialog = None  # type: ignore
     MDFlatButton = None  # type: ignore
 
+from settings import Settings
 from services.state import GameState
 from services.persistence import Persistence
 from services.economy import Economy
+from services import events as ev
+from services.events import ChangeEvent
+from services.profiler import TickProfiler
+from services.save_writer import SaveWriter
+from services.journal import Journal
+from services.stream_load import StreamingLoad
+from services.sim_thread import SimThread
 from ui.components import (
     show_toast,
     MDCompatibleScreenManager,
@@ -46,6 +54,8 @@ APP_TITLE = "Armadillo Farmer"
 ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
 ICON_PATH = os.path.join(ASSETS_DIR, "icon.png")
 KV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kv", "main.kv")
+# Set to a file path to record UI tick timings and dump them there on stop.
+PROFILE_PATH = os.environ.get("ARMADILLO_PROFILE")
 
 
 def _ensure_assets() -> None:
@@ -71,11 +81,28 @@ def _ensure_assets() -> None:
 class ArmadilloApp(MDApp):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.settings = Settings()
         self.state = GameState.instance()
-        self.persistence = Persistence()
+        self.persistence = Persistence(self.settings.SAVE_SCHEMA_VERSION)
+        self.save_writer = SaveWriter.from_settings(self.persistence.write, self.settings)
+        self.journal: Optional[Journal] = None
+        self._loader: Optional[StreamingLoad] = None  # set while the herd streams in
+        self.sim_thread: Optional[SimThread] = None
+        self._seen_version = 0
+        # State changes not yet shown; the first frame does a full refresh
+        self._ui_events: List[ChangeEvent] = [ev.state_reset()]
         self.sm: Optional[MDCompatibleScreenManager] = None
         self.topbar: Optional[TopBar] = None
         self._autosave_ev = None
+        self._hatch_ev = None
+        # Threaded, hatches are collected from the sim thread each frame;
+        # otherwise a single Clock callback fires when the next egg is due.
+        self._tick_phases: Tuple[Tuple[str, Callable[[], Any]], ...] = (("refresh", self._refresh_screens),)
+        if self.settings.SIM_ON_WORKER_THREAD:
+            self._tick_phases = (("breeding", self._tick_breeding),) + self._tick_phases
+        self.profiler = TickProfiler.for_tick_rate(
+            60, [name for name, _ in self._tick_phases], enabled=bool(PROFILE_PATH)
+        )
 
     def build(self):
         logging.basicConfig(level=logging.INFO)
@@ -103,16 +130,43 @@ class ArmadilloApp(MDApp):
         root = self.sm.build_root_with_nav(self.topbar)
 
         # Load / seed state
-        self._load_or_seed()
+        self.save_writer.start()
+        if self.settings.SAVE_STREAM_LOAD:
+            self._loader = self.persistence.stream(
+                self.state, self.settings.SAVE_STREAM_CHUNK_ROWS, apply=self.run_command,
+                on_progress=self._on_load_progress, on_ready=self._on_loaded,
+            )
+        if self._loader:
+            # Header now, so the first frame has coins and habitats; the herd follows
+            self._loader.begin()
+        else:
+            self._load_or_seed()
+            self._attach_journal()
 
-        # Bind state observers
-        self.state.add_observer(self._on_state_change)
+        # Bind state observers (threaded: the sim thread owns the state and
+        # the UI polls snapshot versions in _tick instead)
+        if self.settings.SIM_ON_WORKER_THREAD:
+            self.sim_thread = SimThread(self.state, self.settings)
+        else:
+            self.state.add_observer(self._on_state_change)
+            self.state.subscribe(ev.ANY, self._ui_events.append)
+            self.state.subscribe(ev.BREEDING_QUEUE_CHANGED, self._schedule_hatch)
+            self.state.subscribe(ev.STATE_RESET, self._schedule_hatch)
+            self._schedule_hatch()
+            # At most one observer round per frame
+            self.state.set_notify_scheduler(lambda flush: Clock.schedule_once(lambda _dt: flush(), 0))
 
         # UI refresh tick
         Clock.schedule_interval(lambda dt: self._tick(dt), 0.25)
 
-        # Auto-save throttle
-        self._autosave_ev = Clock.create_trigger(lambda *_: self._save(), 0.6)
+        # Herd chunks: parsed on a worker, applied a few ms per frame
+        if self._loader:
+            self._loader.prefetch()
+            Clock.schedule_interval(self._load_step, 0)
+
+        # Auto-save throttle (the journal makes it unnecessary)
+        if not self.settings.SAVE_JOURNAL:
+            self._autosave_ev = Clock.create_trigger(lambda *_: self._save(), 0.6)
 
         # Desktop: make reasonable portrait window
         if platform not in ("android", "ios"):
@@ -123,21 +177,40 @@ class ArmadilloApp(MDApp):
     # ---- Lifecycle ---------------------------------------------------------
 
     def on_start(self):
+        if self.sim_thread:
+            self.sim_thread.start()
         # Show starter tip
         if self.state.meta.get("first_run", False):
             show_toast("Welcome! Tap a card to select, then Feed/Pet. Long-press to drag to a habitat.")
 
     def on_pause(self):
         self._save()
+        self.save_writer.flush(timeout=2.0)
         return True
 
     def on_stop(self):
+        if self.sim_thread:
+            self.sim_thread.stop()
+            self.sim_thread = None
+        self.state.flush_notifications()
         self._save()
+        self.save_writer.stop()
+        if self.journal:
+            self.journal.close()
+        logging.info("Save metrics: %s", self.save_writer.metrics())
+        if self.profiler.enabled:
+            self.dump_profile(PROFILE_PATH)
+
+    def dump_profile(self, path: Optional[str] = None) -> str:
+        """JSON report of per-phase UI tick timings (see TickProfiler)."""
+        return self.profiler.dump(path)
 
     # ---- Persistence / State ----------------------------------------------
 
     def _load_or_seed(self):
-        ok = self.persistence.load(self.state)
+        self._seed_if_empty(self.persistence.load(self.state))
+
+    def _seed_if_empty(self, ok: bool):
         if not ok or not self.state.armadillos:
             logging.info("Seeding starters...")
             self.state.seed_starters()
@@ -146,8 +219,74 @@ class ArmadilloApp(MDApp):
         else:
             self.state.meta["first_run"] = False
 
+    def _attach_journal(self):
+        if self.settings.SAVE_JOURNAL:
+            # From here on every change is journaled; no periodic full saves
+            self.save_writer.flush()
+            self.journal = Journal(
+                self.persistence.journal_path(), self.settings.SAVE_JOURNAL_COMPACT_BYTES,
+                self.save_writer,
+            )
+            self.journal.attach(self.state)
+
+    # ---- Streamed load -----------------------------------------------------
+
+    def _load_step(self, _dt: float):
+        # Returning False unschedules once the herd is in
+        if self._loader is None:
+            return False
+        return not self._loader.step(self.settings.SAVE_STREAM_FRAME_BUDGET_MS / 1000.0)
+
+    def _on_load_progress(self, fraction: float, _rows: int):
+        if self.topbar:
+            self.topbar.update_load_progress(fraction)
+
+    def _on_loaded(self, loader: StreamingLoad):
+        self._loader = None
+        logging.info("Loaded %d armadillos", loader.rows_loaded)
+        self.run_command(self._after_load, loader.error is None)
+
+    def _after_load(self, ok: bool):
+        # On the thread that owns the state
+        self._seed_if_empty(ok)
+        self._attach_journal()
+
     def _save(self):
-        self.persistence.save(self.state)
+        if self._loader:
+            return  # the herd is still partial; never save it over the full one
+        if self.journal:
+            # Fold the journal into a full save via the writer thread (the
+            # snapshot is taken on the thread that owns the state)
+            self.run_command(self.journal.compact)
+            return
+        # Hand the writer thread a frozen snapshot; threaded, the sim thread
+        # already publishes one every tick that changed something
+        snap = self.sim_thread.snapshot if self.sim_thread else self.state.snapshot()
+        self.save_writer.submit(snap)
+
+    def view(self):
+        """What screens read from: the latest snapshot when threaded, else GameState."""
+        if self.sim_thread:
+            return self.sim_thread.snapshot
+        return self.state
+
+    def run_command(self, fn, *args, then=None):
+        """
+        Apply a GameState mutation. Threaded, it is queued for the next sim
+        tick and ``then(result)`` runs back on the Kivy thread; otherwise both
+        run immediately.
+        """
+        if not self.sim_thread:
+            result = fn(*args)
+            if then:
+                then(result)
+            return result
+        fut = self.sim_thread.submit(fn, *args)
+        if then:
+            fut.add_done_callback(
+                lambda f: Clock.schedule_once(lambda _dt: then(f.result()), 0)
+            )
+        return None
 
     def _on_state_change(self, *_):
         # Update topbar coins
@@ -160,17 +299,61 @@ class ArmadilloApp(MDApp):
     # ---- Ticking -----------------------------------------------------------
 
     def _tick(self, _dt: float):
+        if self.sim_thread:
+            snap = self.sim_thread.snapshot
+            if snap.version != self._seen_version:
+                self._seen_version = snap.version
+                if self.topbar:
+                    self.topbar.update_coin_label(snap.coins)
+                if self._autosave_ev:
+                    self._autosave_ev()
         # Drive countdowns and UI refresh
-        now = time.time()
-        hatched = self.state.breeding_tick(now)
+        if self.profiler.enabled:
+            self.profiler.run_phases(self._tick_phases)
+        else:
+            for _name, phase in self._tick_phases:
+                phase()
+
+    def _tick_breeding(self):
+        if self.sim_thread is None:
+            return
+        hatched = self.sim_thread.drain_hatched()
         if hatched:
             self._handle_hatch_results(hatched)
 
-        # Refresh screens (lightweight)
-        for name in ("home", "habitats", "breeding", "dex", "shop"):
-            scr = self.sm.get_screen(name) if self.sm else None
-            if scr and hasattr(scr, "refresh"):
-                scr.refresh()
+    def _schedule_hatch(self, *_):
+        if self._hatch_ev is not None:
+            self._hatch_ev.cancel()
+            self._hatch_ev = None
+        eta = self.state.next_hatch_eta()
+        if eta is not None:
+            self._hatch_ev = Clock.schedule_once(self._on_hatch_due, eta)
+
+    def _on_hatch_due(self, _dt: float):
+        self._hatch_ev = None
+        # Hatches and their reward notify once
+        with self.state.batch():
+            hatched = self.state.breeding_tick(time.time())
+            if hatched:
+                self._handle_hatch_results(hatched)
+        self._schedule_hatch()
+
+    def _take_ui_events(self) -> List[ChangeEvent]:
+        events = self._ui_events[:]
+        self._ui_events.clear()
+        if self.sim_thread:
+            events.extend(self.sim_thread.drain_events())
+        return ev.merge(events)
+
+    def _refresh_screens(self):
+        # Show only what changed since the last frame
+        if not self.sm:
+            return
+        events = self._take_ui_events()
+        if events:
+            for name in ("home", "habitats", "breeding", "dex", "shop"):
+                self.sm.get_screen(name).apply_events(events)
+        self.sm.get_screen("breeding").update_countdowns()
 
     # ---- Game events -------------------------------------------------------
 
@@ -180,7 +363,7 @@ class ArmadilloApp(MDApp):
         for res in results:
             earned += Economy.REWARD_HATCH
         if earned:
-            self.state.add_coins(earned)
+            self.run_command(self.state.add_coins, earned)
             show_toast(f"+{earned} coins • Hatched!")
         # Show details
         if HAS_MD and MDDialog:
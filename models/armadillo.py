@@ -1,40 +1,58 @@
 # models/armadillo.py
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
-from typing import Dict
+import sys
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Mapping, Tuple
 
+from models.codec import load, make_codec
 
-@dataclass
+# One shared read-only mapping per distinct genotype (see pack_genes)
+_GENOTYPES: Dict[Tuple[Tuple[str, str], ...], Mapping[str, str]] = {}
+
+
+def pack_genes(genes: Mapping[str, str]) -> Mapping[str, str]:
+    """
+    Canonical read-only genotype mapping shared by every armadillo with the
+    same genes. Herds hold a handful of genotypes, so this replaces one dict
+    per animal with one per genotype. Replace ``genes`` to change it.
+    """
+    key = tuple(genes.items())
+    packed = _GENOTYPES.get(key)
+    if packed is None:
+        packed = _GENOTYPES[key] = MappingProxyType(
+            {sys.intern(k): sys.intern(v) for k, v in key}
+        )
+    return packed
+
+
+@dataclass(slots=True)
 class Armadillo:
     id: str
     name: str
-    sex: str  # "M" or "F"
-    age_days: int
-    hunger: int  # 0-100 (higher = fuller)
-    happiness: int  # 0-100
-    genes: Dict[str, str]  # simple genotype mapping e.g., {"color": "Aa"}
-    color: str  # phenotype, e.g., "Brown", "Albino", "Blue"
-    is_baby: bool
-    is_adult: bool
+    sex: str  # "M" or "F" (interned)
+    age_days: int = field(metadata=load(0, int))
+    hunger: int = field(metadata=load(50, int))  # 0-100 (higher = fuller)
+    happiness: int = field(metadata=load(50, int))  # 0-100
+    # shared genotype e.g., {"color": "Aa"}, see pack_genes
+    genes: Mapping[str, str] = field(metadata=load({}, pack_genes))
+    color: str = field(metadata=load("Brown"))  # phenotype, e.g., "Brown", "Albino", "Blue" (interned)
+    is_baby: bool = field(metadata=load(False, bool))
+    is_adult: bool = field(metadata=load(True, bool))
+
+    def __post_init__(self) -> None:
+        self.sex = sys.intern(self.sex)
+        self.color = sys.intern(self.color)
+        if type(self.genes) is not MappingProxyType:
+            self.genes = pack_genes(self.genes)
 
     def to_dict(self) -> dict:
-        return asdict(self)
+        return _encode(self)
 
     @staticmethod
     def from_dict(d: dict) -> "Armadillo":
-        return Armadillo(
-            id=d["id"],
-            name=d["name"],
-            sex=d["sex"],
-            age_days=int(d.get("age_days", 0)),
-            hunger=int(d.get("hunger", 50)),
-            happiness=int(d.get("happiness", 50)),
-            genes=dict(d.get("genes", {})),
-            color=d.get("color", "Brown"),
-            is_baby=bool(d.get("is_baby", False)),
-            is_adult=bool(d.get("is_adult", True)),
-        )
+        return _decode(d)
 
     # --- Stats manipulation (capped) ---------------------------------------
 
@@ -43,3 +61,6 @@ class Armadillo:
 
     def pet(self, amount: int) -> None:
         self.happiness = max(0, min(100, self.happiness + amount))
+
+
+_encode, _decode = make_codec(Armadillo)
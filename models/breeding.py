@@ -3,49 +3,60 @@ from __future__ import annotations
 
 import random
 import time
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Tuple
 
 from models.armadillo import Armadillo
+from models.codec import load, make_codec
 
 
-@dataclass
+@dataclass(slots=True)
 class BreedingJob:
     id: str
     parent_m_id: str
     parent_f_id: str
-    start_ts: float
-    duration_s: int
-    status: str  # "incubating" | "done"
+    start_ts: float = field(metadata=load(cast=float))
+    duration_s: int = field(metadata=load(cast=int))
+    status: str = field(metadata=load("incubating"))  # "incubating" | "done"
     result: Optional[Dict] = None  # newborn dict if done
 
     def to_dict(self) -> dict:
-        return asdict(self)
+        return _encode(self)
 
     @staticmethod
     def from_dict(d: dict) -> "BreedingJob":
-        return BreedingJob(
-            id=d["id"],
-            parent_m_id=d["parent_m_id"],
-            parent_f_id=d["parent_f_id"],
-            start_ts=float(d["start_ts"]),
-            duration_s=int(d["duration_s"]),
-            status=d.get("status", "incubating"),
-            result=d.get("result"),
-        )
+        return _decode(d)
+
+    @property
+    def finish_ts(self) -> float:
+        return self.start_ts + self.duration_s
 
     def remaining(self, now: Optional[float] = None) -> int:
-        now = now or time.time()
-        rem = int(self.start_ts + self.duration_s - now)
+        if now is None:
+            now = time.time()
+        rem = int(self.finish_ts - now)
         return max(0, rem)
 
     def is_done(self, now: Optional[float] = None) -> bool:
-        return self.remaining(now) <= 0 and self.status != "done"
+        if now is None:
+            now = time.time()
+        return now >= self.finish_ts and self.status != "done"
+
+
+_encode, _decode = make_codec(BreedingJob)
 
 
 # ---- Genetics --------------------------------------------------------------
 
 
+def color_phenotype(genes: str) -> str:
+    if "B" in genes:
+        return "Blue"
+    if "A" in genes:
+        return "Brown"
+    return "Albino"
+
+
 def combine_genes(color_m: str, color_f: str, mutation_chance: float) -> Tuple[str, str]:
     """
     Very simple Mendelian-ish color system:
@@ -63,13 +74,7 @@ def combine_genes(color_m: str, color_f: str, mutation_chance: float) -> Tuple[s
         idx = random.randrange(2)
         child = ("B" if idx == 0 else child[0]) + ("B" if idx == 1 else child[1])
 
-    # Phenotype
-    if "B" in child:
-        phenotype = "Blue"
-    elif "A" in child:
-        phenotype = "Brown"
-    else:
-        phenotype = "Albino"
+    phenotype = color_phenotype(child)
 
     # Normalize genes to 2 chars
     if len(child) < 2:
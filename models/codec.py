@@ -0,0 +1,102 @@
+# models/codec.py
+"""
+Per-class dict encoders/decoders generated from dataclass fields.
+
+``make_codec(cls)`` writes straight-line ``encode(obj) -> dict`` and
+``decode(d) -> cls`` functions once, at import time, so saving a farm does
+no per-field reflection or ``asdict`` deep copies. Field metadata (see
+``load``) gives the default and cast used when reading older saves.
+Containers are copied one level deep, picked from the annotation:
+``Dict``/``Mapping`` -> ``dict(...)``, ``List``/``Sequence`` -> ``list(...)``,
+optionally wrapped in ``Optional[...]``. A field can instead name its own
+``encode``/``decode`` callables in metadata.
+"""
+from __future__ import annotations
+
+from dataclasses import MISSING, fields
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_CONTAINERS = (("Dict", dict), ("Mapping", dict), ("List", list), ("Sequence", list))
+
+
+def load(default: Any = MISSING, cast: Optional[Callable] = None, **extra) -> Dict[str, Any]:
+    """Field metadata: value used when the key is missing, and a cast for the raw value."""
+    meta = dict(extra)
+    if default is not MISSING:
+        meta["load_default"] = default
+    if cast is not None:
+        meta["load_cast"] = cast
+    return meta
+
+
+def _container(annotation: Any) -> Tuple[Optional[type], bool]:
+    """(copy type, optional) for a field annotation."""
+    text = annotation if isinstance(annotation, str) else getattr(annotation, "__name__", "")
+    optional = text.startswith("Optional[")
+    if optional:
+        text = text[len("Optional["):]
+    for head, kind in _CONTAINERS:
+        if text.startswith(head):
+            return kind, optional
+    return None, optional
+
+
+def make_codec(cls) -> Tuple[Callable[[Any], dict], Callable[[dict], Any]]:
+    """Build ``(encode, decode)`` for dataclass ``cls``."""
+    ns: Dict[str, Any] = {"_cls": cls, "_MISSING": MISSING}
+    enc_items, dec_args = [], []
+    for f in fields(cls):
+        name = f.name
+        kind, optional = _container(f.type)
+        meta = f.metadata
+
+        # Encode: obj.<name>, copied one level if it is a container
+        value = f"obj.{name}"
+        if "encode" in meta:
+            ns[f"_enc_{name}"] = meta["encode"]
+            value = f"_enc_{name}({value})"
+        elif kind is not None:
+            ns[f"_{kind.__name__}"] = kind
+            copy = f"_{kind.__name__}({value})"
+            value = f"(None if {value} is None else {copy})" if optional else copy
+        enc_items.append(f"{name!r}: {value}")
+
+        # Decode: d[<name>] (or .get with a default), then cast / copy
+        if "load_default" in meta:
+            default = meta["load_default"]
+        elif f.default is not MISSING:
+            default = f.default
+        elif f.default_factory is not MISSING:
+            default = f.default_factory()
+        else:
+            default = MISSING
+        if default is MISSING:
+            raw = f"d[{name!r}]"
+        elif default is None or isinstance(default, (bool, int, float, str)):
+            raw = f"d.get({name!r}, {default!r})"
+        else:
+            ns[f"_dflt_{name}"] = default
+            raw = f"d.get({name!r}, _dflt_{name})"
+        if "decode" in meta:
+            ns[f"_dec_{name}"] = meta["decode"]
+            raw = f"_dec_{name}({raw})"
+        elif "load_cast" in meta:
+            ns[f"_cast_{name}"] = meta["load_cast"]
+            raw = f"_cast_{name}({raw})"
+        elif kind is not None and not optional:
+            ns[f"_{kind.__name__}"] = kind
+            raw = f"_{kind.__name__}({raw})"
+        dec_args.append(f"{name}={raw}")
+
+    src = (
+        "def encode(obj):\n"
+        f"    return {{{', '.join(enc_items)}}}\n"
+        "def decode(d):\n"
+        f"    return _cls({', '.join(dec_args)})\n"
+    )
+    exec(compile(src, f"<codec {cls.__name__}>", "exec"), ns)
+    encode, decode = ns["encode"], ns["decode"]
+    encode.__qualname__ = f"{cls.__name__}.encode"
+    decode.__qualname__ = f"{cls.__name__}.decode"
+    encode.__source__ = decode.__source__ = src  # for debugging
+    return encode, decode
@@ -1,42 +1,88 @@
 # models/habitat.py
 from __future__ import annotations
 
-from dataclasses import dataclass, field, asdict
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List
 
+from models.codec import load, make_codec
 
-@dataclass
+
+class Occupancy:
+    """
+    Insertion-ordered set of armadillo ids: O(1) membership, add and
+    remove, iterates in move-in order. Saves as a plain list.
+    """
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: Iterable[str] = ()):
+        self._ids: Dict[str, None] = dict.fromkeys(ids)
+
+    def add(self, armadillo_id: str) -> bool:
+        if armadillo_id in self._ids:
+            return False
+        self._ids[armadillo_id] = None
+        return True
+
+    def discard(self, armadillo_id: str) -> bool:
+        if armadillo_id in self._ids:
+            del self._ids[armadillo_id]
+            return True
+        return False
+
+    def to_list(self) -> List[str]:
+        return list(self._ids)
+
+    def __contains__(self, armadillo_id: object) -> bool:
+        return armadillo_id in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Occupancy):
+            return list(self._ids) == list(other._ids)
+        if isinstance(other, (list, tuple)):
+            return list(self._ids) == list(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"Occupancy({list(self._ids)!r})"
+
+
+@dataclass(slots=True)
 class Habitat:
     id: str
     name: str
-    level: int
-    capacity: int
-    occupants: List[str] = field(default_factory=list)  # armadillo ids
-    hatch_boost_pct: int = 0  # small % boost
+    level: int = field(metadata=load(1, int))
+    capacity: int = field(metadata=load(2, int))
+    # armadillo ids; lists are converted on init
+    occupants: Occupancy = field(default_factory=Occupancy, metadata=load((), encode=Occupancy.to_list))
+    hatch_boost_pct: int = field(default=0, metadata=load(cast=int))  # small % boost
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.occupants, Occupancy):
+            self.occupants = Occupancy(self.occupants)
 
     def to_dict(self) -> dict:
-        return asdict(self)
+        return _encode(self)
 
     @staticmethod
     def from_dict(d: dict) -> "Habitat":
-        return Habitat(
-            id=d["id"],
-            name=d["name"],
-            level=int(d.get("level", 1)),
-            capacity=int(d.get("capacity", 2)),
-            occupants=list(d.get("occupants", [])),
-            hatch_boost_pct=int(d.get("hatch_boost_pct", 0)),
-        )
+        return _decode(d)
 
     def has_space(self) -> bool:
         return len(self.occupants) < self.capacity
 
     def add(self, armadillo_id: str) -> bool:
-        if self.has_space() and armadillo_id not in self.occupants:
-            self.occupants.append(armadillo_id)
-            return True
-        return False
+        return self.has_space() and self.occupants.add(armadillo_id)
 
     def remove(self, armadillo_id: str) -> None:
-        if armadillo_id in self.occupants:
-            self.occupants.remove(armadillo_id)
+        self.occupants.discard(armadillo_id)
+
+
+_encode, _decode = make_codec(Habitat)
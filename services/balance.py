@@ -0,0 +1,201 @@
+# services/balance.py
+"""
+Batch economy-balancing runs across many seeds and parameter sets.
+
+Each (seed, parameter set) pair is one headless farm driven by SimService
+with a fixed care/breeding policy. Jobs are sharded across a process pool
+and results are streamed, in job order, to a JSON-lines file, so the output
+is byte-identical for any worker count:
+
+    python -m services.balance --seeds 200 --params params.json --out runs.jsonl
+
+``params.json`` is a list of overrides, e.g. ``[{"FEED_COST": 3},
+{"INCUBATION_MIN_S": 45, "HUNGER_DECAY_PER_TICK": 0.03}]``. Keys may name
+``Settings`` fields or ``Economy`` attributes.
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models.breeding import combine_genes, make_baby_name
+from services.driver import StateWallet, make_headless_state
+from services.economy import Economy
+from services.herd import ADULT, EGG
+from services.sim import SimService
+from settings import Settings
+
+_SETTINGS_FIELDS = {f.name for f in fields(Settings)}
+
+
+@dataclass(frozen=True)
+class FarmJob:
+    seed: int
+    param_index: int
+    params: Tuple[Tuple[str, object], ...]
+    herd: int
+    ticks: int
+    sample_every: int
+
+
+def split_params(params: Dict) -> Tuple[Dict, Dict]:
+    """Split overrides into (Settings fields, Economy attributes)."""
+    settings_kw, econ_kw = {}, {}
+    for key, value in params.items():
+        if key in _SETTINGS_FIELDS:
+            settings_kw[key] = value
+        elif hasattr(Economy, key):
+            econ_kw[key] = value
+        else:
+            raise ValueError(f"unknown balance parameter: {key}")
+    return settings_kw, econ_kw
+
+
+@contextmanager
+def economy_overrides(values: Dict) -> Iterator[None]:
+    """Temporarily patch Economy class constants (restored for pooled workers)."""
+    saved = {k: getattr(Economy, k) for k in values}
+    try:
+        for k, v in values.items():
+            setattr(Economy, k, v)
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(Economy, k, v)
+
+
+# ---- Farm policy -----------------------------------------------------------
+
+def _feed_hungry(sim: SimService, state: Dict, s: Settings) -> None:
+    herd = sim.herd
+    for row in range(len(herd)):
+        if state["coins"] < s.FEED_COST:
+            return
+        if herd.stage[row] != EGG and herd.hunger[row] < 40:
+            state["coins"] -= s.FEED_COST
+            sim.feed(row, s.FEED_HUNGER_GAIN)
+
+
+def _breed_one(sim: SimService, state: Dict, s: Settings, rng: random.Random, serial: int) -> bool:
+    if state["coins"] < s.INCUBATOR_BASE_COST:
+        return False
+    herd = sim.herd
+    adults = [row for row in range(len(herd)) if herd.stage[row] == ADULT]
+    dads = [row for row in adults if herd.records[row].get("sex") == "M"]
+    moms = [row for row in adults if herd.records[row].get("sex") == "F"]
+    if not dads or not moms:
+        return False
+    dad_row, mom_row = rng.choice(dads), rng.choice(moms)
+    dad, mom = herd.records[dad_row], herd.records[mom_row]
+    genes, color = combine_genes(dad["genes"]["color"], mom["genes"]["color"], Economy.MUTATION_CHANCE)
+    state["coins"] -= s.INCUBATOR_BASE_COST
+    sim.start_incubation({
+        "id": f"b{serial}",
+        "name": make_baby_name(),
+        "sex": rng.choice(("M", "F")),
+        "genes": {"color": genes},
+        "color": color,
+        "hunger": 60,
+        "happiness": 60,
+        "rarity": (dad.get("rarity", 0.0) + mom.get("rarity", 0.0)) / 2,
+        "habitat_id": herd.habitat_id(mom_row),  # placed at hatch if it has room
+    }, ticks=Economy.INCUBATION_MIN_S * s.TICKS_PER_SEC)
+    return True
+
+
+def run_farm(job: FarmJob) -> Dict:
+    """Run one seeded farm to completion and return its aggregate row."""
+    settings_kw, econ_kw = split_params(dict(job.params))
+    s = replace(Settings(), **settings_kw)
+    with economy_overrides(econ_kw):
+        random.seed(job.seed)  # combine_genes / make_baby_name draw from `random`
+        rng = random.Random(job.seed)
+        state = make_headless_state(job.herd, s, seed=job.seed)
+        sim = SimService(s, state, StateWallet(state), None)
+        coins: List[float] = []
+        herd_size: List[int] = []
+        serial = 0
+        done = 0
+        while done < job.ticks:
+            step = min(job.sample_every, job.ticks - done)
+            sim.fast_forward(step)
+            done += step
+            _feed_hungry(sim, state, s)
+            if _breed_one(sim, state, s, rng, serial):
+                serial += 1
+            coins.append(round(state["coins"], 2))
+            herd_size.append(len(sim.herd))
+        sim.flush()
+    phenotypes = Counter(a.get("color", "?") for a in state["armadillos"])
+    return {
+        "seed": job.seed,
+        "params": job.param_index,
+        "coins": coins,
+        "herd": herd_size,
+        "phenotypes": dict(sorted(phenotypes.items())),
+    }
+
+
+# ---- Batch runner ----------------------------------------------------------
+
+def make_jobs(seeds: Iterable[int], param_sets: List[Dict], herd: int, ticks: int,
+              sample_every: int) -> List[FarmJob]:
+    return [
+        FarmJob(seed, idx, tuple(sorted(params.items())), herd, ticks, sample_every)
+        for idx, params in enumerate(param_sets)
+        for seed in seeds
+    ]
+
+
+def iter_results(jobs: List[FarmJob], workers: Optional[int] = None) -> Iterator[Dict]:
+    """Yield results in job order, whatever the number of workers."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        yield from map(run_farm, jobs)
+        return
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(run_farm, jobs, chunksize=chunksize)
+
+
+def run_batch(jobs: List[FarmJob], out_path: str, workers: Optional[int] = None) -> int:
+    """Stream results to ``out_path`` as compact JSON lines; returns the row count."""
+    n = 0
+    with open(out_path, "w", encoding="utf-8") as f:
+        for row in iter_results(jobs, workers):
+            f.write(json.dumps(row, separators=(",", ":")))
+            f.write("\n")
+            n += 1
+    return n
+
+
+def main(argv=None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batch economy-balancing simulations.")
+    parser.add_argument("--seeds", type=int, default=100, help="run seeds 0..N-1")
+    parser.add_argument("--params", help="JSON file with a list of parameter overrides")
+    parser.add_argument("--herd", type=int, default=24)
+    parser.add_argument("--ticks", type=int, default=20 * 60 * 60, help="ticks per farm")
+    parser.add_argument("--sample-every", type=int, default=20 * 60)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="balance_runs.jsonl")
+    args = parser.parse_args(argv)
+
+    param_sets: List[Dict] = [{}]
+    if args.params:
+        with open(args.params, "r", encoding="utf-8") as f:
+            param_sets = json.load(f)
+    jobs = make_jobs(range(args.seeds), param_sets, args.herd, args.ticks, args.sample_every)
+    n = run_batch(jobs, args.out, args.workers)
+    print(f"{n} farms -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
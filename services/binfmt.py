@@ -0,0 +1,460 @@
+# services/binfmt.py
+"""
+Binary save container (``SAVE_SCHEMA_VERSION = 2``).
+
+Layout, all little-endian::
+
+    header   MAGIC, schema version (u16), section count (u16), reserved (u32)
+    table    per section: tag (4s), crc32 (u32), offset (u64), length (u64)
+    META     JSON of the top-level keys that are not tables
+    STRS     string table: count (u32), offsets (u32 * count+1), UTF-8 blob
+    T000...  one per table: name (u32 string), rows (u32), columns (u32),
+             per column: name (u32 string), kind (1s), pad (3x), offset (u64);
+             then the column data
+
+Every top-level list of records (the herd, habitats, the breeding queue)
+is a table stored one packed fixed-width array per field, so no key is
+repeated per record. Column kinds are inferred when writing: ints use the
+narrowest of ``b/h/i/q`` that fits, ``?`` is bool, ``d`` float, ``S`` a
+string-table index, and ``J`` a string-table index of the value's JSON
+(anything else, or a key some rows lack: ``NONE`` marks "key absent").
+Sections start 8-byte aligned, so ``SaveReader`` can hand out
+``memoryview`` columns straight from an ``mmap`` without copying.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from contextlib import contextmanager
+from itertools import accumulate, repeat
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import ujson
+
+MAGIC = b"DILLOSV\x00"
+SCHEMA_VERSION = 2
+HERD_KEY = "armadillos"
+NONE = 0xFFFFFFFF  # J column: key absent in this row
+
+_HEADER = struct.Struct("<8sHHI")
+_ENTRY = struct.Struct("<4sIQQ")
+_TABLE_HEAD = struct.Struct("<III")
+_COLUMN = struct.Struct("<Ic3xQ")
+_INT_KINDS = (("b", 1 << 7), ("h", 1 << 15), ("i", 1 << 31), ("q", 1 << 63))
+_LITTLE = sys.byteorder == "little"
+_ABSENT = object()
+
+
+class FormatError(ValueError):
+    """Not a binary save, or a damaged one."""
+
+
+def _const(v):
+    return lambda: v
+
+
+def is_binary(buf) -> bool:
+    return bytes(buf[:len(MAGIC)]) == MAGIC
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    # Encoding and decoding allocate lots of acyclic containers; keep the
+    # cyclic collector from rescanning the whole save over and over meanwhile
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# ---- Writing ---------------------------------------------------------------
+
+class _Strings:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def add(self, s: str) -> int:
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.index)
+        return i
+
+    def encode(self) -> bytes:
+        text = "".join(self.index)
+        blob = text.encode("utf-8")
+        if len(blob) == len(text):  # ASCII: character lengths are byte lengths
+            lengths: Iterable[int] = map(len, self.index)
+        else:
+            blobs = [s.encode("utf-8") for s in self.index]
+            lengths = map(len, blobs)
+        offsets = array("I", accumulate(lengths, initial=0))
+        return struct.pack("<I", len(self.index)) + _le(offsets) + blob
+
+
+def _le(a: array) -> bytes:
+    if not _LITTLE:
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def _pad(n: int) -> int:
+    return -n % 8
+
+
+def _is_table(v) -> bool:
+    return type(v) is list and bool(v) and set(map(type, v)) == {dict}
+
+
+def _kind(values: List) -> str:
+    if _ABSENT in values:
+        return "J"
+    types = set(map(type, values))
+    if types == {bool}:
+        return "?"
+    if types == {int}:
+        top = max(max(values), ~min(values))
+        for code, bound in _INT_KINDS:
+            if top < bound:
+                return code
+        return "J"
+    if types == {float}:
+        return "d"
+    if types == {str}:
+        return "S"
+    return "J"
+
+
+def _to_json(v) -> str:
+    return ujson.dumps(v, ensure_ascii=False, escape_forward_slashes=False)
+
+
+def _content_keys(values: List) -> Optional[List]:
+    """Per-row keys equal exactly when the values are, built in C-level passes; None if mixed."""
+    types = set(map(type, values))
+    if types == {list}:
+        return list(map(tuple, values))
+    if types != {dict}:
+        return None
+    shape = tuple(values[0])
+    if len(shape) > 0 and set(map(len, values)) == {len(shape)}:
+        try:
+            # Same size and every key present: same keys, so their values decide
+            return list(map(itemgetter(*shape), values))
+        except KeyError:
+            pass
+    return list(map(tuple, map(dict.items, values)))
+
+
+def _json_index(values: List, strings: _Strings) -> List[int]:
+    # Flat dicts (genes) repeat a lot: encode each distinct one once
+    keys = _content_keys(values)
+    if keys is not None:
+        try:
+            first = dict(zip(keys, values))
+        except TypeError:  # unhashable contents
+            pass
+        else:
+            index = {k: strings.add(_to_json(v)) for k, v in first.items()}
+            return list(map(index.__getitem__, keys))
+    seen: Dict[object, int] = {}
+    out = []
+    for v in values:
+        if v is _ABSENT:
+            out.append(NONE)
+            continue
+        try:
+            key = (type(v), tuple(v.items())) if type(v) is dict else (type(v), v)
+            i = seen.get(key)
+        except TypeError:  # unhashable contents
+            key, i = None, None
+        if i is None:
+            i = strings.add(_to_json(v))
+            if key is not None:
+                seen[key] = i
+        out.append(i)
+    return out
+
+
+def _encode_column(kind: str, values: List, strings: _Strings) -> bytes:
+    if kind == "?":
+        return bytes(values)
+    if kind == "S":
+        index = strings.index
+        for v in dict.fromkeys(values):
+            index.setdefault(v, len(index))
+        return _le(array("I", map(index.__getitem__, values)))
+    if kind == "J":
+        return _le(array("I", _json_index(values, strings)))
+    return _le(array(kind, values))
+
+
+def _columns(rows: List[Dict]) -> List[Tuple[str, List]]:
+    first = list(rows[0])
+    if set(map(len, rows)) == {len(first)}:
+        # Same size everywhere, so if every row has the first row's keys they
+        # all have the same keys: one C-level pass per key
+        try:
+            return [(k, list(map(itemgetter(k), rows))) for k in first]
+        except KeyError:
+            pass
+    keys: Dict[str, None] = {}
+    for r in rows:
+        keys.update(dict.fromkeys(r))
+    return [(k, [r.get(k, _ABSENT) for r in rows]) for k in keys]
+
+
+def _encode_table(name: str, rows: List[Dict], strings: _Strings) -> bytes:
+    columns = []
+    for k, values in _columns(rows):
+        kind = _kind(values)
+        columns.append((strings.add(k), kind, _encode_column(kind, values, strings)))
+
+    head_len = _TABLE_HEAD.size + _COLUMN.size * len(columns)
+    parts = [_TABLE_HEAD.pack(strings.add(name), len(rows), len(columns))]
+    offset = head_len + _pad(head_len)
+    data = [b"\x00" * _pad(head_len)]
+    for col, kind, blob in columns:
+        parts.append(_COLUMN.pack(col, kind.encode("ascii"), offset))
+        data.extend((blob, b"\x00" * _pad(len(blob))))
+        offset += len(blob) + _pad(len(blob))
+    return b"".join(parts + data)
+
+
+def dumps(d: Dict) -> bytes:
+    """Encode a save dict (``GameState.to_dict`` or a headless state)."""
+    strings = _Strings()
+    meta = {k: v for k, v in d.items() if not _is_table(v)}
+    with _gc_paused():
+        tables = [
+            (f"T{i:03d}".encode("ascii"), _encode_table(k, v, strings))
+            for i, (k, v) in enumerate((k, v) for k, v in d.items() if _is_table(v))
+        ]
+    sections = [(b"META", json.dumps(meta, separators=(",", ":")).encode("utf-8"))]
+    if tables:
+        sections.append((b"STRS", strings.encode()))
+        sections.extend(tables)
+
+    offset = _HEADER.size + _ENTRY.size * len(sections)
+    offset += _pad(offset)
+    table: List[bytes] = []
+    body: List[bytes] = []
+    for tag, blob in sections:
+        table.append(_ENTRY.pack(tag, zlib.crc32(blob), offset, len(blob)))
+        body.extend((blob, b"\x00" * _pad(len(blob))))
+        offset += len(blob) + _pad(len(blob))
+    head = _HEADER.pack(MAGIC, SCHEMA_VERSION, len(sections), 0) + b"".join(table)
+    return head + b"\x00" * _pad(len(head)) + b"".join(body)
+
+
+# ---- Reading ---------------------------------------------------------------
+
+class SaveReader:
+    """
+    Zero-copy view over an encoded save (bytes, or an ``mmap``).
+
+    ``column(name)`` is a typed ``memoryview`` into the buffer (string and
+    JSON columns hold string-table indexes; see ``string``). Views are
+    tracked and dropped by ``release()``, which must run before an ``mmap``
+    underneath is closed; the reader is also a context manager.
+    """
+
+    def __init__(self, buf, verify: bool = True):
+        self._buf = memoryview(buf)
+        self._views: List[memoryview] = [self._buf]
+        if len(self._buf) < _HEADER.size or not is_binary(self._buf):
+            raise FormatError("not a binary save")
+        _, version, count, _ = _HEADER.unpack_from(self._buf)
+        if version > SCHEMA_VERSION:
+            raise FormatError(f"save schema {version} is newer than {SCHEMA_VERSION}")
+        self.version = version
+        self.sections: Dict[str, Tuple[int, int, int]] = {}
+        for i in range(count):
+            tag, crc, off, n = _ENTRY.unpack_from(self._buf, _HEADER.size + i * _ENTRY.size)
+            if off + n > len(self._buf):
+                raise FormatError(f"section {tag!r} runs past the end of the file")
+            self.sections[tag.decode("ascii")] = (off, n, crc)
+        if verify:
+            self.verify()
+        self._strings: Optional[List[str]] = None
+        # table name -> (section tag, rows, {column: (kind, offset)})
+        self._tables: Dict[str, Tuple[str, int, Dict[str, Tuple[str, int]]]] = {}
+        for tag in self.sections:
+            if tag.startswith("T"):
+                buf = self.section(tag)
+                name, rows, ncols = _TABLE_HEAD.unpack_from(buf)
+                cols = {}
+                for i in range(ncols):
+                    col, kind, off = _COLUMN.unpack_from(buf, _TABLE_HEAD.size + i * _COLUMN.size)
+                    cols[self.string(col)] = (kind.decode("ascii"), off)
+                self._tables[self.string(name)] = (tag, rows, cols)
+
+    def __enter__(self) -> "SaveReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def release(self) -> None:
+        for v in reversed(self._views):
+            v.release()
+        self._views = []
+
+    def _view(self, v: memoryview) -> memoryview:
+        self._views.append(v)
+        return v
+
+    def verify(self) -> None:
+        for tag, (off, n, crc) in self.sections.items():
+            if zlib.crc32(self._buf[off:off + n]) != crc:
+                raise FormatError(f"checksum mismatch in section {tag}")
+
+    def section(self, tag: str) -> memoryview:
+        off, n, _ = self.sections[tag]
+        return self._view(self._buf[off:off + n])
+
+    # ---- String table ------------------------------------------------------
+
+    def string(self, i: int) -> str:
+        return self.strings()[i]
+
+    def strings(self) -> List[str]:
+        if self._strings is None:
+            self._strings = self._load_strings()
+        return self._strings
+
+    def _load_strings(self) -> List[str]:
+        buf = self.section("STRS")
+        (count,) = struct.unpack_from("<I", buf)
+        offsets = self._array(buf, 4, "I", count + 1)
+        blob = bytes(buf[4 + 4 * (count + 1):])
+        spans = zip(offsets[:-1], offsets[1:])
+        text = blob.decode("utf-8")
+        if len(text) == len(blob):  # ASCII: byte offsets are character offsets
+            return [text[a:b] for a, b in spans]
+        return [blob[a:b].decode("utf-8") for a, b in spans]
+
+    # ---- Tables ------------------------------------------------------------
+
+    @property
+    def table_names(self) -> List[str]:
+        return list(self._tables)
+
+    @property
+    def rows(self) -> int:
+        """Herd size."""
+        return self.row_count(HERD_KEY)
+
+    def row_count(self, table: str) -> int:
+        return self._tables[table][1] if table in self._tables else 0
+
+    def column_names(self, table: str = HERD_KEY) -> List[str]:
+        return list(self._tables[table][2])
+
+    def column_kind(self, name: str, table: str = HERD_KEY) -> str:
+        return self._tables[table][2][name][0]
+
+    def column(self, name: str, table: str = HERD_KEY):
+        """Packed values of one field (a memoryview on little-endian hosts)."""
+        tag, rows, cols = self._tables[table]
+        kind, off = cols[name]
+        code = "I" if kind in "SJ" else kind
+        return self._array(self.section(tag), off, code, rows)
+
+    def _array(self, buf: memoryview, off: int, code: str, n: int):
+        size = struct.calcsize(code)
+        raw = buf[off:off + size * n]
+        if code == "?" or _LITTLE:
+            # code is one of the single-letter formats above; typeshed wants a Literal
+            return self._view(self._view(raw).cast(code))  # type: ignore[call-overload]
+        a = array(code, raw)  # big-endian host: one swapped copy
+        a.byteswap()
+        return a
+
+    def table(self, table: str = HERD_KEY, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Decode rows ``start:stop`` of one table to a list of dicts."""
+        _, rows, cols = self._tables[table]
+        start, stop, _ = slice(start, stop).indices(rows)
+        if not cols:
+            return [{} for _ in range(start, stop)]
+        names, columns, sparse = [], [], []
+        for name, (kind, _) in cols.items():
+            values = self.column(name, table)[start:stop]
+            if kind == "S":
+                values = list(map(self.strings().__getitem__, values))
+            elif kind == "J":
+                if NONE in values:
+                    sparse.append(name)
+                values = self._json_values(values)
+            else:
+                values = values.tolist()
+            names.append(name)
+            columns.append(values)
+        out = list(map(dict, map(zip, repeat(names), zip(*columns))))
+        # J columns drop the keys a row did not have
+        for name in sparse:
+            for r in out:
+                if r[name] is _ABSENT:
+                    del r[name]
+        return out
+
+    def _json_values(self, indexes: Iterable[int]) -> List:
+        distinct = sorted(set(indexes) - {NONE})
+        strings = self.strings()
+        # One parse for every distinct value
+        values = json.loads("[" + ",".join([strings[i] for i in distinct]) + "]")
+        # Each row gets its own container (copied one level deep)
+        makers = {i: v.copy if isinstance(v, (dict, list)) else _const(v) for i, v in zip(distinct, values)}
+        makers[NONE] = _const(_ABSENT)
+        return [make() for make in map(makers.__getitem__, indexes)]
+
+    def to_dict(self) -> Dict:
+        d = json.loads(bytes(self.section("META")))
+        with _gc_paused():
+            for name in self._tables:
+                d[name] = self.table(name)
+        return d
+
+
+def loads(buf) -> Dict:
+    with SaveReader(buf) as r:
+        return r.to_dict()
+
+
+def read(path: str) -> Dict:
+    """Decode the binary save at ``path`` through an mmap."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return loads(mm)
+
+
+# ---- JSON <-> binary -------------------------------------------------------
+
+def decode(buf) -> Dict:
+    """A save dict from either format, told apart by the magic."""
+    if is_binary(buf):
+        return loads(buf)
+    return json.loads(bytes(buf).decode("utf-8"))
+
+
+def json_to_binary(src: str, dst: str) -> int:
+    with open(src, "r", encoding="utf-8") as f:
+        blob = dumps(json.load(f))
+    with open(dst, "wb") as f:
+        f.write(blob)
+    return len(blob)
+
+
+def binary_to_json(src: str, dst: str) -> int:
+    blob = json.dumps(read(src), indent=2).encode("utf-8")
+    with open(dst, "wb") as f:
+        f.write(blob)
+    return len(blob)
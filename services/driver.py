@@ -0,0 +1,141 @@
+# services/driver.py
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from models.breeding import color_phenotype
+from models.genetics import RNG
+from settings import Settings
+
+
+class FixedStepDriver:
+    """
+    Fixed-timestep loop for the simulation, independent of Kivy.
+
+    Feed it elapsed wall time with ``advance(dt)`` (from a Kivy Clock
+    callback inside the app, or from ``run_for`` headless). Time is
+    accumulated and spent in whole ticks of ``1 / tick_rate`` seconds. At
+    most ``max_catch_up_ticks`` run per call; older backlog is dropped.
+    Backlogs of ``batch_min_ticks`` or more go to ``batch`` in one call
+    (e.g. ``SimService.fast_forward``) when one is given.
+    """
+
+    def __init__(
+        self,
+        tick: Callable[[float], None],
+        tick_rate: int,
+        max_catch_up_ticks: int,
+        batch: Optional[Callable[[int], object]] = None,
+        batch_min_ticks: int = 0,
+    ):
+        self.tick = tick
+        self.dt = 1.0 / tick_rate
+        self.max_catch_up_ticks = max_catch_up_ticks
+        self.batch = batch
+        self.batch_min_ticks = batch_min_ticks
+        self._acc = 0.0
+        self.ticks_run = 0
+        self.ticks_dropped = 0
+
+    @classmethod
+    def for_sim(cls, sim, settings: Settings, batching: bool = True) -> "FixedStepDriver":
+        return cls(
+            sim.tick,
+            settings.TICKS_PER_SEC,
+            settings.SIM_MAX_CATCH_UP_TICKS,
+            batch=sim.fast_forward if batching else None,
+            batch_min_ticks=settings.SIM_BATCH_MIN_TICKS,
+        )
+
+    @property
+    def alpha(self) -> float:
+        """Fraction of a tick left in the accumulator (for render interpolation)."""
+        return self._acc / self.dt
+
+    def step(self, n: int) -> None:
+        """Run exactly ``n`` ticks, batching when allowed."""
+        if n <= 0:
+            return
+        if self.batch is not None and self.batch_min_ticks and n >= self.batch_min_ticks:
+            self.batch(n)
+        else:
+            for _ in range(n):
+                self.tick(self.dt)
+        self.ticks_run += n
+
+    def advance(self, elapsed: float) -> int:
+        """Add ``elapsed`` seconds and run the ticks that are due; returns how many."""
+        self._acc += max(0.0, elapsed)
+        due = int(self._acc / self.dt)
+        if due > self.max_catch_up_ticks:
+            self.ticks_dropped += due - self.max_catch_up_ticks
+            self._acc -= (due - self.max_catch_up_ticks) * self.dt
+            due = self.max_catch_up_ticks
+        self._acc -= due * self.dt
+        self.step(due)
+        return due
+
+    def run_for(self, seconds: float, clock=time.perf_counter, sleep=time.sleep) -> None:
+        """Headless real-time loop for ``seconds`` of wall time."""
+        start = last = clock()
+        while last - start < seconds:
+            sleep(max(0.0, self.dt - self._acc))
+            now = clock()
+            self.advance(now - last)
+            last = now
+
+
+# ---- Headless farms --------------------------------------------------------
+
+class StateWallet:
+    """Minimal economy for headless sims: credits ``state["coins"]``."""
+
+    def __init__(self, state: Dict):
+        self.state = state
+
+    def add_coins(self, amt: float) -> None:
+        self.state["coins"] = self.state.get("coins", 0) + amt
+
+
+def make_headless_state(herd: int, settings: Settings, seed: int = 1337, habitats: int = 0) -> Dict:
+    """Random farm in the save-state layout, seeded through ``RNG``."""
+    RNG.set_seed(seed)
+    stages = ("egg", "juvenile", "adult", "adult", "retired")
+    n_hab = habitats or max(1, herd // settings.DEFAULT_HABITAT_CAPACITY)
+    habs: List[Dict[str, Any]] = [
+        {"id": f"h{i}", "name": f"Habitat {i}", "level": 1,
+         "capacity": settings.DEFAULT_HABITAT_CAPACITY, "occupants": []}
+        for i in range(n_hab)
+    ]
+    armadillos: List[Dict[str, Any]] = []
+    state: Dict[str, Any] = {
+        "schema_version": settings.SAVE_SCHEMA_VERSION,
+        "rng_seed": seed,
+        "coins": settings.STARTING_COINS,
+        "habitats": habs,
+        "armadillos": armadillos,
+        "incubator": [],
+        "collections": {},
+        "tick": 0,
+    }
+    for i in range(herd):
+        hab = habs[i % n_hab]
+        placed = len(hab["occupants"]) < hab["capacity"]
+        if placed:
+            hab["occupants"].append(f"a{i}")
+        genes = RNG.choice(("AA", "Aa", "aa"))
+        armadillos.append({
+            "id": f"a{i}",
+            "name": f"Dillo {i}",
+            "sex": RNG.choice(("M", "F")),
+            "genes": {"color": genes},
+            "color": color_phenotype(genes),
+            "stage": RNG.choice(stages),
+            "age_ticks": RNG.randint(0, settings.RETIRE_AGE_TICKS),
+            "hunger": RNG.uniform(0, settings.HUNGER_MAX),
+            "happiness": RNG.uniform(0, settings.HAPPINESS_MAX),
+            "rarity": RNG.random(),
+            "habitat_id": hab["id"] if placed else None,
+        })
+    return state
@@ -0,0 +1,93 @@
+# services/events.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# ---- Topics ----------------------------------------------------------------
+
+ANY = "*"  # subscribe to every topic
+STATE_RESET = "state_reset"  # seeded / loaded: everything changed
+ARMADILLO_ADDED = "armadillo_added"
+ARMADILLO_UPDATED = "armadillo_updated"
+HABITAT_CHANGED = "habitat_changed"
+COINS_CHANGED = "coins_changed"
+INVENTORY_CHANGED = "inventory_changed"
+BREEDING_QUEUE_CHANGED = "breeding_queue_changed"
+DEX_ADDED = "dex_added"
+SELECTION_CHANGED = "selection_changed"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """One GameState change. ``key`` is the armadillo/habitat id, item or color."""
+    topic: str
+    key: Optional[str] = None
+    fields: FrozenSet[str] = frozenset()
+    delta: int = 0
+
+
+# ---- Constructors ----------------------------------------------------------
+
+def state_reset() -> ChangeEvent:
+    return ChangeEvent(STATE_RESET)
+
+
+def armadillo_added(did: str) -> ChangeEvent:
+    return ChangeEvent(ARMADILLO_ADDED, did)
+
+
+def armadillo_updated(did: str, fields: Iterable[str]) -> ChangeEvent:
+    return ChangeEvent(ARMADILLO_UPDATED, did, frozenset(fields))
+
+
+def habitat_changed(hid: str) -> ChangeEvent:
+    return ChangeEvent(HABITAT_CHANGED, hid)
+
+
+def coins_changed(delta: int) -> ChangeEvent:
+    return ChangeEvent(COINS_CHANGED, delta=delta)
+
+
+def inventory_changed(item: str) -> ChangeEvent:
+    return ChangeEvent(INVENTORY_CHANGED, item)
+
+
+def breeding_queue_changed() -> ChangeEvent:
+    return ChangeEvent(BREEDING_QUEUE_CHANGED)
+
+
+def dex_added(color: str) -> ChangeEvent:
+    return ChangeEvent(DEX_ADDED, color)
+
+
+def selection_changed(did: Optional[str]) -> ChangeEvent:
+    return ChangeEvent(SELECTION_CHANGED, did)
+
+
+# ---- Merging ---------------------------------------------------------------
+
+def merge(events: Iterable[ChangeEvent]) -> List[ChangeEvent]:
+    """
+    Collapse events that touch the same thing, keeping first-seen order:
+    updated fields are unioned and coin deltas summed. Selection keeps only
+    the latest id.
+    """
+    merged: Dict[Tuple[str, Optional[str]], ChangeEvent] = {}
+    for ev in events:
+        key = (ev.topic, None if ev.topic == SELECTION_CHANGED else ev.key)
+        prev = merged.get(key)
+        if prev is None or ev.topic == SELECTION_CHANGED:
+            merged[key] = ev
+        elif ev.topic == ARMADILLO_UPDATED:
+            merged[key] = ChangeEvent(ev.topic, ev.key, prev.fields | ev.fields)
+        elif ev.topic == COINS_CHANGED:
+            merged[key] = ChangeEvent(ev.topic, delta=prev.delta + ev.delta)
+    return list(merged.values())
+
+
+def by_topic(events: Iterable[ChangeEvent]) -> Dict[str, List[ChangeEvent]]:
+    out: Dict[str, List[ChangeEvent]] = {}
+    for ev in events:
+        out.setdefault(ev.topic, []).append(ev)
+    return out
@@ -0,0 +1,95 @@
+# services/herd.py
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+# Stage codes used by the sim hot loop (index into STAGES).
+STAGES = ("egg", "juvenile", "adult", "retired")
+STAGE_CODE: Dict[str, int] = {name: code for code, name in enumerate(STAGES)}
+EGG, JUVENILE, ADULT, RETIRED = range(len(STAGES))
+
+NO_HABITAT = -1
+
+
+class HerdStore:
+    """
+    Struct-of-arrays view over the armadillo records in a save state.
+
+    The hot fields (age, hunger, happiness, rarity, stage, habitat) live in
+    contiguous arrays that the sim mutates in place. Everything else stays in
+    the original record dicts, which are shared with ``state["armadillos"]``;
+    call ``sync()`` to write the columns back before saving or exporting.
+    """
+
+    def __init__(self, records: Optional[List[Dict]] = None, habitat_ids: Iterable[str] = ()):
+        self.records: List[Dict] = records if records is not None else []
+        self.age_ticks = array("q")
+        self.hunger = array("d")
+        self.happiness = array("d")
+        self.rarity = array("d")
+        self.stage = array("b")
+        self.habitat = array("l")
+
+        self.habitat_ids: List[str] = []
+        self._habitat_index: Dict[str, int] = {}
+        for hid in habitat_ids:
+            self.habitat_index(hid)
+
+        for d in self.records:
+            self._append_columns(d)
+
+    def __len__(self) -> int:
+        return len(self.stage)
+
+    # ---- Habitat table ----------------------------------------------------
+
+    def habitat_index(self, hid: Optional[str]) -> int:
+        """Map a habitat id to its small-int code, registering new ids."""
+        if not hid:
+            return NO_HABITAT
+        idx = self._habitat_index.get(hid)
+        if idx is None:
+            idx = len(self.habitat_ids)
+            self.habitat_ids.append(hid)
+            self._habitat_index[hid] = idx
+        return idx
+
+    # ---- Rows -------------------------------------------------------------
+
+    def _append_columns(self, d: Dict) -> None:
+        self.age_ticks.append(int(d.get("age_ticks", 0)))
+        self.hunger.append(float(d.get("hunger", 50)))
+        self.happiness.append(float(d.get("happiness", 50)))
+        self.rarity.append(float(d.get("rarity", 0.0)))
+        self.stage.append(STAGE_CODE.get(d.get("stage", "adult"), ADULT))
+        self.habitat.append(self.habitat_index(d.get("habitat_id")))
+
+    def append(self, d: Dict) -> int:
+        """Add a record (shared with the backing list) and return its row."""
+        self.records.append(d)
+        self._append_columns(d)
+        return len(self.stage) - 1
+
+    def stage_name(self, row: int) -> str:
+        return STAGES[self.stage[row]]
+
+    def habitat_id(self, row: int) -> Optional[str]:
+        h = self.habitat[row]
+        return self.habitat_ids[h] if h != NO_HABITAT else None
+
+    # ---- Export -----------------------------------------------------------
+
+    def sync(self) -> List[Dict]:
+        """Write the hot columns back into the record dicts and return them."""
+        for i, d in enumerate(self.records):
+            d["age_ticks"] = self.age_ticks[i]
+            d["hunger"] = self.hunger[i]
+            d["happiness"] = self.happiness[i]
+            d["stage"] = STAGES[self.stage[i]]
+            h = self.habitat[i]
+            if h != NO_HABITAT:
+                d["habitat_id"] = self.habitat_ids[h]
+            elif d.get("habitat_id"):
+                d["habitat_id"] = None
+        return self.records
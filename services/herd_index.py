@@ -0,0 +1,83 @@
+# services/herd_index.py
+from __future__ import annotations
+
+from typing import Dict, Hashable, Iterable, List, Tuple, TypeVar
+
+from models.armadillo import Armadillo
+
+STAGE_BABY = "baby"
+STAGE_ADULT = "adult"
+
+K = TypeVar("K", bound=Hashable)
+
+
+def stage_of(a: Armadillo) -> str:
+    return STAGE_ADULT if a.is_adult else STAGE_BABY
+
+
+class HerdIndex:
+    """
+    Secondary indexes over the herd: (sex, adult), color and stage.
+
+    Buckets are insertion-ordered dicts (id -> Armadillo), so queries return
+    animals in herd order without rescanning. GameState keeps it current;
+    call ``refresh(a)`` after changing an armadillo's sex, color or stage
+    outside GameState.
+    """
+
+    def __init__(self, herd: Iterable[Armadillo] = ()):
+        self._groups: Dict[Tuple[str, bool], Dict[str, Armadillo]] = {}
+        self._colors: Dict[str, Dict[str, Armadillo]] = {}
+        self._stages: Dict[str, Dict[str, Armadillo]] = {}
+        self._keys: Dict[str, Tuple[Tuple[str, bool], str, str]] = {}
+        self.rebuild(herd)
+
+    def rebuild(self, herd: Iterable[Armadillo]) -> None:
+        self._groups, self._colors, self._stages, self._keys = {}, {}, {}, {}
+        for a in herd:
+            self.add(a)
+
+    # ---- Maintenance --------------------------------------------------------
+
+    def add(self, a: Armadillo) -> None:
+        keys = ((a.sex, a.is_adult), a.color, stage_of(a))
+        self._keys[a.id] = keys
+        self._groups.setdefault(keys[0], {})[a.id] = a
+        self._colors.setdefault(keys[1], {})[a.id] = a
+        self._stages.setdefault(keys[2], {})[a.id] = a
+
+    def remove(self, did: str) -> None:
+        keys = self._keys.pop(did, None)
+        if keys is None:
+            return
+        group, color, stage = keys
+        _discard(self._groups, group, did)
+        _discard(self._colors, color, did)
+        _discard(self._stages, stage, did)
+
+    def refresh(self, a: Armadillo) -> None:
+        if self._keys.get(a.id) != ((a.sex, a.is_adult), a.color, stage_of(a)):
+            self.remove(a.id)
+            self.add(a)
+
+    # ---- Queries ------------------------------------------------------------
+
+    def group(self, sex: str, adult: bool) -> List[Armadillo]:
+        return list(self._groups.get((sex, adult), {}).values())
+
+    def by_color(self, color: str) -> List[Armadillo]:
+        return list(self._colors.get(color, {}).values())
+
+    def by_stage(self, stage: str) -> List[Armadillo]:
+        return list(self._stages.get(stage, {}).values())
+
+    def color_counts(self) -> Dict[str, int]:
+        return {color: len(bucket) for color, bucket in self._colors.items() if bucket}
+
+
+def _discard(buckets: Dict[K, Dict[str, Armadillo]], key: K, did: str) -> None:
+    bucket = buckets.get(key)
+    if bucket is not None:
+        bucket.pop(did, None)
+        if not bucket:
+            del buckets[key]
@@ -0,0 +1,154 @@
+# services/income.py
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from services.herd import ADULT, NO_HABITAT, HerdStore
+from settings import Settings
+
+# Per-habitat running sums over placed adults (w = rarity weight):
+#   0 w, 1 w*h, 2 w*p, 3 w*h*p           -- income terms
+#   4 w[h decays], 5 w[p decays], 6 w[both decay]
+#   7 w*p[h decays], 8 w*h[p decays]      -- needed to advance term 3
+#   9 tick the sums are valid for (advanced lazily on read/event)
+_W, _WH, _WP, _WHP, _AH, _AP, _AHP, _BPH, _BHP, _T = range(10)
+
+
+def _step(acc: List[float], k: int, dh: float, dp: float) -> None:
+    """Advance one set of sums by ``k`` ticks of linear decay (closed form)."""
+    acc[_WHP] -= k * (dh * acc[_BPH] + dp * acc[_BHP] - dh * dp * acc[_AHP]) \
+        - dh * dp * acc[_AHP] * k * (k - 1)
+    acc[_WH] -= k * dh * acc[_AH]
+    acc[_WP] -= k * dp * acc[_AP]
+    acc[_BPH] -= k * dp * acc[_AHP]
+    acc[_BHP] -= k * dh * acc[_AHP]
+
+
+class IncomeRates:
+    """
+    Running per-habitat and farm-wide income rates for a HerdStore.
+
+    Each placed adult earns ``base * w * (c0 + c1*h) * (1 + c2*p)``. Between
+    events hunger and happiness only fall by a fixed step, so the sums above
+    can be advanced k ticks in closed form. ``advance()`` is O(1): each
+    habitat's sums, and the farm-wide ones, catch up lazily when read or
+    touched. Rows are only re-read when they are fed, petted, moved, change
+    stage or clamp at 0 (``remove(row)`` before the change, ``add(row)``
+    after it). The sums are only ever nudged, so ``settle()`` re-sums them
+    from the columns every ``SIM_INCOME_REBUILD_EVERY`` updates to shed
+    float drift.
+    """
+
+    def __init__(self, herd: HerdStore, settings: Settings):
+        self.herd = herd
+        self.settings = settings
+        s = settings
+        self._dh = s.HUNGER_DECAY_PER_TICK
+        self._dp = s.HAPPINESS_DECAY_PER_TICK
+        self._c0 = s.HUNGER_INCOME_MIN_MULT
+        self._c1 = (1 - s.HUNGER_INCOME_MIN_MULT) / s.HUNGER_MAX
+        self._c2 = s.HAPPINESS_INCOME_BONUS_MAX / s.HAPPINESS_MAX
+        self._now = 0
+        self._updates = 0  # events + ticks since the last rebuild
+        self._farm: List[float] = []
+        self._sums: List[List[float]] = []
+        self.rebuild()
+
+    def _new_acc(self) -> List[float]:
+        acc = [0.0] * 10
+        acc[_T] = self._now
+        return acc
+
+    def _sync(self, acc: List[float]) -> List[float]:
+        k = self._now - int(acc[_T])
+        if k:
+            if acc[_W]:
+                _step(acc, k, self._dh, self._dp)
+            acc[_T] = self._now
+        return acc
+
+    def _acc(self, hab: int) -> List[float]:
+        while hab >= len(self._sums):
+            self._sums.append(self._new_acc())
+        return self._sync(self._sums[hab])
+
+    def earns(self, row: int) -> bool:
+        return self.herd.habitat[row] != NO_HABITAT and self.herd.stage[row] >= ADULT
+
+    def _apply(self, row: int, sign: float) -> None:
+        herd = self.herd
+        self._updates += 1
+        w = sign * (1.0 + herd.rarity[row] * self.settings.RARITY_YIELD_MULTIPLIER)
+        h = herd.hunger[row]
+        p = herd.happiness[row]
+        for acc in (self._acc(herd.habitat[row]), self._sync(self._farm)):
+            acc[_W] += w
+            acc[_WH] += w * h
+            acc[_WP] += w * p
+            acc[_WHP] += w * h * p
+            if h > 0:
+                acc[_AH] += w
+                acc[_BPH] += w * p
+            if p > 0:
+                acc[_AP] += w
+                acc[_BHP] += w * h
+                if h > 0:
+                    acc[_AHP] += w
+
+    # ---- Events ------------------------------------------------------------
+
+    def add(self, row: int) -> None:
+        if self.earns(row):
+            self._apply(row, 1.0)
+
+    def remove(self, row: int) -> None:
+        if self.earns(row):
+            self._apply(row, -1.0)
+
+    def decays_linearly(self, row: int) -> bool:
+        """False if this tick's decay clamps the row (its sums must be re-read)."""
+        s = self.settings
+        herd = self.herd
+        h = herd.hunger[row]
+        p = herd.happiness[row]
+        if h > 0 and not 0 < h - self._dh <= s.HUNGER_MAX:
+            return False
+        if p > 0 and not 0 < p - self._dp <= s.HAPPINESS_MAX:
+            return False
+        return True
+
+    def rebuild(self) -> None:
+        self._farm = self._new_acc()
+        self._sums = [self._new_acc() for _ in self.herd.habitat_ids]
+        for row in range(len(self.herd)):
+            self.add(row)
+        self._updates = 0
+
+    def settle(self) -> None:
+        """Rebuild once enough updates piled up; call only between remove/add pairs."""
+        if self._updates >= self.settings.SIM_INCOME_REBUILD_EVERY:
+            self.rebuild()
+
+    # ---- Per tick ------------------------------------------------------------
+
+    def advance(self) -> None:
+        """One tick of linear decay for every set of sums (applied lazily)."""
+        self._now += 1
+        self._updates += 1
+
+    def _rate(self, acc: List[float]) -> float:
+        c0, c1, c2 = self._c0, self._c1, self._c2
+        per_tick = c0 * acc[_W] + c0 * c2 * acc[_WP] + c1 * acc[_WH] + c1 * c2 * acc[_WHP]
+        return self.settings.HABITAT_BASE_YIELD_PER_TICK * per_tick
+
+    def rate(self, hab: Optional[int] = None) -> float:
+        """Coins per tick for one habitat index, or the whole farm."""
+        if hab is None:
+            return self._rate(self._sync(self._farm))
+        if 0 <= hab < len(self._sums):
+            return self._rate(self._acc(hab))
+        return 0.0
+
+    def per_second_by_habitat(self) -> Dict[str, float]:
+        tps = self.settings.TICKS_PER_SEC
+        return {hid: self.rate(i) * tps for i, hid in enumerate(self.herd.habitat_ids)}
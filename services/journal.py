@@ -0,0 +1,261 @@
+# services/journal.py
+"""
+Append-only save journal.
+
+Between full saves, every change GameState publishes is appended as a
+small JSON line and fsync'd, so a save costs O(what changed) and a crash
+loses at most the record being written. Records *set* a value rather
+than apply a delta (e.g. the whole armadillo, the new coin total), so
+replaying the journal on top of any newer snapshot is harmless.
+
+Loading replays the journal onto the last snapshot dict. Once the
+journal grows past ``compact_bytes``, a fresh snapshot goes to the
+SaveWriter and the records it covers are cut from the journal only after
+the background write succeeds; until then the old snapshot plus the
+whole journal still load.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import BinaryIO, Dict, Iterable, List, Optional
+
+from services import events as ev
+from services.events import ChangeEvent
+from services.save_writer import SaveWriter
+from services.state import GameState
+
+# Record ops
+ARM, HAB, COINS, INV, QUEUE, DEX, SEL = "arm", "hab", "coins", "inv", "queue", "dex", "sel"
+
+
+class Journal:
+    def __init__(self, path: str, compact_bytes: int, writer: SaveWriter):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self.writer = writer
+        self.state: Optional[GameState] = None
+        self._pending: List[Dict] = []
+        self._compact_pending = False
+        self._file: Optional[BinaryIO] = None
+        # Appends (state owner) and cuts (writer thread) share the file
+        self._io = threading.Lock()
+        self._offset = 0  # bytes cut from the front so far
+        self._in_flight = 0
+        self.size = 0
+        # Metrics
+        self.records = 0
+        self.compactions = 0
+
+    def attach(self, state: GameState) -> None:
+        """Start journaling ``state`` (compacts first, so the old log gets folded in)."""
+        self.state = state
+        if os.path.exists(self.path):
+            self.size = self._drop_torn_tail()
+        state.subscribe(ev.ANY, self._on_event)
+        state.add_observer(self._commit)
+        self.compact()
+
+    def _drop_torn_tail(self) -> int:
+        """Truncate a half-written last record (replay stops there); returns the size."""
+        with open(self.path, "r+b") as f:
+            data = f.read()
+            keep = data.rfind(b"\n") + 1
+            if keep < len(data):
+                f.truncate(keep)
+                os.fsync(f.fileno())
+        return keep
+
+    def close(self) -> None:
+        with self._io:
+            self._close()
+
+    def _close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    # ---- Recording ---------------------------------------------------------
+
+    def _on_event(self, e: ChangeEvent) -> None:
+        if e.topic == ev.STATE_RESET:
+            self._compact_pending = True
+            return
+        rec = self._record(e)
+        if rec is not None:
+            self._pending.append(rec)
+
+    def _record(self, e: ChangeEvent) -> Optional[Dict]:
+        st = self.state
+        assert st is not None, "journal is not attached"
+        t = e.topic
+        if t in (ev.ARMADILLO_ADDED, ev.ARMADILLO_UPDATED):
+            a = st.get_by_id(e.key) if e.key is not None else None
+            return {"op": ARM, "v": a.to_dict()} if a else None
+        if t == ev.HABITAT_CHANGED:
+            h = st.get_habitat(e.key) if e.key is not None else None
+            return {"op": HAB, "v": h.to_dict()} if h else None
+        if t == ev.COINS_CHANGED:
+            return {"op": COINS, "v": st.coins}
+        if t == ev.INVENTORY_CHANGED:
+            return {"op": INV, "v": dict(st.inventory)}
+        if t == ev.BREEDING_QUEUE_CHANGED:
+            return {"op": QUEUE, "v": [j.to_dict() for j in st.breeding_queue]}
+        if t == ev.DEX_ADDED:
+            return {"op": DEX, "v": e.key}
+        if t == ev.SELECTION_CHANGED:
+            return {"op": SEL, "v": st.selected_id}
+        return None
+
+    def _commit(self) -> None:
+        """Append this notification's records in one write + fsync."""
+        if self._compact_pending:
+            # A reset: nothing journaled before it may replay onto the new state
+            self._pending = []
+            self._compact_pending = False
+            self.compact(wait=True)
+            return
+        if self._pending:
+            blob = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in self._pending).encode("utf-8")
+            self.records += len(self._pending)
+            self._pending = []
+            with self._io:
+                f = self._file
+                if f is None:
+                    f = self._file = open(self.path, "ab")
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+                self.size += len(blob)
+        if self.size > self.compact_bytes and not self._in_flight:
+            self.compact()
+
+    def compact(self, wait: bool = False) -> None:
+        """Submit a full snapshot; the journal is cut once it is written (``wait`` blocks until then)."""
+        assert self.state is not None, "journal is not attached"
+        with self._io:
+            mark = self._offset + self.size
+            self._in_flight += 1
+        self.writer.submit(self.state.snapshot(), lambda ok: self._written(mark, ok))
+        if wait:
+            self.writer.flush()
+
+    def _written(self, mark: int, ok: bool) -> None:
+        # On the writer thread: the snapshot covers every record before ``mark``
+        with self._io:
+            self._in_flight -= 1
+            if not ok:
+                return
+            self.compactions += 1
+            cut = mark - self._offset
+            if cut > 0:
+                self._cut(cut)
+
+    def _cut(self, n: int) -> None:
+        """Drop the first ``n`` bytes, keeping records appended since the snapshot."""
+        self._close()
+        with open(self.path, "rb") as f:
+            f.seek(n)
+            tail = f.read()
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._offset += n
+        self.size = len(tail)
+
+
+# ---- Replay ----------------------------------------------------------------
+
+# Top-level save key each scalar op sets
+_FIELDS = {COINS: "coins", INV: "inventory", QUEUE: "breeding_queue", SEL: "selected_id"}
+
+
+class Overlay:
+    """
+    The net effect of a journal: the last value per field and per armadillo
+    or habitat id. ``apply(d)`` patches a whole save dict; a streamed load
+    patches the header with ``apply_header`` and each herd chunk with
+    ``apply_rows``, then appends ``leftovers()`` (animals born since).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.records = 0
+        self.fields: Dict[str, object] = {}
+        self.dex: List[str] = []
+        self.arms: Dict[str, Dict] = {}
+        self.habs: Dict[str, Dict] = {}
+        if path and os.path.exists(path):
+            self._read(path)
+
+    def _read(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # torn tail from a crash mid-write
+                op, v = rec.get("op"), rec.get("v")
+                if op in (ARM, HAB) and not (isinstance(v, dict) and "id" in v):
+                    continue
+                if op == ARM:
+                    self.arms[v["id"]] = v
+                elif op == HAB:
+                    self.habs[v["id"]] = v
+                elif op in _FIELDS:
+                    self.fields[_FIELDS[op]] = v
+                elif op == DEX:
+                    if v not in self.dex:
+                        self.dex.append(v)
+                else:
+                    continue
+                self.records += 1
+
+    def apply_header(self, d: Dict) -> None:
+        """Patch everything but the herd into ``d`` in place."""
+        d.update(self.fields)
+        if self.dex:
+            dex = d.setdefault("dex_colors", [])
+            dex.extend(c for c in self.dex if c not in dex)
+        if self.habs:
+            _upsert(d.setdefault("habitats", []), self.habs)
+
+    def apply_rows(self, rows: List[Dict]) -> None:
+        """Swap in the journaled version of any animal in ``rows``."""
+        if self.arms:
+            for i, r in enumerate(rows):
+                did = r.get("id")
+                newer = self.arms.get(did) if did is not None else None
+                if newer is not None:
+                    rows[i] = newer
+
+    def leftovers(self, seen: Iterable[str]) -> List[Dict]:
+        """Journaled animals whose id is not in ``seen`` (hatched after the snapshot)."""
+        seen = set(seen)
+        return [v for did, v in self.arms.items() if did not in seen]
+
+    def apply(self, d: Dict) -> int:
+        """Patch a whole save dict in place; returns the records applied."""
+        self.apply_header(d)
+        arms = d.setdefault("armadillos", [])
+        self.apply_rows(arms)
+        arms.extend(self.leftovers(a["id"] for a in arms))
+        return self.records
+
+
+def replay(path: str, d: Dict) -> int:
+    """Apply the journal at ``path`` onto save dict ``d`` in place; returns records applied."""
+    return Overlay(path).apply(d)
+
+
+def _upsert(rows: List[Dict], newer: Dict[str, Dict]) -> None:
+    index = {r["id"]: i for i, r in enumerate(rows)}
+    for rid, value in newer.items():
+        i = index.get(rid)
+        if i is None:
+            rows.append(value)
+        else:
+            rows[i] = value
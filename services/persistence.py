@@ -3,43 +3,111 @@ from __future__ import annotations
 
 import json
 import os
+import tempfile
 from typing import Optional
 
 from kivy.app import App
 
+from services import binfmt, journal
 from services.state import GameState
+from services.stream_load import StreamingLoad
 
 
 class Persistence:
-    def __init__(self):
-        self._path = None
+    """
+    Saves to ``save.json`` (schema 1) or the binary ``save.bin`` (schema 2,
+    see services/binfmt.py). Loading falls back to the other format, and
+    the first save after a switch removes the old file, so changing
+    ``SAVE_SCHEMA_VERSION`` converts a save transparently.
+    """
 
-    def _save_path(self) -> str:
-        if self._path:
-            return self._path
+    def __init__(self, schema_version: int = 1):
+        self.schema_version = schema_version
+        self._base: Optional[str] = None
+
+    def _dir(self) -> str:
+        if self._base:
+            return self._base
         app = App.get_running_app()
         base = app.user_data_dir if app else os.path.join(os.getcwd(), ".userdata")
         if not os.path.isdir(base):
             os.makedirs(base, exist_ok=True)
-        self._path = os.path.join(base, "save.json")
-        return self._path
+        self._base = base
+        return base
 
-    def save(self, state: GameState) -> bool:
+    def _path_for(self, schema_version: int) -> str:
+        return os.path.join(self._dir(), "save.bin" if schema_version >= 2 else "save.json")
+
+    def _save_path(self) -> str:
+        return self._path_for(self.schema_version)
+
+    def _other_path(self) -> str:
+        return self._path_for(1 if self.schema_version >= 2 else 2)
+
+    def journal_path(self) -> str:
+        return os.path.join(self._dir(), "save.journal")
+
+    def encode(self, d: dict) -> bytes:
+        if self.schema_version >= 2:
+            return binfmt.dumps(d)
+        return json.dumps(d, indent=2).encode("utf-8")
+
+    def write(self, state) -> int:
+        """
+        Atomically write ``state.to_dict()`` (a GameState or StateSnapshot);
+        returns the bytes written. Raises on failure.
+        """
         path = self._save_path()
+        blob = self.encode(state.to_dict())
+        fd, tmp = tempfile.mkstemp(prefix="save_", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        other = self._other_path()
+        if os.path.exists(other):
+            os.remove(other)  # converted: the old format is stale now
+        return len(blob)
+
+    def save(self, state: GameState) -> bool:
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(state.to_dict(), f, indent=2)
+            self.write(state)
             return True
         except Exception:
             return False
 
+    def read(self) -> Optional[dict]:
+        """The saved dict in either format (None if there is no save)."""
+        for path in (self._save_path(), self._other_path()):
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                if binfmt.is_binary(f.read(len(binfmt.MAGIC))):
+                    return binfmt.read(path)
+                f.seek(0)
+                return json.load(f)
+        return None
+
+    def stream(self, state: GameState, chunk_rows: int, **kw) -> Optional[StreamingLoad]:
+        """A StreamingLoad of the save with the journal applied (None if there is no save)."""
+        for path in (self._save_path(), self._other_path()):
+            if os.path.exists(path):
+                return StreamingLoad(state, path, chunk_rows, journal.Overlay(self.journal_path()), **kw)
+        return None
+
     def load(self, state: GameState) -> bool:
-        path = self._save_path()
-        if not os.path.exists(path):
-            return False
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                d = json.load(f)
+            d = self.read()
+            if d is None:
+                return False
+            # Changes journaled since that snapshot
+            journal.replay(self.journal_path(), d)
             state.from_dict(d)
             return True
         except Exception:
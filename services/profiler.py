@@ -0,0 +1,108 @@
+# services/profiler.py
+from __future__ import annotations
+
+import json
+from collections import deque
+from time import perf_counter_ns
+from typing import Deque, Dict, Iterable, Optional
+
+
+class TickProfiler:
+    """
+    Per-phase tick timings with rolling percentiles and overrun counters.
+
+    Disabled by default; flip ``enabled`` at runtime. Callers check
+    ``enabled`` once per tick and only then take timestamps, so the disabled
+    cost is a single attribute read. The last ``window`` samples of each
+    phase are kept for p50/p95/p99.
+    """
+
+    def __init__(self, budget_ns: int, phases: Iterable[str] = (), window: int = 1024,
+                 enabled: bool = False):
+        self.budget_ns = budget_ns
+        self.window = window
+        self.enabled = enabled
+        self._samples: Dict[str, Deque[int]] = {}
+        self._totals: Dict[str, int] = {}
+        for name in phases:
+            self._phase(name)
+        self.ticks = 0
+        self.overruns = 0
+        self.worst_ns = 0
+
+    @classmethod
+    def for_tick_rate(cls, ticks_per_sec: int, phases: Iterable[str] = (), **kw) -> "TickProfiler":
+        return cls(1_000_000_000 // ticks_per_sec, phases, **kw)
+
+    def _phase(self, name: str) -> Deque[int]:
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+            self._totals[name] = 0
+        return samples
+
+    def reset(self) -> None:
+        for name in list(self._samples):
+            self._samples[name] = deque(maxlen=self.window)
+            self._totals[name] = 0
+        self.ticks = self.overruns = self.worst_ns = 0
+
+    # ---- Recording ---------------------------------------------------------
+
+    def record(self, phase: str, ns: int) -> None:
+        self._phase(phase).append(ns)
+        self._totals[phase] += ns
+
+    def end_tick(self, total_ns: int) -> None:
+        self.record("tick", total_ns)
+        self.ticks += 1
+        if total_ns > self.budget_ns:
+            self.overruns += 1
+        if total_ns > self.worst_ns:
+            self.worst_ns = total_ns
+
+    def run_phases(self, phases) -> None:
+        """Run ``(name, fn)`` pairs, timing each one and the whole tick."""
+        start = last = perf_counter_ns()
+        for name, fn in phases:
+            fn()
+            now = perf_counter_ns()
+            self.record(name, now - last)
+            last = now
+        self.end_tick(last - start)
+
+    # ---- Reporting ---------------------------------------------------------
+
+    @staticmethod
+    def _percentile(ordered, q: float) -> int:
+        if not ordered:
+            return 0
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self, phase: str) -> Dict[str, float]:
+        ordered = sorted(self._samples.get(phase, ()))
+        return {
+            "count": len(ordered),
+            "p50_us": self._percentile(ordered, 0.50) / 1000,
+            "p95_us": self._percentile(ordered, 0.95) / 1000,
+            "p99_us": self._percentile(ordered, 0.99) / 1000,
+            "max_us": (ordered[-1] if ordered else 0) / 1000,
+            "total_ms": self._totals.get(phase, 0) / 1_000_000,
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "ticks": self.ticks,
+            "budget_us": self.budget_ns / 1000,
+            "overruns": self.overruns,
+            "worst_us": self.worst_ns / 1000,
+            "phases": {name: self.summary(name) for name in self._samples},
+        }
+
+    def dump(self, path: Optional[str] = None) -> str:
+        blob = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(blob)
+        return blob
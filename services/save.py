@@ -1,10 +1,23 @@
 import os, tempfile, json, ujson
-from typing import Dict
+import hashlib
+from typing import Dict, FrozenSet, List, Optional, Set
 from pathlib import Path
 from kivy.app import App
 
 from settings import Settings
 from models.genetics import RNG
+from services import binfmt
+
+# Top-level sections tracked for dirtiness. The remaining keys (coins,
+# collections, tick, rng_seed...) are small and compared on every save, so a
+# change to them can never be skipped.
+SECTIONS = ("habitats", "armadillos", "incubator")
+# Sections that can also be marked one record (by "id") at a time
+RECORD_SECTIONS = ("habitats", "armadillos")
+
+
+def _dumps(value) -> str:
+    return ujson.dumps(value, ensure_ascii=False)
 
 
 class SaveService:
@@ -13,15 +26,135 @@ class SaveService:
         # Use platform-safe per-app directory (Android/iOS/desktop)
         user_dir = Path(App.get_running_app().user_data_dir)
         user_dir.mkdir(parents=True, exist_ok=True)
-        self._path = str(user_dir / self.settings.SAVE_FILENAME)
-        self._last_hash = None  # for change-aware autosave
+        # Schema 2 saves use the binary container (services/binfmt.py)
+        json_path = user_dir / self.settings.SAVE_FILENAME
+        bin_path = json_path.with_suffix(".bin")
+        self._binary = self.settings.SAVE_SCHEMA_VERSION >= 2
+        self._path = str(bin_path if self._binary else json_path)
+        self._other_path = str(json_path if self._binary else bin_path)
+        # Change tracking for atomic_save_if_dirty: callers mark what they
+        # touch, and the JSON writer splices the cached text of every clean
+        # section (and clean record) back in instead of re-encoding it.
+        self._dirty: Set[str] = set(SECTIONS)
+        self._dirty_records: Dict[str, Set[str]] = {}
+        self._header_text: Optional[str] = None  # untracked keys as last saved
+        self._fragments: Dict[str, str] = {}
+        self._record_fragments: Dict[str, Dict[str, str]] = {}
+        # Optional hash tree: record digests -> section digests -> root
+        self._hash_tree = self.settings.SAVE_HASH_TREE
+        self._digests: Dict[str, bytes] = {}
+        self._record_digests: Dict[str, Dict[str, bytes]] = {}
+        self._root: Optional[bytes] = None
+
+    # ---- Change tracking ----
+    def mark_dirty(self, section: str, record_id: Optional[str] = None) -> None:
+        """Note a change to ``section``, or to the one record ``record_id`` in it."""
+        if section not in SECTIONS:
+            return  # untracked keys are compared on every save
+        if record_id is not None and section in RECORD_SECTIONS:
+            if section not in self._dirty:
+                self._dirty_records.setdefault(section, set()).add(record_id)
+        else:
+            self._dirty.add(section)
+            self._dirty_records.pop(section, None)
+
+    def mark_all_dirty(self) -> None:
+        """Force the next save to re-encode everything."""
+        self._dirty.update(SECTIONS)
+        self._dirty_records.clear()
+
+    @property
+    def dirty(self) -> FrozenSet[str]:
+        """Sections changed since the last save (record-level marks included)."""
+        return frozenset(self._dirty).union(self._dirty_records)
+
+    def dirty_records(self, section: str) -> FrozenSet[str]:
+        """Ids marked in ``section``; empty when clean or marked as a whole."""
+        return frozenset(self._dirty_records.get(section, ()))
 
-    def _state_hash(self, state: Dict) -> str:
-        """Stable content hash so we only write when something changed."""
-        import hashlib
-        # json (not ujson) for sort_keys to produce deterministic blob
-        blob = json.dumps(state, sort_keys=True, separators=(",", ":")).encode("utf-8")
-        return hashlib.sha256(blob).hexdigest()
+    @property
+    def root_hash(self) -> Optional[str]:
+        """Hash-tree root of the last JSON save (SAVE_HASH_TREE only)."""
+        return self._root.hex() if self._root is not None else None
+
+    def _header(self, state: Dict) -> str:
+        return ",".join(_dumps(k) + ":" + _dumps(v) for k, v in state.items() if k not in SECTIONS)
+
+    def _mark_clean(self, state: Dict, header: Optional[str] = None) -> str:
+        self._dirty.clear()
+        self._dirty_records.clear()
+        self._header_text = self._header(state) if header is None else header
+        return self._header_text
+
+    def _forget_fragments(self) -> None:
+        self._fragments.clear()
+        self._record_fragments.clear()
+        self._digests.clear()
+        self._record_digests.clear()
+        self._root = None
+
+    def _records_text(self, key: str, records: List, full: bool) -> str:
+        marked = self._dirty_records.get(key, ())
+        cache = {} if full else self._record_fragments.get(key, {})
+        digests = {} if full else self._record_digests.get(key, {})
+        texts: Dict[str, str] = {}
+        leaves: List[bytes] = []
+        parts = []
+        for rec in records:
+            rid = rec.get("id") if isinstance(rec, dict) else None
+            text = cache.get(rid) if rid is not None and rid not in marked else None
+            if text is None:
+                text = _dumps(rec)
+                if self._hash_tree:
+                    leaves.append(hashlib.sha256(text.encode("utf-8")).digest())
+            elif self._hash_tree and rid is not None:
+                leaves.append(digests[rid])
+            if rid is not None:
+                texts[rid] = text
+            parts.append(text)
+        # Records without (unique) ids cannot be reused next time
+        reusable = len(texts) == len(records)
+        self._record_fragments[key] = texts if reusable else {}
+        if self._hash_tree:
+            self._record_digests[key] = dict(zip(texts, leaves)) if reusable else {}
+            self._digests[key] = hashlib.sha256(b"".join(leaves)).digest()
+        return "[" + ",".join(parts) + "]"
+
+    def _section_text(self, key: str, value, full: bool) -> str:
+        text = None if full or key in self._dirty or key in self._dirty_records else self._fragments.get(key)
+        if text is None:
+            if key in RECORD_SECTIONS and isinstance(value, list):
+                text = self._records_text(key, value, full or key in self._dirty)
+            else:
+                text = _dumps(value)
+                if self._hash_tree:
+                    self._digests[key] = hashlib.sha256(text.encode("utf-8")).digest()
+            self._fragments[key] = text
+        return text
+
+    def encode(self, state: Dict, full: bool = False) -> str:
+        """
+        The JSON save text for ``state``, re-encoding only dirty sections
+        (everything if ``full``). Marks the state clean.
+        """
+        parts = []
+        untracked = []
+        for key, value in state.items():
+            if key in SECTIONS:
+                parts.append(_dumps(key) + ":" + self._section_text(key, value, full))
+            else:
+                untracked.append(_dumps(key) + ":" + _dumps(value))
+                parts.append(untracked[-1])
+        for key in set(self._fragments).difference(state):
+            self._fragments.pop(key)
+            self._record_fragments.pop(key, None)
+            self._digests.pop(key, None)
+        header = self._mark_clean(state, ",".join(untracked))
+        if self._hash_tree:
+            tree = [header.encode("utf-8")]
+            tree.extend(self._digests[k] for k in SECTIONS if k in state)
+            self._root = hashlib.sha256(b"".join(tree)).digest()
+        return "{" + ",".join(parts) + "}"
 
     def default_state(self) -> Dict:
         return {
@@ -40,31 +173,46 @@ class SaveService:
         return state
 
     def load_or_init(self) -> Dict:
-        if not os.path.exists(self._path):
+        path = self._path if os.path.exists(self._path) else self._other_path
+        if not os.path.exists(path):
             state = self.default_state()
             self.atomic_save(state)  # initial write
-            self._last_hash = self._state_hash(state)
             return state
 
-        with open(self._path, "r", encoding="utf-8") as f:
-            text = f.read()
+        with open(path, "rb") as f:
+            blob = f.read()
+        if binfmt.is_binary(blob):
+            state = binfmt.loads(blob)
+        else:
+            text = blob.decode("utf-8")
             try:
                 state = ujson.loads(text)
             except Exception:
                 state = json.loads(text)
         state = self.migrate(state)
-        self._last_hash = self._state_hash(state)
+        self._forget_fragments()
+        self._mark_clean(state)
         return state
 
     def atomic_save(self, state: Dict):
+        """Write all of ``state``, whatever is marked."""
+        if self._binary:
+            blob = binfmt.dumps(state)
+            self._mark_clean(state)
+        else:
+            blob = self.encode(state, full=True).encode("utf-8")
+        self._write(blob)
+
+    def _write(self, blob: bytes) -> None:
         tmp_fd, tmp_path = tempfile.mkstemp(prefix="armadillo_save_", suffix=".tmp")
         try:
-            with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmpf:
-                tmpf.write(ujson.dumps(state, ensure_ascii=False))
+            with os.fdopen(tmp_fd, "wb") as tmpf:
+                tmpf.write(blob)
                 tmpf.flush()
                 os.fsync(tmpf.fileno())
             os.replace(tmp_path, self._path)
-            self._last_hash = self._state_hash(state)
+            if os.path.exists(self._other_path):
+                os.remove(self._other_path)  # converted from the other format
         finally:
             try:
                 if os.path.exists(tmp_path):
@@ -72,8 +220,20 @@ class SaveService:
             except Exception:
                 pass
 
-    def atomic_save_if_dirty(self, state: Dict):
-        """Only write if content actually changed since last save."""
-        h = self._state_hash(state)
-        if h != self._last_hash:
-            self.atomic_save(state)
+    def atomic_save_if_dirty(self, state: Dict) -> bool:
+        """
+        Only write if something was marked (or an untracked key changed)
+        since the last save; returns whether it wrote. With SAVE_HASH_TREE,
+        marked sections that re-encode to the same bytes skip the write too.
+        """
+        if not self._dirty and not self._dirty_records and self._header(state) == self._header_text:
+            return False
+        if self._binary:
+            self.atomic_save(state)  # columnar: the container is rebuilt whole
+            return True
+        before = self._root
+        text = self.encode(state)
+        if self._hash_tree and before is not None and self._root == before:
+            return False
+        self._write(text.encode("utf-8"))
+        return True
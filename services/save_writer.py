@@ -0,0 +1,192 @@
+# services/save_writer.py
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from settings import Settings
+
+
+class SaveWriter:
+    """
+    Writes state snapshots on a background thread.
+
+    ``submit(snapshot)`` never blocks: it replaces whatever is waiting, so
+    when writes fall behind only the newest snapshot is written. A pending
+    snapshot is written once submits have been quiet for ``min_interval_s``
+    (and at least that long after the last write), but never later than
+    ``max_staleness_s`` after it first became pending, so a steady stream of
+    submits still gets saved. ``flush()`` writes the pending snapshot now
+    (pause/stop).
+
+    ``write(snapshot)`` does the I/O and returns the number of bytes written.
+    ``submit(snapshot, on_done)`` calls ``on_done(ok)`` on the writer thread
+    once that snapshot, or a newer one that replaced it, has been written.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[object], int],
+        min_interval_s: float,
+        max_staleness_s: float,
+        clock: Callable[[], float] = time.monotonic,
+        window: int = 256,
+    ):
+        self._write = write
+        self.min_interval_s = min_interval_s
+        self.max_staleness_s = max_staleness_s
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._pending: Optional[object] = None
+        self._on_done: List[Callable[[bool], None]] = []
+        self._pending_since = 0.0
+        self._last_submit = 0.0
+        self._last_write = float("-inf")
+        self._flush_requested = False
+        self._writing = False
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        # Metrics
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.bytes_written = 0
+        self.last_bytes = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    @classmethod
+    def from_settings(cls, write: Callable[[object], int], settings: Settings, **kw) -> "SaveWriter":
+        return cls(write, settings.SAVE_MIN_INTERVAL_SEC, settings.SAVE_MAX_STALENESS_SEC, **kw)
+
+    # ---- Caller side -------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot: object, on_done: Optional[Callable[[bool], None]] = None) -> None:
+        with self._cond:
+            self._last_submit = self.clock()
+            if self._pending is None:
+                self._pending_since = self._last_submit
+            else:
+                self.coalesced += 1
+            self._pending = snapshot
+            if on_done is not None:
+                self._on_done.append(on_done)
+            self._cond.notify()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write the pending snapshot now; True once nothing is left to write."""
+        if not (self._thread and self._thread.is_alive()):
+            self._write_pending()
+            return self._pending is None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify()
+            while self._pending is not None or self._writing:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+            return True
+
+    def poll(self) -> bool:
+        """Write the pending snapshot if it is due; for driving the writer without its thread."""
+        with self._cond:
+            due = self._pending is not None and self._due_at() <= self.clock()
+        if due:
+            self._write_pending()
+        return due
+
+    def stop(self, timeout: Optional[float] = 5.0) -> bool:
+        """Flush, then end the writer thread."""
+        done = self.flush(timeout)
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        return done
+
+    # ---- Writer side -------------------------------------------------------
+
+    def _due_at(self) -> float:
+        quiet = max(self._last_submit, self._last_write) + self.min_interval_s
+        return min(quiet, self._pending_since + self.max_staleness_s)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stop:
+                    if self._pending is not None:
+                        wait = self._due_at() - self.clock()
+                        if self._flush_requested or wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._flush_requested = False
+                        self._cond.notify_all()
+                        self._cond.wait()
+                if self._stop:
+                    return
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        with self._cond:
+            snapshot, self._pending = self._pending, None
+            if snapshot is None:
+                return
+            on_done, self._on_done = self._on_done, []
+            self._writing = True
+        start = time.perf_counter()
+        try:
+            n = self._write(snapshot)
+        except Exception as exc:
+            self.errors += 1
+            logging.warning("Save failed: %s", exc)
+            ok = False
+        else:
+            ok = True
+            self.writes += 1
+            self.last_bytes = n
+            self.bytes_written += n
+            self._latencies.append(time.perf_counter() - start)
+        for cb in on_done:
+            try:
+                cb(ok)
+            except Exception:
+                logging.exception("Save callback failed")
+        with self._cond:
+            self._writing = False
+            self._last_write = self.clock()
+            if self._pending is None:
+                self._flush_requested = False
+            self._cond.notify_all()
+
+    # ---- Reporting ---------------------------------------------------------
+
+    def metrics(self) -> Dict[str, float]:
+        ordered = sorted(self._latencies)
+
+        def pct(q: float) -> float:
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+
+        return {
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "bytes_written": self.bytes_written,
+            "last_bytes": self.last_bytes,
+            "latency_p50_ms": pct(0.50),
+            "latency_p95_ms": pct(0.95),
+            "latency_max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        }
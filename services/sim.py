@@ -1,96 +1,485 @@
-from typing import Dict, List
+import heapq
+import math
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
 from settings import Settings
-from models.armadillo import Armadillo
 from models.habitat import Habitat
+from services import sim_numpy
+from services.herd import HerdStore, EGG, JUVENILE, ADULT, RETIRED
+from services.income import IncomeRates
+from services.profiler import TickProfiler
+
+
+def _linear_product_sum(m: int, a: float, b: float, c: float, d: float) -> float:
+    """Sum of (a + b*u) * (c + d*u) for u = 0 .. m-1."""
+    s1 = m * (m - 1) / 2
+    s2 = (m - 1) * m * (2 * m - 1) / 6
+    return m * a * c + (a * d + b * c) * s1 + b * d * s2
+
+
+def _steps_to_zero(value: float, decay: float) -> Optional[int]:
+    """Decay steps until ``value`` first reads 0 (None if it never does)."""
+    if value <= 0:
+        return 0
+    if decay <= 0:
+        return None
+    return math.ceil(value / decay)
 
 
 class SimService:
-    def __init__(self, settings: Settings, state: Dict, econ, save):
+    def __init__(self, settings: Settings, state: Dict, econ, save, vectorized: Optional[bool] = None):
         self.settings = settings
         self.state = state
         self.econ = econ
         self.save = save
         self._payout_counter = 0
+        # What changed since the last flush, for the save's dirty tracking
+        self._flushed_tick = state.get("tick", 0)
+        self._touched_rows: Set[int] = set()
+        self._incubator_changed = False
+        # Whole-array kernel when NumPy is available; scalar loop otherwise.
+        if vectorized is None:
+            vectorized = sim_numpy.HAS_NUMPY
+        self.vectorized = vectorized and sim_numpy.HAS_NUMPY
+        self.herd = HerdStore(
+            state.setdefault("armadillos", []),
+            [h["id"] for h in state.get("habitats", [])],
+        )
+        # Min-heap of (absolute tick of next stage step, row).
+        self._stage_heap: List[Tuple[int, int]] = []
+        self._rebuild_stage_heap()
+        self._load_incubator()
+        # Running income rates, touched only on feed/pet/move/stage/clamp events.
+        self.income = IncomeRates(self.herd, settings)
+
+        # Tick phases in order; named for the profiler.
+        self._phases = (
+            ("aging", self._aging_phase),
+            ("stages", self._stage_phase),
+            ("decay", self._decay_phase),
+            ("income", self.habitat_income_tick),
+            ("incubator", self.process_incubator),
+            ("payout", self._payout_phase),
+        )
+        self.profiler = TickProfiler.for_tick_rate(settings.TICKS_PER_SEC, [name for name, _ in self._phases])
 
     # -------- state helpers --------
-    def get_armadillos(self) -> List[Armadillo]:
-        return [Armadillo.from_dict(d) for d in self.state["armadillos"]]
+    def flush(self) -> Dict:
+        """Write the herd columns back into ``state`` (call before save/export)."""
+        self.herd.sync()
+        self.state["incubator"] = self.incubator_entries()
+        if self.save is not None:
+            self._mark_saved_sections()
+        return self.state
+
+    def _mark_saved_sections(self) -> None:
+        """Tell the save which sections the sim changed since the last flush."""
+        save = self.save
+        if self.state.get("tick", 0) != self._flushed_tick:
+            # A tick ages every row and counts eggs down
+            for section in ("armadillos", "incubator"):
+                save.mark_dirty(section)
+            self._flushed_tick = self.state.get("tick", 0)
+        else:
+            records = self.herd.records
+            for row in self._touched_rows:
+                save.mark_dirty("armadillos", records[row].get("id"))
+            if self._incubator_changed:
+                save.mark_dirty("incubator")
+        self._touched_rows.clear()
+        self._incubator_changed = False
 
-    def set_armadillos(self, lst: List[Armadillo]):
-        self.state["armadillos"] = [a.to_dict() for a in lst]
+    def export_armadillos(self) -> List[Dict]:
+        return [dict(d) for d in self.herd.sync()]
 
     def get_habitats(self) -> List[Habitat]:
         return [Habitat.from_dict(d) for d in self.state["habitats"]]
 
     def set_habitats(self, lst: List[Habitat]):
         self.state["habitats"] = [h.to_dict() for h in lst]
+        for h in lst:
+            self.herd.habitat_index(h.id)
+        if self.save is not None:
+            self.save.mark_dirty("habitats")
+
+    def income_per_sec(self, habitat_id: Optional[str] = None) -> float:
+        """Current coins/sec for one habitat or the whole farm (cached, O(1)-ish)."""
+        hab = None if habitat_id is None else self.herd.habitat_index(habitat_id)
+        return self.income.rate(hab) * self.settings.TICKS_PER_SEC
 
     # -------- game logic --------
-    def advance_age_and_stage(self, a: Armadillo):
-        a.age_ticks += 1
-        if a.stage == "egg" and a.age_ticks >= self.settings.EGG_TICKS:
-            a.stage = "juvenile"
-            a.nickname = "Hatchling"
-        elif a.stage == "juvenile" and a.age_ticks >= self.settings.JUVENILE_TICKS:
-            a.stage = "adult"
-        elif a.stage == "adult" and a.age_ticks >= self.settings.RETIRE_AGE_TICKS:
-            a.stage = "retired"
-
-    def mood_decay_tick(self, a: Armadillo):
-        if a.stage != "egg":
-            a.hunger = max(0, min(self.settings.HUNGER_MAX, a.hunger - self.settings.HUNGER_DECAY_PER_TICK))
-            a.happiness = max(0, min(self.settings.HAPPINESS_MAX, a.happiness - self.settings.HAPPINESS_DECAY_PER_TICK))
+    def _stage_limit(self, stage: int) -> Optional[int]:
+        if stage == EGG:
+            return self.settings.EGG_TICKS
+        if stage == JUVENILE:
+            return self.settings.JUVENILE_TICKS
+        if stage == ADULT:
+            return self.settings.RETIRE_AGE_TICKS
+        return None
+
+    def ticks_to_next_stage(self, stage: int, age_ticks: int) -> Optional[int]:
+        """Ticks until a row at ``stage``/``age_ticks`` takes its next stage step."""
+        limit = self._stage_limit(stage)
+        if limit is None:
+            return None
+        return max(1, limit - age_ticks)
+
+    def _schedule_stage(self, row: int, now: int) -> None:
+        step = self.ticks_to_next_stage(self.herd.stage[row], self.herd.age_ticks[row])
+        if step is not None:
+            heapq.heappush(self._stage_heap, (now + step, row))
+
+    def _rebuild_stage_heap(self) -> None:
+        now = self.state.get("tick", 0)
+        herd = self.herd
+        heap = []
+        for row in range(len(herd)):
+            step = self.ticks_to_next_stage(herd.stage[row], herd.age_ticks[row])
+            if step is not None:
+                heap.append((now + step, row))
+        heapq.heapify(heap)
+        self._stage_heap = heap
+
+    def advance_age(self, row: int):
+        self.herd.age_ticks[row] += 1
+
+    def advance_stage(self, row: int):
+        herd = self.herd
+        stage = herd.stage[row]
+        if stage == EGG:
+            herd.stage[row] = JUVENILE
+            herd.records[row]["nickname"] = "Hatchling"
+        elif stage == JUVENILE:
+            herd.stage[row] = ADULT
+            self.income.add(row)
+        elif stage == ADULT:
+            herd.stage[row] = RETIRED
+
+    def process_stage_transitions(self, now: int):
+        """Pop only the rows whose next stage step is due at tick ``now``."""
+        heap = self._stage_heap
+        herd = self.herd
+        while heap and heap[0][0] <= now:
+            _due, row = heapq.heappop(heap)
+            limit = self._stage_limit(herd.stage[row])
+            if limit is not None and herd.age_ticks[row] >= limit:
+                self.advance_stage(row)
+            self._schedule_stage(row, now)
+
+    def feed(self, row: int, amount: float):
+        herd = self.herd
+        self.income.remove(row)
+        herd.hunger[row] = max(0, min(self.settings.HUNGER_MAX, herd.hunger[row] + amount))
+        self._touched_rows.add(row)
+        self.income.add(row)
+
+    def pet(self, row: int, amount: float):
+        herd = self.herd
+        self.income.remove(row)
+        herd.happiness[row] = max(0, min(self.settings.HAPPINESS_MAX, herd.happiness[row] + amount))
+        self._touched_rows.add(row)
+        self.income.add(row)
+
+    def move(self, row: int, habitat_id: Optional[str]) -> bool:
+        """Move ``row`` into ``habitat_id`` (None unhouses it); False if it has no room."""
+        herd = self.herd
+        old = herd.habitat_id(row)
+        if habitat_id == old:
+            return True
+        target = self._habitat(habitat_id) if habitat_id else None
+        if habitat_id and (target is None or len(target["occupants"]) >= target.get("capacity", 0)):
+            return False
+        did = herd.records[row].get("id")
+        source = self._habitat(old) if old else None
+        if source is not None and did in source["occupants"]:
+            source["occupants"].remove(did)
+        if target is not None:
+            target["occupants"].append(did)
+        self.income.remove(row)
+        herd.habitat[row] = herd.habitat_index(habitat_id)
+        self._touched_rows.add(row)
+        self.income.add(row)
+        if self.save is not None:
+            self.save.mark_dirty("habitats")
+        return True
+
+    def _habitat(self, habitat_id: str) -> Optional[Dict]:
+        for h in self.state.get("habitats", ()):
+            if h["id"] == habitat_id:
+                return h
+        return None
+
+    def mood_decay_tick(self, row: int):
+        herd = self.herd
+        if herd.stage[row] != EGG:
+            herd.hunger[row] = max(0, min(self.settings.HUNGER_MAX, herd.hunger[row] - self.settings.HUNGER_DECAY_PER_TICK))
+            herd.happiness[row] = max(0, min(self.settings.HAPPINESS_MAX, herd.happiness[row] - self.settings.HAPPINESS_DECAY_PER_TICK))
 
     def habitat_income_tick(self):
-        total = 0.0
-        for a in self.get_armadillos():
-            if a.habitat_id and a.stage in ("adult", "retired"):
-                rarity_weight = (1.0 + a.rarity * self.settings.RARITY_YIELD_MULTIPLIER)
-                hunger_mult = self.settings.HUNGER_INCOME_MIN_MULT + \
-                              (1 - self.settings.HUNGER_INCOME_MIN_MULT) * (a.hunger / self.settings.HUNGER_MAX)
-                happy_mult = 1.0 + self.settings.HAPPINESS_INCOME_BONUS_MAX * (a.happiness / self.settings.HAPPINESS_MAX)
-                total += self.settings.HABITAT_BASE_YIELD_PER_TICK * rarity_weight * hunger_mult * happy_mult
+        self.income.settle()  # every row is back in the sums after the decay phase
+        total = self.income.rate()
         if total > 0:
             self.econ.add_coins(total)
 
+    def scan_income(self) -> float:
+        """Income for this tick recomputed from every row (reference check)."""
+        if self.vectorized:
+            return sim_numpy.habitat_income(self.herd, self.settings)
+        s = self.settings
+        herd = self.herd
+        total = 0.0
+        for i in range(len(herd)):
+            if herd.habitat[i] >= 0 and herd.stage[i] >= ADULT:
+                rarity_weight = (1.0 + herd.rarity[i] * s.RARITY_YIELD_MULTIPLIER)
+                hunger_mult = s.HUNGER_INCOME_MIN_MULT + \
+                              (1 - s.HUNGER_INCOME_MIN_MULT) * (herd.hunger[i] / s.HUNGER_MAX)
+                happy_mult = 1.0 + s.HAPPINESS_INCOME_BONUS_MAX * (herd.happiness[i] / s.HAPPINESS_MAX)
+                total += s.HABITAT_BASE_YIELD_PER_TICK * rarity_weight * hunger_mult * happy_mult
+        return total
+
     # -------- incubator --------
-    def start_incubation(self, egg: Armadillo):
-        self.state.setdefault("incubator", [])
-        self.state["incubator"].append({
-            "child": egg.to_dict(),
-            "ticks_left": self.settings.EGG_TICKS
-        })
+    # Eggs are kept as absolute hatch ticks: a dict (seq -> entry) in queue
+    # order plus a (hatch_tick, seq) min-heap with lazy deletion, so a tick
+    # with nothing due is O(1). state["incubator"] keeps the ticks_left
+    # layout and is rewritten by flush().
+    def _load_incubator(self) -> None:
+        self._incubator: Dict[int, Dict] = {}
+        self._incubator_heap: List[Tuple[int, int]] = []
+        self._incubator_seq = 0
+        for entry in self.state.get("incubator", []):
+            self._push_egg(entry["child"], entry["ticks_left"])
+
+    def _push_egg(self, child: Dict, ticks_left: int) -> None:
+        seq = self._incubator_seq
+        self._incubator_seq += 1
+        hatch_tick = self.state.get("tick", 0) + max(1, ticks_left)
+        self._incubator[seq] = {"child": child, "hatch_tick": hatch_tick}
+        heapq.heappush(self._incubator_heap, (hatch_tick, seq))
+
+    def incubator_entries(self) -> List[Dict]:
+        """Incubator in the persisted ``ticks_left`` layout, queue order."""
+        now = self.state.get("tick", 0)
+        return [{"child": e["child"], "ticks_left": e["hatch_tick"] - now}
+                for e in self._incubator.values()]
+
+    def start_incubation(self, egg, ticks: Optional[int] = None):
+        child = egg.to_dict() if hasattr(egg, "to_dict") else dict(egg)
+        self._push_egg(child, self.settings.EGG_TICKS if ticks is None else ticks)
+        self._incubator_changed = True
+
+    def _hatch(self, entry: Dict) -> int:
+        child = dict(entry["child"])
+        child["stage"] = "juvenile"
+        child["age_ticks"] = 0
+        # Grows into the habitat it was bred for if there is room, else unhoused
+        habitat_id, child["habitat_id"] = child.get("habitat_id"), None
+        row = self.herd.append(child)
+        if habitat_id:
+            self.move(row, habitat_id)
+        return row
 
     def process_incubator(self):
-        remaining = []
-        for entry in self.state.get("incubator", []):
-            entry["ticks_left"] -= 1
-            if entry["ticks_left"] <= 0:
-                child = Armadillo.from_dict(entry["child"])
-                child.stage = "juvenile"
-                child.age_ticks = 0
-                self.state["armadillos"].append(child.to_dict())
-            else:
-                remaining.append(entry)
-        self.state["incubator"] = remaining
+        now = self.state["tick"]
+        heap = self._incubator_heap
+        while heap and heap[0][0] <= now:
+            hatch_tick, seq = heapq.heappop(heap)
+            entry = self._incubator.get(seq)
+            if entry is None or entry["hatch_tick"] != hatch_tick:
+                continue  # superseded by speed_up_incubator
+            del self._incubator[seq]
+            self._schedule_stage(self._hatch(entry), now)
 
     def speed_up_incubator(self, idx: int, ticks: int):
-        inc = self.state.setdefault("incubator", [])
-        if 0 <= idx < len(inc):
-            inc[idx]["ticks_left"] = max(0, inc[idx]["ticks_left"] - ticks)
+        if not 0 <= idx < len(self._incubator):
+            return
+        seq = next(islice(self._incubator, idx, None))
+        entry = self._incubator[seq]
+        now = self.state.get("tick", 0)
+        ticks_left = max(0, entry["hatch_tick"] - now - ticks)
+        entry["hatch_tick"] = now + max(1, ticks_left)
+        # decrease-key: the old heap item is skipped when popped
+        heapq.heappush(self._incubator_heap, (entry["hatch_tick"], seq))
+        self._incubator_changed = True
+
+    # -------- offline catch-up --------
+    def _income_between(self, first: int, last: int, decay_from: int,
+                        hunger: float, happiness: float, rarity: float) -> float:
+        """Closed-form income for ticks first..last of one placed adult.
+
+        ``hunger``/``happiness`` are the values after the first decay tick
+        (``decay_from``); both fall linearly until they clamp at 0.
+        """
+        s = self.settings
+        dh, dp = s.HUNGER_DECAY_PER_TICK, s.HAPPINESS_DECAY_PER_TICK
+        h_steps = _steps_to_zero(hunger, dh)
+        p_steps = _steps_to_zero(happiness, dp)
+        h_zero = decay_from + h_steps if h_steps is not None else last + 1
+        p_zero = decay_from + p_steps if p_steps is not None else last + 1
+        c_h = (1 - s.HUNGER_INCOME_MIN_MULT) / s.HUNGER_MAX
+        c_p = s.HAPPINESS_INCOME_BONUS_MAX / s.HAPPINESS_MAX
+
+        # Split the window where either stat stops decaying; each piece is a
+        # product of two linear terms.
+        cuts = sorted({first, last + 1} | {z for z in (h_zero, p_zero) if first < z <= last})
+        total = 0.0
+        for a, b in zip(cuts, cuts[1:]):
+            h_a = max(0.0, hunger - (a - decay_from) * dh)
+            p_a = max(0.0, happiness - (a - decay_from) * dp)
+            total += _linear_product_sum(
+                b - a,
+                s.HUNGER_INCOME_MIN_MULT + c_h * h_a, -c_h * dh if a < h_zero else 0.0,
+                1.0 + c_p * p_a, -c_p * dp if a < p_zero else 0.0,
+            )
+        return s.HABITAT_BASE_YIELD_PER_TICK * (1.0 + rarity * s.RARITY_YIELD_MULTIPLIER) * total
+
+    def _fast_forward_row(self, row: int, n: int) -> float:
+        """Advance one row by ``n`` ticks and return the income it earned."""
+        s = self.settings
+        herd = self.herd
+        stage = herd.stage[row]
+        age = herd.age_ticks[row]
+        decay_from = 1 if stage != EGG else None
+        earn_from = 1 if stage >= ADULT else None
+
+        t = 0
+        while True:
+            step = self.ticks_to_next_stage(stage, age + t)
+            if step is None or t + step > n:
+                break
+            t += step
+            stage += 1
+            if stage == JUVENILE:
+                decay_from = t
+                herd.records[row]["nickname"] = "Hatchling"
+            elif stage == ADULT:
+                earn_from = t
+        herd.stage[row] = stage
+        herd.age_ticks[row] = age + n
+
+        if decay_from is None:
+            return 0.0
+        decay_ticks = n - decay_from + 1
+        hunger = max(0, min(s.HUNGER_MAX, herd.hunger[row] - s.HUNGER_DECAY_PER_TICK))
+        happiness = max(0, min(s.HAPPINESS_MAX, herd.happiness[row] - s.HAPPINESS_DECAY_PER_TICK))
+        herd.hunger[row] = max(0, hunger - (decay_ticks - 1) * s.HUNGER_DECAY_PER_TICK)
+        herd.happiness[row] = max(0, happiness - (decay_ticks - 1) * s.HAPPINESS_DECAY_PER_TICK)
+
+        if earn_from is None or herd.habitat[row] < 0:
+            return 0.0
+        return self._income_between(earn_from, n, decay_from, hunger, happiness, herd.rarity[row])
+
+    def fast_forward(self, n_ticks: int) -> float:
+        """
+        Advance the sim by ``n_ticks`` in O(herd) instead of O(n_ticks * herd).
+
+        Gives the same herd, incubator and coin totals as calling ``tick``
+        ``n_ticks`` times (up to float rounding), including stage changes and
+        incubator hatches inside the window. Returns the coins earned.
+        """
+        n = int(n_ticks)
+        if n <= 0:
+            return 0.0
+        income = 0.0
+        for row in range(len(self.herd)):
+            income += self._fast_forward_row(row, n)
+
+        # Eggs hatch at the end of their hatch tick, in queue order, then
+        # live through the rest of the window as juveniles.
+        start = self.state["tick"]
+        heap = self._incubator_heap
+        while heap and heap[0][0] <= start + n:
+            hatch_tick, seq = heapq.heappop(heap)
+            entry = self._incubator.get(seq)
+            if entry is None or entry["hatch_tick"] != hatch_tick:
+                continue
+            del self._incubator[seq]
+            income += self._fast_forward_row(self._hatch(entry), start + n - hatch_tick)
+
+        self.state["tick"] += n
+        self._rebuild_stage_heap()
+        self.income.rebuild()
+        self._payout_counter = (self._payout_counter + n) % self.settings.ECON_PAYOUT_INTERVAL_TICKS
+        if income > 0:
+            self.econ.add_coins(income)
+        return income
 
     # -------- main tick --------
-    def tick(self, dt):
-        self.state["tick"] += 1
-        arms = self.get_armadillos()
-        for a in arms:
-            self.advance_age_and_stage(a)
-            self.mood_decay_tick(a)
-        self.set_armadillos(arms)
+    def _aging_phase(self):
+        if self.vectorized:
+            sim_numpy.advance_age(self.herd)
+        else:
+            for i in range(len(self.herd)):
+                self.advance_age(i)
+
+    def _stage_phase(self):
+        self.process_stage_transitions(self.state["tick"])
 
-        self.habitat_income_tick()
-        self.process_incubator()
+    def _decay_phase(self):
+        # Rows that clamp this tick leave the income sums before decaying and
+        # rejoin with their new values once the linear step is applied.
+        income = self.income
+        if self.vectorized:
+            clamping = sim_numpy.clamping_rows(self.herd, self.settings)
+            for row in clamping:
+                income.remove(row)
+            sim_numpy.mood_decay(self.herd, self.settings)
+        else:
+            clamping = []
+            for i in range(len(self.herd)):
+                if income.earns(i) and not income.decays_linearly(i):
+                    income.remove(i)
+                    clamping.append(i)
+                self.mood_decay_tick(i)
+        income.advance()
+        for row in clamping:
+            income.add(row)
 
+    def _payout_phase(self):
         self._payout_counter += 1
         if self._payout_counter >= self.settings.ECON_PAYOUT_INTERVAL_TICKS:
             self._payout_counter = 0
+
+    def tick(self, dt):
+        self.state["tick"] += 1
+        if self.profiler.enabled:
+            self.profiler.run_phases(self._phases)
+        else:
+            for _name, phase in self._phases:
+                phase()
+
+
+def main(argv=None) -> None:
+    """Headless benchmark: ``python -m services.sim --ticks N --herd M``."""
+    import argparse
+    import time
+
+    from services.driver import FixedStepDriver, StateWallet, make_headless_state
+
+    parser = argparse.ArgumentParser(description="Run the farm simulation without a window.")
+    parser.add_argument("--ticks", type=int, default=20 * 60)
+    parser.add_argument("--herd", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1337)
+    parser.add_argument("--scalar", action="store_true", help="disable the NumPy kernel")
+    parser.add_argument("--batch", action="store_true", help="let the driver fast-forward whole runs")
+    parser.add_argument("--profile", metavar="PATH", help="write per-phase tick timings as JSON")
+    args = parser.parse_args(argv)
+
+    settings = Settings()
+    state = make_headless_state(args.herd, settings, seed=args.seed)
+    sim = SimService(settings, state, StateWallet(state), None, vectorized=False if args.scalar else None)
+    driver = FixedStepDriver.for_sim(sim, settings, batching=args.batch)
+    sim.profiler.enabled = bool(args.profile)
+
+    start = time.perf_counter()
+    driver.step(args.ticks)
+    elapsed = time.perf_counter() - start
+    rate = args.ticks / elapsed if elapsed > 0 else float("inf")
+    mode = "numpy" if sim.vectorized else "scalar"
+    print(f"{args.ticks} ticks, herd {args.herd} ({mode}): {rate:,.0f} ticks/sec "
+          f"({rate / settings.TICKS_PER_SEC:,.1f}x real time), coins {state['coins']:.2f}")
+    if args.profile:
+        sim.profiler.dump(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# services/sim_numpy.py
+"""
+Whole-array versions of the SimService tick phases.
+
+Each function works on zero-copy NumPy views of the HerdStore columns and
+mirrors the scalar methods on SimService exactly (income only differs by
+float summation order). Stage steps are event-driven in SimService itself.
+NumPy is optional; check ``HAS_NUMPY`` first.
+"""
+from __future__ import annotations
+
+from services.herd import ADULT, EGG, HerdStore
+from settings import Settings
+
+HAS_NUMPY = True
+try:
+    import numpy as np
+except Exception:  # NumPy missing: SimService keeps the scalar path.
+    HAS_NUMPY = False
+    np = None  # type: ignore
+
+
+def _view(arr):
+    return np.frombuffer(arr, dtype=arr.typecode)
+
+
+def advance_age(herd: HerdStore) -> None:
+    if len(herd):
+        _view(herd.age_ticks)[...] += 1
+
+
+def mood_decay(herd: HerdStore, s: Settings) -> None:
+    if not len(herd):
+        return
+    awake = _view(herd.stage) != EGG
+    hunger = _view(herd.hunger)
+    happiness = _view(herd.happiness)
+    hunger[awake] = np.clip(hunger[awake] - s.HUNGER_DECAY_PER_TICK, 0, s.HUNGER_MAX)
+    happiness[awake] = np.clip(happiness[awake] - s.HAPPINESS_DECAY_PER_TICK, 0, s.HAPPINESS_MAX)
+
+
+def clamping_rows(herd: HerdStore, s: Settings):
+    """Placed adults whose decay this tick is not a plain linear step."""
+    if not len(herd):
+        return ()
+    earning = (_view(herd.habitat) >= 0) & (_view(herd.stage) >= ADULT)
+    hunger = _view(herd.hunger)
+    happiness = _view(herd.happiness)
+    h_next = hunger - s.HUNGER_DECAY_PER_TICK
+    p_next = happiness - s.HAPPINESS_DECAY_PER_TICK
+    irregular = ((hunger > 0) & ~((h_next > 0) & (h_next <= s.HUNGER_MAX))) | \
+        ((happiness > 0) & ~((p_next > 0) & (p_next <= s.HAPPINESS_MAX)))
+    return np.flatnonzero(earning & irregular).tolist()
+
+
+def habitat_income(herd: HerdStore, s: Settings) -> float:
+    if not len(herd):
+        return 0.0
+    earning = (_view(herd.habitat) >= 0) & (_view(herd.stage) >= ADULT)
+    rarity_weight = 1.0 + _view(herd.rarity)[earning] * s.RARITY_YIELD_MULTIPLIER
+    hunger_mult = s.HUNGER_INCOME_MIN_MULT + \
+        (1 - s.HUNGER_INCOME_MIN_MULT) * (_view(herd.hunger)[earning] / s.HUNGER_MAX)
+    happy_mult = 1.0 + s.HAPPINESS_INCOME_BONUS_MAX * (_view(herd.happiness)[earning] / s.HAPPINESS_MAX)
+    return float(s.HABITAT_BASE_YIELD_PER_TICK * np.dot(rarity_weight * hunger_mult, happy_mult))
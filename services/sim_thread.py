@@ -0,0 +1,140 @@
+# services/sim_thread.py
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from services import events as ev
+from services.driver import FixedStepDriver
+from services.snapshot import StateSnapshot
+from settings import Settings
+
+
+class SimThread:
+    """
+    Runs the GameState tick loop on a background thread.
+
+    The UI never touches GameState directly while this runs:
+
+    * reads go through ``snapshot``, an immutable StateSnapshot that is
+      republished (double-buffered: built aside, then swapped in) at the end
+      of every tick that changed something;
+    * writes are queued with ``submit(fn, *args)`` and applied on the sim
+      thread at the next tick boundary; the returned Future carries the
+      result back.
+
+    Eggs hatched by ``breeding_tick`` are handed to the UI via ``drain_hatched``,
+    and the change events behind each published snapshot via ``drain_events``.
+    """
+
+    def __init__(self, state, settings: Settings, clock: Callable[[], float] = time.time):
+        self.state = state
+        self.clock = clock
+        self._commands: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._hatched: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._events_out: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._events: list = []
+        self._driver = FixedStepDriver(self._tick, settings.TICKS_PER_SEC, settings.SIM_MAX_CATCH_UP_TICKS)
+        # Front and back buffer start out as the same first snapshot
+        first = state.snapshot()
+        self._buffers: List[StateSnapshot] = [first, first]
+        self._front = 0
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        state.add_observer(self._mark_dirty)
+        state.subscribe(ev.ANY, self._events.append)
+
+    # ---- UI side -----------------------------------------------------------
+
+    @property
+    def snapshot(self) -> StateSnapshot:
+        return self._buffers[self._front]
+
+    def submit(self, fn: Callable, *args) -> Future:
+        fut: Future = Future()
+        self._commands.put((fn, args, fut))
+        return fut
+
+    def drain_hatched(self) -> list:
+        return self._drain(self._hatched)
+
+    def drain_events(self) -> list:
+        """Change events up to (at least) the current snapshot, oldest first."""
+        return self._drain(self._events_out)
+
+    @staticmethod
+    def _drain(q: "queue.SimpleQueue") -> list:
+        out = []
+        while True:
+            try:
+                out.extend(q.get_nowait())
+            except queue.Empty:
+                return out
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sim", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+            if thread.is_alive():
+                # Draining here would race the sim thread on GameState
+                logging.warning("Sim thread still running after %.1fs; commands stay queued", timeout)
+                return
+            self._thread = None
+        self.apply_commands()  # nothing queued is lost
+
+    # ---- Sim side ----------------------------------------------------------
+
+    def _mark_dirty(self) -> None:
+        self._dirty = True
+
+    def _publish(self) -> None:
+        back = 1 - self._front
+        self._buffers[back] = self.state.snapshot()
+        self._front = back
+        self._dirty = False
+        if self._events:
+            self._events_out.put(self._events[:])
+            self._events.clear()
+
+    def apply_commands(self) -> None:
+        while True:
+            try:
+                fn, args, fut = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(fn(*args))
+            except Exception as exc:
+                fut.set_exception(exc)
+
+    def _tick(self, _dt: float) -> None:
+        with self.state.batch():
+            self.apply_commands()
+            hatched = self.state.breeding_tick(self.clock())
+        if hatched:
+            self._hatched.put(hatched)
+        if self._dirty:
+            self._publish()
+
+    def _run(self) -> None:
+        dt = self._driver.dt
+        last = time.perf_counter()
+        while not self._stop.wait(dt):
+            now = time.perf_counter()
+            self._driver.advance(now - last)
+            last = now
@@ -0,0 +1,223 @@
+# services/snapshot.py
+from __future__ import annotations
+
+import copy
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from models.armadillo import Armadillo
+from models.breeding import BreedingJob
+from models.habitat import Habitat, Occupancy
+
+CHUNK = 256  # armadillos per shared chunk
+OCC_SHARDS = 64  # shards of the armadillo -> habitat map
+
+
+def _shard(did: str) -> int:
+    return hash(did) % OCC_SHARDS
+
+
+class HerdView(Sequence):
+    """
+    Read-only herd made of fixed-size tuple chunks. Snapshots share every
+    chunk that did not change since the previous one.
+    """
+    __slots__ = ("_chunks", "_len", "_rows")
+
+    def __init__(self, chunks: Tuple[Tuple[Armadillo, ...], ...], length: int, rows: Mapping[str, int]):
+        self._chunks = chunks
+        self._len = length
+        self._rows = rows  # id -> row; shared and append-only, so bounds-check with _len
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        return self._chunks[i // CHUNK][i % CHUNK]
+
+    def __iter__(self) -> Iterator[Armadillo]:
+        return chain.from_iterable(self._chunks)
+
+    def get(self, did: str) -> Optional[Armadillo]:
+        row = self._rows.get(did)
+        if row is None or row >= self._len:
+            return None
+        return self._chunks[row // CHUNK][row % CHUNK]
+
+
+@dataclass(frozen=True)
+class StateSnapshot:
+    """
+    Read-only copy of GameState at one version.
+
+    Offers the same query helpers as GameState so a screen can read either
+    one, and ``to_dict`` matches ``GameState.to_dict`` so a snapshot can be
+    saved or exported on another thread. Records are private copies and must
+    not be mutated; all writes go through GameState (or the sim thread's
+    command queue).
+    """
+    version: int
+    coins: int
+    inventory: Mapping[str, int]
+    armadillos: HerdView
+    habitats: Tuple[Habitat, ...]
+    breeding_queue: Tuple[BreedingJob, ...]
+    dex_colors: FrozenSet[str]
+    selected_id: Optional[str]
+    meta: Mapping[str, object]
+    _habitat_by_id: Mapping[str, Habitat]
+    _habitat_of: Tuple[Mapping[str, str], ...]  # sharded armadillo id -> habitat id
+    _cache: Dict[str, Tuple[Armadillo, ...]] = field(default_factory=dict, compare=False, repr=False)
+
+    @staticmethod
+    def capture(state, version: int = 0) -> "StateSnapshot":
+        """Full copy of ``state`` (``GameState.snapshot`` is the incremental one)."""
+        return SnapshotBuilder().build(state, (), (), True, version)
+
+    # ---- Query helpers (mirror GameState) ------------------------------------
+
+    def get_by_id(self, did: str) -> Optional[Armadillo]:
+        return self.armadillos.get(did)
+
+    def get_selected(self) -> Optional[Armadillo]:
+        return self.armadillos.get(self.selected_id) if self.selected_id else None
+
+    def get_habitat(self, hid: str) -> Optional[Habitat]:
+        return self._habitat_by_id.get(hid)
+
+    def habitat_of(self, did: str) -> Optional[Habitat]:
+        hid = self._habitat_of[_shard(did)].get(did)
+        return self._habitat_by_id.get(hid) if hid is not None else None
+
+    def _filtered(self, key: str, pred) -> List[Armadillo]:
+        hit = self._cache.get(key)
+        if hit is None:
+            hit = self._cache[key] = tuple(a for a in self.armadillos if pred(a))
+        return list(hit)
+
+    def adults(self) -> List[Armadillo]:
+        return self._filtered("adults", lambda a: a.is_adult)
+
+    def eligible_sires(self) -> List[Armadillo]:
+        return self._filtered("sires", lambda a: a.is_adult and a.sex == "M")
+
+    def eligible_dams(self) -> List[Armadillo]:
+        return self._filtered("dams", lambda a: a.is_adult and a.sex == "F")
+
+    def to_dict(self) -> dict:
+        return {
+            "coins": self.coins,
+            "inventory": dict(self.inventory),
+            "habitats": [h.to_dict() for h in self.habitats],
+            "breeding_queue": [j.to_dict() for j in self.breeding_queue],
+            "dex_colors": list(self.dex_colors),
+            "selected_id": self.selected_id,
+            "meta": dict(self.meta),
+            "armadillos": [a.to_dict() for a in self.armadillos],
+        }
+
+
+def _freeze_habitat(h: Habitat) -> Habitat:
+    h2 = copy.copy(h)
+    h2.occupants = Occupancy(h.occupants)
+    return h2
+
+
+class SnapshotBuilder:
+    """
+    Copy-on-write snapshots of one GameState.
+
+    Keeps the chunks, habitat copies and occupant-map shards of the last
+    snapshot. Each build re-copies only the armadillos and habitats named
+    dirty (plus any appended since) and the map shards their occupants fall
+    in, so the cost is O(changed + herd / CHUNK). Must run on
+    the thread that mutates the state; the snapshots it returns are safe to
+    read anywhere.
+    """
+
+    def __init__(self):
+        self._chunks: List[Tuple[Armadillo, ...]] = []
+        self._rows: Dict[str, int] = {}
+        self._len = 0
+        self._habs: Dict[str, Habitat] = {}
+        self._occ: List[Dict[str, str]] = [{} for _ in range(OCC_SHARDS)]
+
+    def build(self, state, dirty_ids: Iterable[str], dirty_habs: Iterable[str], reset: bool,
+              version: int) -> StateSnapshot:
+        if reset:
+            self._chunks, self._rows, self._len, self._habs = [], {}, 0, {}
+            self._occ = [{} for _ in range(OCC_SHARDS)]
+        live = state.armadillos
+
+        # Rows to (re)copy: changed ones plus everything appended since last time
+        dirty = {self._rows[did] for did in dirty_ids if did in self._rows}
+        for row in range(self._len, len(live)):
+            self._rows[live[row].id] = row
+            dirty.add(row)
+        edited: Dict[int, List[Armadillo]] = {}
+        for row in sorted(dirty):
+            ci, off = divmod(row, CHUNK)
+            chunk = edited.get(ci)
+            if chunk is None:
+                chunk = edited[ci] = list(self._chunks[ci]) if ci < len(self._chunks) else []
+            if off < len(chunk):
+                chunk[off] = copy.copy(live[row])
+            else:
+                chunk.append(copy.copy(live[row]))
+        if edited:
+            chunks = self._chunks[:]
+            for ci in sorted(edited):
+                if ci < len(chunks):
+                    chunks[ci] = tuple(edited[ci])
+                else:
+                    chunks.append(tuple(edited[ci]))
+            self._chunks = chunks
+        self._len = len(live)
+
+        dirty_habs = set(dirty_habs)
+        occ = self._occ[:]
+        copied: Set[int] = set()
+
+        def shard(did: str) -> Dict[str, str]:
+            i = _shard(did)
+            if i not in copied:
+                copied.add(i)
+                occ[i] = dict(occ[i])
+            return occ[i]
+
+        for h in state.habitats:
+            if h.id in dirty_habs or h.id not in self._habs:
+                old = self._habs.get(h.id)
+                new = self._habs[h.id] = _freeze_habitat(h)
+                if old is not None:
+                    for did in old.occupants:
+                        # Skip ids already claimed by the habitat they moved to
+                        if did not in new.occupants and occ[_shard(did)].get(did) == h.id:
+                            del shard(did)[did]
+                for did in new.occupants:
+                    if occ[_shard(did)].get(did) != h.id:
+                        shard(did)[did] = h.id
+        self._occ = occ
+        habs = tuple(self._habs[h.id] for h in state.habitats)
+
+        return StateSnapshot(
+            version=version,
+            coins=state.coins,
+            inventory=dict(state.inventory),
+            armadillos=HerdView(tuple(self._chunks), self._len, self._rows),
+            habitats=habs,
+            breeding_queue=tuple(copy.copy(j) for j in state.breeding_queue),
+            dex_colors=frozenset(state.dex_colors),
+            selected_id=state.selected_id,
+            meta=dict(state.meta),
+            _habitat_by_id={h.id: h for h in habs},
+            _habitat_of=tuple(occ),
+        )
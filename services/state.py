@@ -1,17 +1,47 @@
 # services/state.py
 from __future__ import annotations
 
+import bisect
 import random
 import time
-from typing import Callable, Dict, List, Optional, Set
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from models.armadillo import Armadillo
-from models.habitat import Habitat
+from models.habitat import Habitat, Occupancy
 from models.breeding import BreedingJob, hatch_result
 from services.economy import Economy
+from services import events as ev
+from services.events import ChangeEvent
+from services.herd_index import HerdIndex, STAGE_ADULT
+from services.snapshot import SnapshotBuilder, StateSnapshot
 
 
 Observer = Callable[[], None]
+# Runs the given callback once, later (e.g. next frame via Kivy's Clock)
+NotifyScheduler = Callable[[Callable[[], None]], None]
+Subscriber = Callable[[ChangeEvent], None]
+# Bulk operations take ids or a predicate
+Selector = Union[Iterable[str], Callable[[Armadillo], bool]]
+
+
+def _finish_ts(job: BreedingJob) -> float:
+    return job.finish_ts
+
+
+def _load_armadillo(d: dict) -> Armadillo:
+    a = Armadillo.from_dict(d)
+    # Recompute adult flags (simple: >= 14 days -> adult)
+    a.is_adult = a.age_days >= 14
+    a.is_baby = not a.is_adult
+    return a
+
+
+# What from_dict assumes for missing keys
+_EMPTY_SAVE = {
+    "coins": 0, "inventory": {}, "habitats": [], "breeding_queue": [],
+    "dex_colors": [], "selected_id": None, "meta": {}, "armadillos": [],
+}
 
 
 class GameState:
@@ -31,12 +61,35 @@ class GameState:
         self.inventory: Dict[str, int] = {"food": 0, "toy": 0}
         self.armadillos: List[Armadillo] = []
         self.habitats: List[Habitat] = []
-        self.breeding_queue: List[BreedingJob] = []
+        self.breeding_queue: List[BreedingJob] = []  # sorted by finish_ts
         self.dex_colors: Set[str] = set()
         self.selected_id: Optional[str] = None
         self.meta: Dict[str, any] = {}
+        self.loading = False  # a streamed load is between begin_load and finish_load
+
+        # Indexes (kept in step by every mutation; rebuilt by _reindex)
+        self._by_id: Dict[str, Armadillo] = {}
+        self._habitat_by_id: Dict[str, Habitat] = {}
+        self._habitat_of: Dict[str, str] = {}  # armadillo id -> habitat id
+        self.index = HerdIndex()  # by sex x adult, color, stage
+
+        # Copy-on-write snapshots: what changed since the last snapshot()
+        self.version = 0
+        self._dirty_ids: Set[str] = set()
+        self._dirty_habs: Set[str] = set()
+        self._reset = True
+        self._snapshots = SnapshotBuilder()
 
         self._observers: List[Observer] = []
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+        self._events: List[ChangeEvent] = []  # pending until the next emit
+        self._batch_depth = 0
+        self._batch_dirty = False
+        self._scheduler: Optional[NotifyScheduler] = None
+        self._scheduled = False
+        # Profiling: observer rounds run vs. notifications merged into one
+        self.notifications_emitted = 0
+        self.notifications_suppressed = 0
 
     # ---- Observers --------------------------------------------------------
 
@@ -44,30 +97,148 @@ class GameState:
         if cb not in self._observers:
             self._observers.append(cb)
 
+    def subscribe(self, topic: str, cb: Subscriber) -> None:
+        """Call ``cb(event)`` for each merged event on ``topic`` (``events.ANY`` for all)."""
+        subs = self._subscribers.setdefault(topic, [])
+        if cb not in subs:
+            subs.append(cb)
+
+    def unsubscribe(self, topic: str, cb: Subscriber) -> None:
+        subs = self._subscribers.get(topic, [])
+        if cb in subs:
+            subs.remove(cb)
+
+    def set_notify_scheduler(self, scheduler: Optional[NotifyScheduler]) -> None:
+        """
+        Coalesce notifications: instead of running observers right away,
+        hand one flush to ``scheduler`` and merge everything until it runs.
+        None (the default) notifies synchronously.
+        """
+        self._scheduler = scheduler
+
+    @contextmanager
+    def batch(self) -> Iterator["GameState"]:
+        """Defer notifications until the outermost ``with state.batch()`` exits."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._batch_dirty:
+                self._batch_dirty = False
+                self._notify()
+
     def _notify(self) -> None:
+        if self._batch_depth:
+            if self._batch_dirty:
+                self.notifications_suppressed += 1
+            self._batch_dirty = True
+            return
+        if self._scheduler is None:
+            self._emit()
+        elif self._scheduled:
+            self.notifications_suppressed += 1
+        else:
+            self._scheduled = True
+            self._scheduler(self.flush_notifications)
+
+    def flush_notifications(self) -> None:
+        """Run a scheduled notification now (no-op if none is pending)."""
+        if self._scheduled:
+            self._emit()
+
+    def _record(self, *events: ChangeEvent) -> None:
+        """Queue events for the next emit and mark what they touch for snapshot()."""
+        for e in events:
+            if e.topic == ev.STATE_RESET:
+                self._reset = True
+            elif e.key is not None:
+                if e.topic in (ev.ARMADILLO_UPDATED, ev.ARMADILLO_ADDED):
+                    self._dirty_ids.add(e.key)
+                elif e.topic == ev.HABITAT_CHANGED:
+                    self._dirty_habs.add(e.key)
+        self.version += len(events)
+        self._events.extend(events)
+
+    def _publish(self, *events: ChangeEvent) -> None:
+        self._record(*events)
+        self._notify()
+
+    # ---- Snapshots ----------------------------------------------------------
+
+    def snapshot(self) -> StateSnapshot:
+        """
+        Frozen view of the current state, safe to read (save, export) from
+        any thread. Shares every record unchanged since the previous call,
+        so it costs O(changed). Call it from the thread that mutates.
+        """
+        snap = self._snapshots.build(self, self._dirty_ids, self._dirty_habs, self._reset, self.version)
+        self._dirty_ids, self._dirty_habs, self._reset = set(), set(), False
+        return snap
+
+    def _emit(self) -> None:
+        self._scheduled = False
+        self.notifications_emitted += 1
+        pending, self._events = ev.merge(self._events), []
+        catch_all = self._subscribers.get(ev.ANY, ())
+        for event in pending:
+            for sub in list(self._subscribers.get(event.topic, ())) + list(catch_all):
+                try:
+                    sub(event)
+                except Exception:
+                    pass
         for cb in list(self._observers):
             try:
                 cb()
             except Exception:
                 pass
 
+    # ---- Indexes ----------------------------------------------------------
+
+    def _reindex(self) -> None:
+        self._by_id = {a.id: a for a in self.armadillos}
+        self.index.rebuild(self.armadillos)
+        self._habitat_by_id = {h.id: h for h in self.habitats}
+        self._habitat_of = {}
+        for h in self.habitats:
+            for did in h.occupants:
+                self._habitat_of[did] = h.id
+
+    def _add_armadillo(self, a: Armadillo) -> None:
+        self.armadillos.append(a)
+        self._by_id[a.id] = a
+        self.index.add(a)
+
+    def _place(self, h: Habitat, did: str) -> bool:
+        if h.add(did):
+            self._habitat_of[did] = h.id
+            return True
+        return False
+
+    def _unplace(self, did: str) -> None:
+        hid = self._habitat_of.pop(did, None)
+        if hid is not None:
+            self._habitat_by_id[hid].remove(did)
+
     # ---- Query helpers ----------------------------------------------------
 
     def get_selected(self) -> Optional[Armadillo]:
         if not self.selected_id:
             return None
-        for d in self.armadillos:
-            if d.id == self.selected_id:
-                return d
-        return None
+        return self._by_id.get(self.selected_id)
 
     def get_by_id(self, did: str) -> Optional[Armadillo]:
-        for d in self.armadillos:
-            if d.id == did:
-                return d
-        return None
+        return self._by_id.get(did)
 
-    # ---- Mutations (all call _notify) ------------------------------------
+    def get_habitat(self, hid: str) -> Optional[Habitat]:
+        return self._habitat_by_id.get(hid)
+
+    def habitat_of(self, did: str) -> Optional[Habitat]:
+        """Habitat the armadillo lives in, or None if unplaced."""
+        hid = self._habitat_of.get(did)
+        return self._habitat_by_id.get(hid) if hid is not None else None
+
+    # ---- Mutations (all call _publish) -----------------------------------
 
     def seed_starters(self) -> None:
         self.coins = 100
@@ -78,22 +249,24 @@ class GameState:
             Armadillo(id="d3", name="Indigo", sex="M", age_days=5, hunger=60, happiness=60, genes={"color": "AB"}, color="Blue", is_baby=True, is_adult=False),
         ]
         self.habitats = [
-            Habitat(id="h1", name="Meadow", level=1, capacity=2, occupants=["d1"]),
-            Habitat(id="h2", name="Cave", level=1, capacity=1, occupants=["d2"]),
-            Habitat(id="h3", name="Coast", level=1, capacity=1, occupants=[]),
+            Habitat(id="h1", name="Meadow", level=1, capacity=2, occupants=Occupancy(["d1"])),
+            Habitat(id="h2", name="Cave", level=1, capacity=1, occupants=Occupancy(["d2"])),
+            Habitat(id="h3", name="Coast", level=1, capacity=1, occupants=Occupancy()),
         ]
         self.dex_colors = {a.color for a in self.armadillos}
         self.selected_id = None
         self.breeding_queue = []
-        self._notify()
+        self._reindex()
+        self._publish(ev.state_reset())
 
     def select(self, did: Optional[str]) -> None:
         self.selected_id = did
-        self._notify()
+        self._publish(ev.selection_changed(did))
 
     def add_coins(self, amt: int) -> None:
+        before = self.coins
         self.coins = max(0, self.coins + amt)
-        self._notify()
+        self._publish(ev.coins_changed(self.coins - before))
 
     def buy(self, item: str, cost: int) -> bool:
         if self.coins >= cost:
@@ -102,67 +275,100 @@ class GameState:
                 self.inventory[item] += 1
             else:
                 self.inventory[item] = 1
-            self._notify()
+            self._publish(ev.coins_changed(-cost), ev.inventory_changed(item))
             return True
         return False
 
     def upgrade_habitat(self, hid: str, cost: int, capacity_delta: int) -> bool:
         if self.coins < cost:
             return False
-        for h in self.habitats:
-            if h.id == hid:
-                self.coins -= cost
-                h.level += 1
-                h.capacity += capacity_delta
-                self._notify()
-                return True
-        return False
-
-    def feed_selected(self) -> bool:
-        d = self.get_selected()
-        if not d or self.inventory.get("food", 0) <= 0:
+        h = self._habitat_by_id.get(hid)
+        if h is None:
             return False
-        self.inventory["food"] -= 1
-        d.feed(20)
+        self.coins -= cost
+        h.level += 1
+        h.capacity += capacity_delta
+        self._publish(ev.coins_changed(-cost), ev.habitat_changed(hid))
+        return True
+
+    def _care_bonus(self, d: Armadillo) -> None:
         # Bonus coins if both stats high
         if d.hunger > 80 and d.happiness > 80:
             self.add_coins(Economy.REWARD_CARE)
-        else:
-            self._notify()
+
+    def _feed(self, d: Armadillo, amount: int) -> bool:
+        if self.inventory.get("food", 0) <= 0:
+            return False
+        self.inventory["food"] -= 1
+        d.feed(amount)
+        self._record(ev.armadillo_updated(d.id, ("hunger",)))
+        self._care_bonus(d)
         return True
 
+    def _pet(self, d: Armadillo, amount: int) -> bool:
+        d.pet(amount)
+        self._record(ev.armadillo_updated(d.id, ("happiness",)))
+        self._care_bonus(d)
+        return True
+
+    def _move(self, d: Armadillo, hid: str) -> bool:
+        old = self._habitat_of.get(d.id)
+        if old == hid:
+            return True
+        h = self._habitat_by_id.get(hid)
+        if h is None or not h.has_space():
+            return False
+        self._unplace(d.id)
+        if old is not None:
+            self._record(ev.habitat_changed(old))
+        self._place(h, d.id)
+        self._record(ev.habitat_changed(hid))
+        return True
+
+    def feed_selected(self) -> bool:
+        d = self.get_selected()
+        if not d:
+            return False
+        with self.batch():
+            ok = self._feed(d, 20)
+            if ok:
+                self._publish(ev.inventory_changed("food"))
+        return ok
+
     def pet_selected(self) -> bool:
         d = self.get_selected()
         if not d:
             return False
-        d.pet(15)
-        if d.hunger > 80 and d.happiness > 80:
-            self.add_coins(Economy.REWARD_CARE)
-        else:
+        with self.batch():
+            self._pet(d, 15)
             self._notify()
         return True
 
     def move_selected_to_habitat(self, hid: str) -> bool:
         d = self.get_selected()
-        if not d:
+        if not d or not self._move(d, hid):
             return False
-        # Remove from any current habitat
-        for h in self.habitats:
-            if d.id in h.occupants:
-                h.remove(d.id)
-        # Add to target if space
-        for h in self.habitats:
-            if h.id == hid:
-                if h.add(d.id):
-                    self._notify()
-                    return True
-                return False
-        return False
+        self._notify()
+        return True
 
     def adults(self) -> List[Armadillo]:
-        return [a for a in self.armadillos if a.is_adult]
+        return self.index.by_stage(STAGE_ADULT)
 
-    def start_breeding(self, dad_id: str, mom_id: str, duration_s: int) -> Optional[BreedingJob]:
+    def eligible_sires(self) -> List[Armadillo]:
+        return self.index.group("M", True)
+
+    def eligible_dams(self) -> List[Armadillo]:
+        return self.index.group("F", True)
+
+    def by_color(self, color: str) -> List[Armadillo]:
+        return self.index.by_color(color)
+
+    def in_habitat(self, hid: str) -> List[Armadillo]:
+        h = self._habitat_by_id.get(hid)
+        return [self._by_id[did] for did in h.occupants if did in self._by_id] if h else []
+
+    def _breeding_job(self, dad_id: str, mom_id: str, duration_s: int, now: float,
+                      n: int = 0) -> Optional[BreedingJob]:
         if dad_id == mom_id:
             return None
         dad = self.get_by_id(dad_id)
@@ -170,72 +376,188 @@ class GameState:
         if not dad or not mom or dad.sex != "M" or mom.sex != "F" or not dad.is_adult or not mom.is_adult:
             return None
         job = BreedingJob(
-            id=f"job_{int(time.time()*1000)}",
+            id=f"job_{int(now*1000) + n}",
             parent_m_id=dad_id,
             parent_f_id=mom_id,
-            start_ts=time.time(),
+            start_ts=now,
             duration_s=duration_s,
             status="incubating",
         )
-        self.breeding_queue.append(job)
-        self._notify()
+        bisect.insort(self.breeding_queue, job, key=_finish_ts)
         return job
 
+    def start_breeding(self, dad_id: str, mom_id: str, duration_s: int) -> Optional[BreedingJob]:
+        job = self._breeding_job(dad_id, mom_id, duration_s, time.time())
+        if job:
+            self._publish(ev.breeding_queue_changed())
+        return job
+
+    def next_hatch_eta(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the next egg is due (0 if overdue), None if none incubate."""
+        if not self.breeding_queue or self.loading:
+            return None
+        if now is None:
+            now = time.time()
+        return max(0.0, self.breeding_queue[0].finish_ts - now)
+
     def breeding_tick(self, now: float):
+        if self.loading:
+            return []  # parents may not be loaded yet
+        # Queue is ordered by finish time: only the due prefix is looked at
+        q = self.breeding_queue
+        due = 0
+        while due < len(q) and q[due].finish_ts <= now:
+            due += 1
+        if not due:
+            return []
         hatched = []
-        for job in self.breeding_queue:
-            if job.is_done(now):
-                dad = self.get_by_id(job.parent_m_id)
-                mom = self.get_by_id(job.parent_f_id)
-                if not dad or not mom:
-                    job.status = "done"
-                    continue
-                # Hatch
-                baby_dict = hatch_result(dad, mom, job.duration_s, Economy.MUTATION_CHANCE)
+        for job in q[:due]:
+            if job.status == "done":
+                continue
+            dad = self.get_by_id(job.parent_m_id)
+            mom = self.get_by_id(job.parent_f_id)
+            if not dad or not mom:
                 job.status = "done"
-                job.result = baby_dict
-                # Add baby
-                baby = Armadillo.from_dict(baby_dict)
-                # Baby grows into habitat of mom if space
-                for h in self.habitats:
-                    if mom.id in h.occupants and h.has_space():
-                        h.add(baby.id)
-                        break
-                # Add to roster
-                self.armadillos.append(baby)
+                continue
+            # Hatch
+            baby_dict = hatch_result(dad, mom, job.duration_s, Economy.MUTATION_CHANCE)
+            job.status = "done"
+            job.result = baby_dict
+            # Add baby
+            baby = Armadillo.from_dict(baby_dict)
+            # Baby grows into habitat of mom if space
+            h = self.habitat_of(mom.id)
+            if h is not None and self._place(h, baby.id):
+                self._record(ev.habitat_changed(h.id))
+            # Add to roster
+            self._add_armadillo(baby)
+            self._record(ev.armadillo_added(baby.id))
+            if baby.color not in self.dex_colors:
                 self.dex_colors.add(baby.color)
-                hatched.append(baby)
+                self._record(ev.dex_added(baby.color))
+            hatched.append(baby)
         # Remove finished
-        if hatched:
-            self.breeding_queue = [j for j in self.breeding_queue if j.status != "done"]
-            self._notify()
+        del q[:due]
+        self._publish(ev.breeding_queue_changed())
         return hatched
 
+    # ---- Bulk operations ----------------------------------------------------
+    # ``which`` is a list of ids or a predicate over Armadillo. Each call
+    # notifies once and returns a per-id result (False for unknown ids).
+
+    def _select_many(self, which: Selector) -> List[Tuple[str, Optional[Armadillo]]]:
+        if callable(which):
+            return [(a.id, a) for a in self.armadillos if which(a)]
+        return [(did, self._by_id.get(did)) for did in which]
+
+    def feed_many(self, which: Selector, amount: int = 20) -> Dict[str, bool]:
+        """Feed each match in order, one food apiece, until food runs out."""
+        results: Dict[str, bool] = {}
+        with self.batch():
+            for did, d in self._select_many(which):
+                results[did] = d is not None and self._feed(d, amount)
+            if any(results.values()):
+                self._publish(ev.inventory_changed("food"))
+        return results
+
+    def pet_many(self, which: Selector, amount: int = 15) -> Dict[str, bool]:
+        results: Dict[str, bool] = {}
+        with self.batch():
+            for did, d in self._select_many(which):
+                results[did] = d is not None and self._pet(d, amount)
+            self._notify()
+        return results
+
+    def move_many(self, which: Selector, hid: str) -> Dict[str, bool]:
+        """Move matches into ``hid`` while it has room; the rest stay put."""
+        results: Dict[str, bool] = {}
+        with self.batch():
+            for did, d in self._select_many(which):
+                results[did] = d is not None and self._move(d, hid)
+            self._notify()
+        return results
+
+    def breed_many(self, pairs: Iterable[Tuple[str, str]], duration_s: int) -> List[Optional[BreedingJob]]:
+        """Start one job per (dad_id, mom_id); None where the pair is invalid."""
+        now = time.time()
+        jobs = [self._breeding_job(dad, mom, duration_s, now, n) for n, (dad, mom) in enumerate(pairs)]
+        if any(jobs):
+            self._publish(ev.breeding_queue_changed())
+        return jobs
+
     # ---- Serialization -----------------------------------------------------
 
+    # The herd goes last so a streamed load sees the small header first
     def to_dict(self) -> dict:
         return {
             "coins": self.coins,
             "inventory": dict(self.inventory),
-            "armadillos": [a.to_dict() for a in self.armadillos],
             "habitats": [h.to_dict() for h in self.habitats],
             "breeding_queue": [j.to_dict() for j in self.breeding_queue],
             "dex_colors": list(self.dex_colors),
             "selected_id": self.selected_id,
             "meta": dict(self.meta),
+            "armadillos": [a.to_dict() for a in self.armadillos],
         }
 
     def from_dict(self, d: dict) -> None:
-        self.coins = int(d.get("coins", 0))
-        self.inventory = dict(d.get("inventory", {}))
-        self.armadillos = [Armadillo.from_dict(x) for x in d.get("armadillos", [])]
-        self.habitats = [Habitat.from_dict(x) for x in d.get("habitats", [])]
-        self.breeding_queue = [BreedingJob.from_dict(x) for x in d.get("breeding_queue", [])]
-        self.dex_colors = set(d.get("dex_colors", []))
-        self.selected_id = d.get("selected_id")
-        self.meta = dict(d.get("meta", {}))
-        # Recompute adult flags (simple: >= 14 days -> adult)
-        for a in self.armadillos:
-            a.is_adult = a.age_days >= 14
-            a.is_baby = not a.is_adult
-        self._notify()
+        self._load_fields({**_EMPTY_SAVE, **d})
+        self.loading = False
+        self._reindex()
+        self._publish(ev.state_reset())
+
+    def _load_fields(self, d: dict) -> None:
+        """Replace whatever top-level fields ``d`` has."""
+        if "coins" in d:
+            self.coins = int(d["coins"])
+        if "inventory" in d:
+            self.inventory = dict(d["inventory"])
+        if "armadillos" in d:
+            self.armadillos = [_load_armadillo(x) for x in d["armadillos"]]
+        if "habitats" in d:
+            self.habitats = [Habitat.from_dict(x) for x in d["habitats"]]
+        if "breeding_queue" in d:
+            self.breeding_queue = sorted(
+                (BreedingJob.from_dict(x) for x in d["breeding_queue"]), key=_finish_ts
+            )
+        if "dex_colors" in d:
+            self.dex_colors = set(d["dex_colors"])
+        if "selected_id" in d:
+            self.selected_id = d["selected_id"]
+        if "meta" in d:
+            self.meta = dict(d["meta"])
+
+    # ---- Streamed loading ----------------------------------------------------
+    # begin_load(header) -> add_armadillos(chunk)... -> finish_load(rest), see
+    # services/stream_load.py. In between the state is usable but the herd is
+    # partial, so nothing hatches (``loading``).
+
+    def begin_load(self, header: dict) -> None:
+        """Load everything but the herd."""
+        self._load_fields({**_EMPTY_SAVE, **header, "armadillos": []})
+        self.loading = True
+        self._reindex()
+        self._publish(ev.state_reset())
+
+    def add_armadillos(self, records: Iterable[dict]) -> int:
+        """Append a chunk of saved armadillos; notifies once."""
+        n = 0
+        with self.batch():
+            for x in records:
+                a = _load_armadillo(x)
+                self._add_armadillo(a)
+                self._record(ev.armadillo_added(a.id))
+                n += 1
+            if n:
+                self._notify()
+        return n
+
+    def finish_load(self, rest: Optional[dict] = None) -> None:
+        """End a streamed load; ``rest`` holds fields saved after the herd (older saves)."""
+        self.loading = False
+        if rest:
+            self._load_fields(rest)
+            self._reindex()
+            self._publish(ev.state_reset())
+        else:
+            self._publish(ev.breeding_queue_changed())  # hatching resumes
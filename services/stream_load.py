@@ -0,0 +1,346 @@
+# services/stream_load.py
+"""
+Streamed save loading for large farms.
+
+``StreamingLoad`` hydrates the header (coins, inventory, habitats, queue...)
+in one go so the first frame can draw, then feeds the herd to GameState in
+chunks of ``chunk_rows``: call ``step()`` once per frame (or ``run()``).
+Parsing can move to a worker thread with ``prefetch()``; chunks are still
+applied on the caller's thread, so GameState keeps a single writer.
+
+JSON saves are walked incrementally (``JsonWalker``), never read into one
+string; binary saves (services/binfmt.py) are sliced row-range by row-range
+out of the mmap. A journal ``Overlay`` patches the header and each chunk on
+the way in.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+import logging
+import mmap
+import os
+import queue
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Protocol, Tuple, Union
+
+from services import binfmt
+from services.journal import Overlay
+
+HERD_KEY = binfmt.HERD_KEY
+
+# Walker events
+FIELD, ROW = "field", "row"
+
+
+class JsonWalker:
+    """
+    Incremental reader for a top-level JSON object.
+
+    Yields ``(FIELD, key, value)`` per member, except that members named in
+    ``stream_keys`` holding an array yield ``(ROW, key, item)`` per element.
+    Reads ``block_size`` bytes at a time and parses with
+    ``JSONDecoder.raw_decode``, refilling the buffer whenever a value runs
+    past its end; ``bytes_read`` tracks progress.
+    """
+
+    _WS: "re.Pattern[str]" = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, f, stream_keys=(HERD_KEY,), block_size: int = 256 * 1024):
+        self.f = f
+        self.stream_keys = frozenset(stream_keys)
+        self.block_size = block_size
+        self.bytes_read = 0
+        self._dec = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._i = 0
+        self._eof = False
+
+    def _fill(self, size: int = 0) -> bool:
+        if self._eof:
+            return False
+        raw = self.f.read(max(size, self.block_size))
+        self.bytes_read += len(raw)
+        self._eof = not raw
+        # Drop what was consumed before growing the buffer
+        self._buf = self._buf[self._i:] + self._dec.decode(raw, final=self._eof)
+        self._i = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            buf = self._buf
+            m = self._WS.match(buf, self._i)
+            i = self._i = m.end() if m is not None else self._i
+            if i < len(buf):
+                return buf[i]
+            if not self._fill():
+                raise ValueError("unexpected end of save file")
+
+    def _expect(self, ch: str) -> None:
+        if self._peek() != ch:
+            raise ValueError(f"expected {ch!r} at byte ~{self.bytes_read}")
+        self._i += 1
+
+    def _value(self):
+        while True:
+            self._peek()
+            try:
+                value, end = self._json.raw_decode(self._buf, self._i)
+            except json.JSONDecodeError:
+                # Runs past the buffer: at least double it so a large value
+                # is re-parsed O(log n) times, not once per block
+                if self._fill(len(self._buf) - self._i):
+                    continue
+                raise
+            # A number may continue in the next block
+            if end == len(self._buf) and not self._eof:
+                self._fill()
+                continue
+            self._i = end
+            return value
+
+    def __iter__(self) -> Iterator[Tuple[str, str, object]]:
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key in self.stream_keys and self._peek() == "[":
+                self._i += 1
+                if self._peek() == "]":
+                    self._i += 1
+                else:
+                    while True:
+                        yield ROW, key, self._value()
+                        if self._peek() == "]":
+                            self._i += 1
+                            break
+                        self._expect(",")
+            else:
+                yield FIELD, key, self._value()
+            if self._peek() == "}":
+                return
+            self._expect(",")
+
+
+# ---- Chunk sources ---------------------------------------------------------
+# Each yields ("header", dict) once, then ("rows", list) per chunk, then
+# ("rest", dict) with any fields that came after the herd; progress is a
+# 0..1 float the loader reads between chunks. A failed prefetch queues
+# ("error", exception).
+
+Payload = Union[Dict, List[Dict], BaseException]
+Chunk = Tuple[str, Payload]
+
+
+class _Source(Protocol):
+    progress: float
+
+    def __iter__(self) -> Iterator[Chunk]: ...
+
+
+class _JsonSource:
+    def __init__(self, path: str, chunk_rows: int):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.total = max(1, os.path.getsize(path))
+        self.progress = 0.0
+
+    def __iter__(self) -> Iterator[Chunk]:
+        with open(self.path, "rb") as f:
+            walker = JsonWalker(f)
+            header: Dict = {}
+            rest: Dict = {}
+            rows: List[Dict] = []
+            in_herd = False
+            for kind, key, value in walker:
+                if kind == ROW:
+                    if not in_herd:
+                        in_herd = True
+                        yield "header", header
+                    if not isinstance(value, dict):
+                        raise ValueError(f"armadillo record is not an object at byte ~{walker.bytes_read}")
+                    rows.append(value)
+                    if len(rows) >= self.chunk_rows:
+                        self.progress = walker.bytes_read / self.total
+                        yield "rows", rows
+                        rows = []
+                elif in_herd:
+                    rest[key] = value
+                else:
+                    header[key] = value
+            if not in_herd:
+                yield "header", header
+            if rows:
+                yield "rows", rows
+            self.progress = 1.0
+            yield "rest", rest
+
+
+class _BinarySource:
+    def __init__(self, path: str, chunk_rows: int):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.progress = 0.0
+
+    def __iter__(self) -> Iterator[Chunk]:
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with binfmt.SaveReader(mm) as r:
+                header = json.loads(bytes(r.section("META")))
+                for name in r.table_names:
+                    if name != HERD_KEY:
+                        header[name] = r.table(name)
+                header.pop(HERD_KEY, None)  # an empty herd is kept in META
+                yield "header", header
+                total = r.rows
+                for start in range(0, total, self.chunk_rows):
+                    rows = r.table(HERD_KEY, start, start + self.chunk_rows)
+                    self.progress = min(total, start + self.chunk_rows) / total
+                    yield "rows", rows
+        self.progress = 1.0
+        yield "rest", {}
+
+
+# ---- Loader ----------------------------------------------------------------
+
+Apply = Callable[..., object]  # apply(fn, *args, then=None), e.g. App.run_command
+
+
+def _direct(fn, *args, then=None):
+    result = fn(*args)
+    if then:
+        then(result)
+    return result
+
+
+class StreamingLoad:
+    """
+    Load the save at ``path`` into ``state`` a chunk at a time.
+
+    ``on_progress(fraction, rows_loaded)`` runs after each chunk and
+    ``on_ready(loader)`` once the herd is complete (``error`` is set if the
+    file turned out to be damaged; what loaded so far stays). Mutations go
+    through ``apply`` (default: call directly) so a threaded app can queue
+    them onto the thread that owns the state.
+    """
+
+    def __init__(self, state, path: str, chunk_rows: int = 2000, overlay: Optional[Overlay] = None,
+                 apply: Apply = _direct,
+                 on_progress: Optional[Callable[[float, int], None]] = None,
+                 on_ready: Optional[Callable[["StreamingLoad"], None]] = None):
+        self.state = state
+        self.path = path
+        self.overlay = overlay or Overlay()
+        self.apply = apply
+        self.on_progress = on_progress
+        self.on_ready = on_ready
+        with open(path, "rb") as f:
+            binary = binfmt.is_binary(f.read(len(binfmt.MAGIC)))
+        self._source: _Source = (_BinarySource if binary else _JsonSource)(path, chunk_rows)
+        self._chunks = iter(self._source)
+        self._prefetched: Optional["queue.Queue[Chunk]"] = None
+        self._seen: List[str] = []
+        self.rows_loaded = 0
+        self.started = False
+        self.ready = False
+        self.error: Optional[BaseException] = None
+
+    @property
+    def progress(self) -> float:
+        return self._source.progress
+
+    def prefetch(self, depth: int = 4) -> None:
+        """Parse ahead on a worker thread (at most ``depth`` chunks buffered)."""
+        if self._prefetched is not None or self.ready:
+            return
+        q: "queue.Queue[Chunk]" = queue.Queue(maxsize=depth)
+        chunks = self._chunks
+
+        def work():
+            try:
+                for item in chunks:
+                    q.put(item)
+            except Exception as exc:
+                q.put(("error", exc))
+
+        self._prefetched = q
+        threading.Thread(target=work, name="save-prefetch", daemon=True).start()
+
+    def _next(self, block: bool) -> Optional[Chunk]:
+        if self._prefetched is None:
+            try:
+                return next(self._chunks)
+            except StopIteration:
+                return None
+            except Exception as exc:
+                return "error", exc
+        try:
+            return self._prefetched.get(block)
+        except queue.Empty:
+            return None
+
+    def begin(self) -> None:
+        """Hydrate the header now (the first ``step`` does it otherwise)."""
+        if not self.started:
+            self._handle(self._next(block=True))
+
+    def step(self, budget_s: Optional[float] = None) -> bool:
+        """Apply chunks for about ``budget_s`` (one chunk if None); True once ready."""
+        self.begin()
+        deadline = None if budget_s is None else time.perf_counter() + budget_s
+        while not self.ready:
+            # Without prefetch parsing is inline; with it, never wait on the worker
+            item = self._next(block=self._prefetched is None)
+            if item is None:
+                break
+            self._handle(item)
+            if deadline is None or time.perf_counter() >= deadline:
+                break
+        return self.ready
+
+    def run(self) -> None:
+        while not self.step():
+            pass
+
+    def _handle(self, item: Optional[Chunk]) -> None:
+        kind, payload = item if item is not None else ("rest", {})
+        if isinstance(payload, BaseException):  # "error"
+            logging.warning("Save load stopped after %d armadillos: %s", self.rows_loaded, payload)
+            self.error = payload
+            if not self.started:
+                self.started = True
+                self.apply(self.state.begin_load, {})
+            self._finish({})
+        elif isinstance(payload, list):  # "rows"
+            self.overlay.apply_rows(payload)
+            self._seen.extend(r["id"] for r in payload if "id" in r)
+            self.rows_loaded += len(payload)
+            self.apply(self.state.add_armadillos, payload)
+            if self.on_progress:
+                self.on_progress(self.progress, self.rows_loaded)
+        elif kind == "header":
+            self.started = True
+            self.overlay.apply_header(payload)
+            self.apply(self.state.begin_load, payload)
+        else:  # "rest"
+            self._finish(payload)
+
+    def _finish(self, rest: Dict) -> None:
+        if self.error is None:
+            # Fields saved after the herd (older saves) take the journal too
+            if rest:
+                self.overlay.apply_header(rest)
+            born = self.overlay.leftovers(self._seen)
+            if born:
+                self.rows_loaded += len(born)
+                self.apply(self.state.add_armadillos, born)
+        if self.on_progress:
+            self.on_progress(1.0, self.rows_loaded)
+        self._seen = []
+        self.ready = True
+        self.apply(self.state.finish_load, rest, then=lambda _r: self.on_ready and self.on_ready(self))
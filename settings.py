@@ -7,6 +7,10 @@ class Settings:
     TICKS_PER_SEC: int = 20
     AUTOSAVE_INTERVAL_SEC: int = 30
     ECON_PAYOUT_INTERVAL_TICKS: int = 60  # once every 3 seconds at 20 tps
+    SIM_MAX_CATCH_UP_TICKS: int = 5 * 20  # drop backlog beyond 5 seconds per frame
+    SIM_BATCH_MIN_TICKS: int = 40         # backlogs this large use fast_forward
+    SIM_ON_WORKER_THREAD: bool = False    # app: tick GameState off the Kivy thread
+    SIM_INCOME_REBUILD_EVERY: int = 100_000  # re-sum cached income rates after this many updates
 
     # RNG / Genetics
     BASE_MUTATION_CHANCE: float = 0.02
@@ -40,7 +44,15 @@ class Settings:
 
     # Save
     SAVE_FILENAME: str = "armadillo_farmer_save.json"
-    SAVE_SCHEMA_VERSION: int = 1
+    SAVE_SCHEMA_VERSION: int = 1           # 2: binary columnar save (services/binfmt.py)
+    SAVE_MIN_INTERVAL_SEC: float = 2.0     # background writer: write after this long without new changes
+    SAVE_MAX_STALENESS_SEC: float = 10.0   # ...but never leave a change unsaved longer than this
+    SAVE_JOURNAL: bool = True              # append changes to a journal instead of full autosaves
+    SAVE_JOURNAL_COMPACT_BYTES: int = 256 * 1024  # fold the journal into a full save past this size
+    SAVE_STREAM_LOAD: bool = True          # show the header first, then load the herd across frames
+    SAVE_STREAM_CHUNK_ROWS: int = 500      # armadillos per streamed chunk
+    SAVE_STREAM_FRAME_BUDGET_MS: float = 8.0  # streamed-load work per frame
+    SAVE_HASH_TREE: bool = False           # hash re-encoded sections; skip writes when nothing really changed
 
     # Accessibility
     ENABLE_COLORBLIND_NUMERIC_TAGS: bool = True
@@ -1,5 +1,7 @@
 # tests/test_core.py
 import random
+from typing import Any, Dict, List
+
 from models.breeding import combine_genes
 from services.economy import Economy
 
@@ -24,3 +26,180 @@ def test_economy_values():
     assert Economy.COST_FOOD > 0
     assert Economy.REWARD_HATCH > 0
     assert Economy.INCUBATION_MIN_S <= Economy.INCUBATION_MAX_S
+
+
+def test_armadillo_is_compact_and_roundtrips():
+    from models.armadillo import Armadillo
+
+    d: Dict[str, Any] = {"id": "x1", "name": "Roly", "sex": "F", "age_days": 3, "hunger": 40, "happiness": 90,
+         "genes": {"color": "Aa"}, "color": "Brown", "is_baby": True, "is_adult": False}
+    a = Armadillo.from_dict(dict(d, genes=dict(d["genes"])))
+    b = Armadillo.from_dict(dict(d, id="x2", genes=dict(d["genes"])))
+    assert not hasattr(a, "__dict__")
+    assert a.genes is b.genes  # one shared genotype
+    assert a.to_dict() == d
+
+
+def test_generated_codecs_match_asdict_shape():
+    from dataclasses import asdict
+
+    from models.breeding import BreedingJob
+    from models.habitat import Habitat
+
+    h = Habitat.from_dict({"id": "h1", "name": "Meadow", "occupants": ["d1"]})
+    assert h.to_dict() == asdict(h) == {"id": "h1", "name": "Meadow", "level": 1, "capacity": 2,
+                                        "occupants": ["d1"], "hatch_boost_pct": 0}
+    assert h.to_dict()["occupants"] is not h.occupants
+    j = BreedingJob.from_dict({"id": "j", "parent_m_id": "a", "parent_f_id": "b",
+                               "start_ts": "5", "duration_s": "60"})
+    assert (j.start_ts, j.duration_s, j.status) == (5.0, 60, "incubating")
+    assert j.to_dict() == asdict(j)
+
+
+def test_habitat_occupancy_is_an_ordered_set():
+    from models.habitat import Habitat, Occupancy
+
+    h = Habitat(id="h1", name="Meadow", level=1, capacity=3, occupants=Occupancy(["b", "a"]))
+    assert isinstance(h.occupants, Occupancy)
+    assert h.add("c") and not h.add("a")
+    assert not h.add("d")  # full
+    h.remove("b")
+    h.remove("missing")
+    assert list(h.occupants) == ["a", "c"] and "c" in h.occupants
+    assert h.to_dict()["occupants"] == ["a", "c"]
+    assert Habitat.from_dict(h.to_dict()).occupants == h.occupants
+
+
+def test_binary_save_roundtrips_and_reads_columns_in_place(tmp_path):
+    import pytest
+
+    from services import binfmt
+    from services.state import GameState
+
+    st = GameState()
+    st.seed_starters()
+    d = st.to_dict()
+    d["armadillos"][0]["nickname"] = "Boss"  # only some rows have it
+    blob = binfmt.dumps(d)
+    assert binfmt.loads(blob) == d
+
+    path = tmp_path / "save.bin"
+    path.write_bytes(blob)
+    assert binfmt.read(str(path)) == d
+    with binfmt.SaveReader(blob) as r:
+        assert r.rows == 3 and r.column_kind("hunger") == "b"
+        assert list(r.column("hunger")) == [70, 55, 60]
+        assert [r.string(i) for i in r.column("color")] == ["Brown", "Albino", "Blue"]
+        assert r.column_kind("nickname") == "J"
+
+    # JSON <-> binary
+    binfmt.binary_to_json(str(path), str(tmp_path / "save.json"))
+    assert binfmt.json_to_binary(str(tmp_path / "save.json"), str(tmp_path / "again.bin")) == len(blob)
+
+    damaged = bytearray(blob)
+    damaged[-3] ^= 0xFF
+    with pytest.raises(binfmt.FormatError):
+        binfmt.loads(bytes(damaged))
+    with pytest.raises(binfmt.FormatError):
+        binfmt.loads(b'{"coins": 1}')
+
+
+def test_persistence_converts_between_save_formats(tmp_path):
+    from services.persistence import Persistence
+    from services.state import GameState
+
+    st = GameState()
+    st.seed_starters()
+    old = Persistence(schema_version=1)
+    old._base = str(tmp_path)
+    old.write(st)
+    new = Persistence(schema_version=2)
+    new._base = str(tmp_path)
+    loaded = GameState()
+    assert new.load(loaded) and loaded.coins == st.coins  # read the JSON save
+    st.add_coins(5)
+    new.write(st)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["save.bin"]
+    loaded = GameState()
+    assert new.load(loaded) and loaded.coins == st.coins
+    assert [a.id for a in loaded.armadillos] == [a.id for a in st.armadillos]
+
+
+def test_save_service_reencodes_only_dirty_sections(tmp_path, monkeypatch):
+    import dataclasses
+    import json
+
+    from kivy.app import App
+
+    from services import save as save_mod
+    from services.driver import StateWallet, make_headless_state
+    from services.sim import SimService
+    from settings import Settings
+
+    class DummyApp:
+        user_data_dir = str(tmp_path)
+
+    monkeypatch.setattr(App, "get_running_app", lambda: DummyApp())
+    s = dataclasses.replace(Settings(), SAVE_HASH_TREE=True)
+    ss = save_mod.SaveService(s)
+    state = make_headless_state(30, s)
+    sim = SimService(s, state, StateWallet(state), ss)
+    ss.atomic_save(sim.flush())
+    assert not ss.dirty and not ss.atomic_save_if_dirty(state)
+
+    encoded: List[Any] = []
+    real = save_mod._dumps
+
+    def counting_dumps(value: Any) -> str:
+        encoded.append(value)
+        return real(value)
+
+    monkeypatch.setattr(save_mod, "_dumps", counting_dumps)
+    sim.feed(3, 10)
+    sim.flush()
+    assert ss.dirty == {"armadillos"} and ss.dirty_records("armadillos") == {"a3"}
+    assert ss.atomic_save_if_dirty(state)
+    assert [v for v in encoded if isinstance(v, dict) and "id" in v] == [state["armadillos"][3]]
+    with open(ss._path, encoding="utf-8") as f:
+        assert json.load(f) == state
+
+    # Marked but unchanged: the hash tree keeps the file as it is
+    ss.mark_dirty("habitats")
+    assert not ss.atomic_save_if_dirty(state)
+    sim.tick(1 / s.TICKS_PER_SEC)
+    sim.flush()
+    assert ss.dirty == {"armadillos", "incubator"}
+    assert ss.atomic_save_if_dirty(state)
+    with open(ss._path, encoding="utf-8") as f:
+        assert json.load(f) == state
+
+
+def test_save_service_writes_coin_changes_without_a_tick(tmp_path, monkeypatch):
+    import json
+
+    from kivy.app import App
+
+    from services.driver import StateWallet, make_headless_state
+    from services.save import SaveService
+    from services.sim import SimService
+    from settings import Settings
+
+    class DummyApp:
+        user_data_dir = str(tmp_path)
+
+    monkeypatch.setattr(App, "get_running_app", lambda: DummyApp())
+    s = Settings()
+    ss = SaveService(s)
+    state = make_headless_state(10, s)
+    sim = SimService(s, state, StateWallet(state), ss)
+    ss.atomic_save(sim.flush())
+
+    state["coins"] -= 7
+    sim.feed(2, 10)
+    sim.flush()
+    assert ss.atomic_save_if_dirty(state)
+    state["collections"]["Blue"] = True  # nothing marks this either
+    assert ss.atomic_save_if_dirty(state)
+    with open(ss._path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["coins"] == state["coins"] and saved["collections"] == {"Blue": True}
@@ -0,0 +1,271 @@
+from typing import List
+
+import pytest
+
+from services.herd import ADULT, HerdStore
+from services.sim import SimService
+from settings import Settings
+
+
+class Wallet:
+    def __init__(self):
+        self.coins = 0.0
+
+    def add_coins(self, amt):
+        self.coins += amt
+
+
+def make_state():
+    return {
+        "tick": 0,
+        "coins": 0,
+        "habitats": [{"id": "h1", "name": "Meadow", "level": 1, "capacity": 6, "occupants": []}],
+        "armadillos": [
+            {"id": "a1", "name": "Rocky", "stage": "adult", "age_ticks": 3000, "hunger": 80, "happiness": 60, "rarity": 0.5, "habitat_id": "h1"},
+            {"id": "a2", "name": "Pearl", "stage": "juvenile", "age_ticks": 2399, "hunger": 0.01, "happiness": 50, "rarity": 0.0, "habitat_id": "h1"},
+            {"id": "a3", "name": "Egg", "stage": "egg", "age_ticks": 399, "hunger": 50, "happiness": 50, "rarity": 0.0, "habitat_id": None},
+        ],
+        "incubator": [],
+    }
+
+
+def test_herd_store_roundtrip():
+    state = make_state()
+    herd = HerdStore(state["armadillos"], ["h1"])
+    assert len(herd) == 3
+    assert herd.stage_name(0) == "adult"
+    assert herd.habitat_id(0) == "h1" and herd.habitat_id(2) is None
+    herd.hunger[0] = 12.5
+    assert state["armadillos"][0]["hunger"] == 80  # columns are authoritative until sync
+    herd.sync()
+    assert state["armadillos"][0]["hunger"] == 12.5
+    assert state["armadillos"][2]["stage"] == "egg"
+
+
+def test_tick_transitions_decay_and_income():
+    s = Settings()
+    state = make_state()
+    wallet = Wallet()
+    sim = SimService(s, state, wallet, None)
+    sim.tick(1 / s.TICKS_PER_SEC)
+    herd = sim.herd
+    assert herd.stage[1] == ADULT
+    assert herd.stage_name(2) == "juvenile"
+    assert state["armadillos"][2]["nickname"] == "Hatchling"
+    assert herd.hunger[1] == 0
+    assert herd.hunger[0] == 80 - s.HUNGER_DECAY_PER_TICK
+    assert wallet.coins > 0
+    sim.flush()
+    assert state["armadillos"][1]["stage"] == "adult"
+    assert state["tick"] == 1
+
+
+def test_incubator_hatches_into_herd():
+    s = Settings()
+    state = make_state()
+    sim = SimService(s, state, Wallet(), None)
+    sim.start_incubation({"id": "c1", "name": "Chick", "hunger": 60, "happiness": 60})
+    for _ in range(s.EGG_TICKS):
+        sim.tick(0)
+    assert len(sim.herd) == 4
+    assert sim.flush()["incubator"] == []
+    assert state["armadillos"][3]["stage"] == "juvenile"
+
+
+def test_hatching_and_moves_respect_habitat_capacity():
+    s = Settings()
+    state = make_state()
+    h1 = state["habitats"][0]
+    h1["capacity"], h1["occupants"] = 3, ["a1", "a2"]
+    state["habitats"].append({"id": "h2", "name": "Dune", "level": 1, "capacity": 1, "occupants": []})
+    sim = SimService(s, state, Wallet(), None)
+    sim.start_incubation({"id": "c1", "name": "Chick", "habitat_id": "h1"}, ticks=1)
+    sim.start_incubation({"id": "c2", "name": "Late", "habitat_id": "h1"}, ticks=2)
+    sim.tick(0)
+    sim.tick(0)
+    assert [sim.herd.habitat_id(r) for r in (3, 4)] == ["h1", None]  # h1 filled up
+    assert h1["occupants"] == ["a1", "a2", "c1"]
+
+    assert sim.move(0, "h2") and not sim.move(1, "h2")
+    assert h1["occupants"] == ["a2", "c1"] and state["habitats"][1]["occupants"] == ["a1"]
+    assert sim.herd.habitat_id(1) == "h1"
+    assert sim.move(4, "h1") and sim.move(4, None)
+    assert h1["occupants"] == ["a2", "c1"] and sim.herd.habitat_id(4) is None
+    assert sim.flush()["armadillos"][4]["habitat_id"] is None
+
+
+def test_vectorized_kernel_matches_scalar():
+    pytest.importorskip("numpy")
+    s = Settings()
+    scalar_state, vector_state = make_state(), make_state()
+    scalar_wallet, vector_wallet = Wallet(), Wallet()
+    scalar = SimService(s, scalar_state, scalar_wallet, None, vectorized=False)
+    vector = SimService(s, vector_state, vector_wallet, None, vectorized=True)
+    for _ in range(3000):
+        scalar.tick(0)
+        vector.tick(0)
+    scalar.flush()
+    vector.flush()
+    for a, b in zip(scalar_state["armadillos"], vector_state["armadillos"]):
+        assert a["stage"] == b["stage"] and a["age_ticks"] == b["age_ticks"]
+        assert a.get("nickname") == b.get("nickname")
+        assert a["hunger"] == pytest.approx(b["hunger"])
+        assert a["happiness"] == pytest.approx(b["happiness"])
+    assert scalar_wallet.coins == pytest.approx(vector_wallet.coins)
+
+
+@pytest.mark.parametrize("n", [1, 7, 400, 2401, 5000, 13000])
+def test_fast_forward_matches_tick_loop(n):
+    s = Settings()
+    stepped_state, ff_state = make_state(), make_state()
+    for st in (stepped_state, ff_state):
+        st["incubator"] = [
+            {"child": {"id": "c1", "name": "Chick", "hunger": 60, "happiness": 3, "habitat_id": "h1"}, "ticks_left": 5},
+            {"child": {"id": "c2", "name": "Late", "hunger": 60, "happiness": 60}, "ticks_left": 4000},
+        ]
+    stepped_wallet, ff_wallet = Wallet(), Wallet()
+    stepped = SimService(s, stepped_state, stepped_wallet, None, vectorized=False)
+    ff = SimService(s, ff_state, ff_wallet, None)
+    for _ in range(n):
+        stepped.tick(0)
+    earned = ff.fast_forward(n)
+
+    stepped.flush()
+    ff.flush()
+    assert ff_state["tick"] == stepped_state["tick"] == n
+    assert ff_state["incubator"] == stepped_state["incubator"]
+    assert len(ff_state["armadillos"]) == len(stepped_state["armadillos"])
+    for a, b in zip(stepped_state["armadillos"], ff_state["armadillos"]):
+        assert a["id"] == b["id"]
+        assert a["stage"] == b["stage"] and a["age_ticks"] == b["age_ticks"]
+        assert a.get("nickname") == b.get("nickname")
+        assert b["hunger"] == pytest.approx(a["hunger"], abs=1e-6)
+        assert b["happiness"] == pytest.approx(a["happiness"], abs=1e-6)
+    assert earned == pytest.approx(ff_wallet.coins)
+    assert ff_wallet.coins == pytest.approx(stepped_wallet.coins, rel=1e-9, abs=1e-9)
+
+
+def test_stage_steps_fire_on_the_due_tick_only():
+    s = Settings()
+    state = make_state()
+    state["armadillos"][2]["age_ticks"] = 0  # egg hatches at tick EGG_TICKS
+    sim = SimService(s, state, Wallet(), None, vectorized=False)
+    for _ in range(s.EGG_TICKS - 1):
+        sim.tick(0)
+    assert sim.herd.stage_name(2) == "egg"
+    assert sim._stage_heap[0][0] == s.EGG_TICKS
+    sim.tick(0)
+    assert sim.herd.stage_name(2) == "juvenile"
+    assert state["armadillos"][2]["nickname"] == "Hatchling"
+    # Rows still ahead of a threshold are not touched until their due tick.
+    assert all(due > s.EGG_TICKS for due, _row in sim._stage_heap)
+
+
+def test_incubator_speed_up_and_persisted_layout():
+    s = Settings()
+    state = make_state()
+    state["incubator"] = [
+        {"child": {"id": "c1", "name": "Slow"}, "ticks_left": 50},
+        {"child": {"id": "c2", "name": "Fast"}, "ticks_left": 40},
+    ]
+    sim = SimService(s, state, Wallet(), None)
+    sim.tick(0)
+    assert sim.flush()["incubator"] == [
+        {"child": {"id": "c1", "name": "Slow"}, "ticks_left": 49},
+        {"child": {"id": "c2", "name": "Fast"}, "ticks_left": 39},
+    ]
+    sim.speed_up_incubator(0, 100)
+    sim.tick(0)
+    assert [a["id"] for a in sim.flush()["armadillos"][3:]] == ["c1"]
+    assert [e["ticks_left"] for e in state["incubator"]] == [38]
+
+
+def test_fixed_step_driver_accumulates_clamps_and_batches():
+    from services.driver import FixedStepDriver
+
+    ticks: List[float] = []
+    batches: List[int] = []
+    driver = FixedStepDriver(ticks.append, 20, max_catch_up_ticks=10,
+                             batch=batches.append, batch_min_ticks=5)
+    assert driver.advance(0.01) == 0
+    assert driver.advance(0.05) == 1 and len(ticks) == 1
+    assert driver.advance(0.1) == 2 and len(ticks) == 3
+    assert driver.advance(2.0) == 10
+    assert batches == [10] and driver.ticks_dropped > 0
+    assert driver.ticks_run == 13
+
+
+def test_headless_sim_runs_without_kivy():
+    from services.driver import FixedStepDriver, StateWallet, make_headless_state
+
+    s = Settings()
+    state = make_headless_state(50, s, seed=7)
+    sim = SimService(s, state, StateWallet(state), None)
+    FixedStepDriver.for_sim(sim, s).step(100)
+    assert state["tick"] == 100
+    assert state["coins"] > s.STARTING_COINS
+
+
+def test_balance_batch_is_identical_across_worker_counts(tmp_path):
+    from services.balance import make_jobs, run_batch
+
+    jobs = make_jobs(range(3), [{}, {"FEED_COST": 5, "INCUBATION_MIN_S": 10}],
+                     herd=12, ticks=20 * 60 * 5, sample_every=20 * 30)
+    serial, pooled = tmp_path / "serial.jsonl", tmp_path / "pooled.jsonl"
+    assert run_batch(jobs, str(serial), workers=1) == 6
+    run_batch(jobs, str(pooled), workers=2)
+    assert serial.read_bytes() == pooled.read_bytes()
+
+
+def test_tick_profiler_is_opt_in_and_reports_phases():
+    import json
+
+    s = Settings()
+    sim = SimService(s, make_state(), Wallet(), None)
+    sim.tick(0)
+    assert sim.profiler.ticks == 0
+    sim.profiler.enabled = True
+    for _ in range(10):
+        sim.tick(0)
+    report = json.loads(sim.profiler.dump())
+    assert report["ticks"] == 10
+    assert {"aging", "stages", "decay", "income", "incubator", "tick"} <= set(report["phases"])
+    assert report["phases"]["decay"]["count"] == 10
+    sim.profiler.budget_ns = 0
+    sim.tick(0)
+    assert sim.profiler.overruns == 1
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_cached_income_rate_tracks_full_scan(vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    from services.driver import StateWallet, make_headless_state
+
+    s = Settings()
+    state = make_headless_state(60, s, seed=3)
+    sim = SimService(s, state, StateWallet(state), None, vectorized=vectorized)
+    for t in range(4000):
+        sim.tick(0)
+        if t % 500 == 0:
+            sim.feed(t % 60, s.FEED_HUNGER_GAIN)
+            sim.pet((t + 7) % 60, s.PET_HAPPINESS_GAIN)
+            sim.move((t + 3) % 60, "h0")
+        assert sim.income.rate() == pytest.approx(sim.scan_income(), rel=1e-9, abs=1e-12)
+    per_hab = sim.income.per_second_by_habitat()
+    assert sum(per_hab.values()) == pytest.approx(sim.income_per_sec())
+
+
+def test_income_sums_are_rebuilt_to_shed_drift():
+    from dataclasses import replace
+
+    from services.driver import StateWallet, make_headless_state
+
+    s = replace(Settings(), SIM_INCOME_REBUILD_EVERY=50)
+    state = make_headless_state(30, s, seed=5)
+    sim = SimService(s, state, StateWallet(state), None, vectorized=False)
+    sim.income._farm[0] += 1e-3  # drift the sums on purpose
+    for _ in range(60):
+        sim.tick(0)
+    assert sim.income._updates < 50
+    assert sim.income.rate() == pytest.approx(sim.scan_income(), rel=1e-9, abs=1e-12)
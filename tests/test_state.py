@@ -0,0 +1,454 @@
+from typing import Callable, List
+
+from services.sim_thread import SimThread
+from services.state import GameState
+from settings import Settings
+
+
+def make_state():
+    st = GameState()
+    st.seed_starters()
+    return st
+
+
+def test_sim_thread_applies_commands_at_tick_boundaries_and_publishes():
+    st = make_state()
+    sim = SimThread(st, Settings(), clock=lambda: 0.0)
+    first = sim.snapshot
+    fut = sim.submit(st.buy, "food", 10)
+    assert not fut.done() and st.inventory["food"] == 3  # queued, not applied
+    sim._tick(0.05)
+    assert fut.result() is True
+    snap = sim.snapshot
+    assert snap.version > first.version
+    assert snap.inventory["food"] == 4 and snap.coins == 90
+    # Old snapshot is untouched
+    assert first.inventory["food"] == 3 and first.coins == 100
+    # No changes -> no republish
+    sim._tick(0.05)
+    assert sim.snapshot is snap
+
+
+def test_sim_thread_snapshot_is_a_private_copy():
+    st = make_state()
+    sim = SimThread(st, Settings(), clock=lambda: 0.0)
+    sim.submit(st.select, "d1")
+    sim.submit(st.move_selected_to_habitat, "h3")
+    sim._tick(0.05)
+    snap = sim.snapshot
+    selected = snap.get_selected()
+    assert selected is not None and selected.id == "d1"
+    assert snap.habitats[2].occupants == ("d1",)
+    st.get_by_id("d1").hunger = 0
+    d1 = snap.get_by_id("d1")
+    assert d1 is not None and d1.hunger == 70
+
+
+def test_sim_thread_stop_flushes_queued_commands():
+    st = make_state()
+    sim = SimThread(st, Settings())
+    sim.start()
+    sim.stop()
+    fut = sim.submit(st.add_coins, 5)
+    sim.stop()
+    assert fut.result() is None and st.coins == 105
+
+
+def test_sim_thread_stop_keeps_commands_while_the_thread_runs():
+    import threading
+
+    st = make_state()
+    sim = SimThread(st, Settings())
+    release = threading.Event()
+    sim._thread = threading.Thread(target=release.wait, daemon=True)  # a tick that hangs
+    sim._thread.start()
+    fut = sim.submit(st.add_coins, 5)
+    sim.stop(timeout=0.01)
+    assert not fut.done() and st.coins == 100
+    release.set()
+    sim.stop()
+    assert fut.result() is None and st.coins == 105
+
+
+def test_indexes_follow_moves_hatches_and_loads():
+    st = make_state()
+    assert st.get_by_id("d2").name == "Pearl"
+    assert st.habitat_of("d1").id == "h1" and st.habitat_of("d3") is None
+    st.select("d1")
+    assert st.move_selected_to_habitat("h3")
+    assert st.habitat_of("d1").id == "h3" and st.get_habitat("h1").occupants == []
+    job = st.start_breeding("d1", "d2", 0)
+    hatched = st.breeding_tick(job.start_ts + 1)
+    baby = hatched[0]
+    assert st.get_by_id(baby.id) is baby
+    assert st.habitat_of(baby.id) is None  # mom's cave is full
+    loaded = GameState()
+    loaded.from_dict(st.to_dict())
+    loaded_baby, home = loaded.get_by_id(baby.id), loaded.habitat_of("d1")
+    assert loaded_baby is not None and loaded_baby.name == baby.name
+    assert home is not None and home.id == "h3"
+
+
+def test_batch_merges_notifications():
+    st = make_state()
+    calls = []
+    st.add_observer(lambda: calls.append(st.coins))
+    with st.batch():
+        st.add_coins(5)
+        with st.batch():
+            st.buy("food", 10)
+            st.select("d1")
+        assert calls == []
+    assert calls == [95]
+    assert st.notifications_suppressed == 2
+    with st.batch():
+        pass
+    assert calls == [95]
+
+
+def test_scheduler_coalesces_to_one_round_per_frame():
+    st = make_state()
+    calls: List[int] = []
+    frame: List[Callable[[], None]] = []
+    st.add_observer(lambda: calls.append(st.coins))
+    st.set_notify_scheduler(frame.append)
+    st.add_coins(1)
+    st.add_coins(2)
+    with st.batch():
+        st.add_coins(3)
+    assert calls == [] and len(frame) == 1
+    frame.pop()()
+    assert calls == [106]
+    emitted = st.notifications_emitted
+    st.flush_notifications()  # nothing pending
+    assert st.notifications_emitted == emitted
+
+
+def test_typed_events_are_merged_per_notification():
+    from services import events as ev
+
+    st = make_state()
+    seen: List[ev.ChangeEvent] = []
+    coins: List[ev.ChangeEvent] = []
+    st.subscribe(ev.ANY, seen.append)
+    st.subscribe(ev.COINS_CHANGED, coins.append)
+    st.select("d1")
+    with st.batch():
+        st.feed_selected()
+        st.pet_selected()
+        st.buy("food", 10)
+        st.select("d2")
+    topics = [e.topic for e in seen]
+    assert topics == [ev.SELECTION_CHANGED, ev.ARMADILLO_UPDATED, ev.INVENTORY_CHANGED,
+                      ev.COINS_CHANGED, ev.SELECTION_CHANGED]
+    assert seen[1].key == "d1" and seen[1].fields == {"hunger", "happiness"}
+    assert seen[-1].key == "d2"
+    assert [e.delta for e in coins] == [-10]
+
+    seen.clear()
+    st.move_selected_to_habitat("h3")
+    job = st.start_breeding("d1", "d2", 0)
+    st.breeding_tick(job.start_ts + 1)
+    keys = {(e.topic, e.key) for e in seen}
+    assert (ev.HABITAT_CHANGED, "h2") in keys and (ev.HABITAT_CHANGED, "h3") in keys
+    assert ev.ARMADILLO_ADDED in {t for t, _ in keys}
+    assert ev.BREEDING_QUEUE_CHANGED in {t for t, _ in keys}
+
+
+def test_sim_thread_hands_events_to_the_ui():
+    from services import events as ev
+
+    st = make_state()
+    sim = SimThread(st, Settings(), clock=lambda: 0.0)
+    sim.submit(st.add_coins, 7)
+    sim._tick(0.05)
+    assert [(e.topic, e.delta) for e in sim.drain_events()] == [(ev.COINS_CHANGED, 7)]
+    assert sim.drain_events() == []
+
+
+def test_breeding_queue_is_ordered_by_finish_time():
+    st = make_state()
+    st.armadillos[2].is_adult = True  # Indigo can sire too
+    late = st.start_breeding("d1", "d2", 30)
+    early = st.start_breeding("d3", "d2", 10)
+    assert st.breeding_queue == [early, late]
+    now = early.start_ts
+    assert st.next_hatch_eta(now) == 10
+    assert st.breeding_tick(now + 9.5) == []
+    assert len(st.breeding_tick(now + 10)) == 1
+    assert st.breeding_queue == [late]
+    assert st.next_hatch_eta(now + 100) == 0.0
+    st.breeding_tick(now + 100)
+    assert st.next_hatch_eta() is None
+
+
+def test_bulk_operations_notify_once_with_per_item_results():
+    st = make_state()
+    st.inventory["food"] = 2
+    calls = []
+    st.add_observer(lambda: calls.append(1))
+    fed = st.feed_many(lambda a: a.hunger < 65)
+    assert fed == {"d2": True, "d3": True} and st.inventory["food"] == 0
+    assert st.feed_many(["d1", "nope"]) == {"d1": False, "nope": False}
+    assert st.pet_many(["d1", "nope"]) == {"d1": True, "nope": False}
+    moved = st.move_many(lambda a: a.sex == "M", "h3")
+    assert moved == {"d1": True, "d3": False}  # Coast holds one
+    assert st.habitat_of("d1").id == "h3" and st.habitat_of("d3") is None
+    jobs = st.breed_many([("d1", "d2"), ("d2", "d1"), ("d1", "d2")], 10)
+    assert jobs[1] is None and jobs[0].id != jobs[2].id
+    assert len(st.breeding_queue) == 2
+    assert len(calls) == 4  # the failed feed changed nothing
+
+
+def test_herd_index_serves_breeding_and_color_queries():
+    st = make_state()
+    assert [a.id for a in st.eligible_sires()] == ["d1"]
+    assert [a.id for a in st.eligible_dams()] == ["d2"]
+    assert [a.id for a in st.adults()] == ["d1", "d2"]
+    indigo = st.get_by_id("d3")
+    indigo.is_adult = True
+    st.index.refresh(indigo)
+    assert [a.id for a in st.eligible_sires()] == ["d1", "d3"]
+    job = st.start_breeding("d1", "d2", 0)
+    baby = st.breeding_tick(job.start_ts)[0]
+    assert baby in st.by_color(baby.color)
+    assert [a.id for a in st.in_habitat("h1")] == ["d1"]
+    loaded = GameState()
+    loaded.from_dict(st.to_dict())
+    assert {a.id for a in loaded.index.by_stage("baby")} == {"d3", baby.id}  # age_days rule
+
+
+def test_snapshots_share_unchanged_chunks_and_stay_frozen():
+    from services.snapshot import CHUNK
+
+    st = make_state()
+    for i in range(CHUNK * 2):
+        st._add_armadillo(st.get_by_id("d1").__class__(
+            id=f"x{i}", name=f"X{i}", sex="F", age_days=20, hunger=50, happiness=50,
+            genes={"color": "Aa"}, color="Brown", is_baby=False, is_adult=True))
+    first = st.snapshot()
+    assert len(first.armadillos) == CHUNK * 2 + 3
+    st.select("x300")
+    st.feed_many(["x300"])
+    second = st.snapshot()
+    # Only the chunk holding x300 was copied again
+    assert second.armadillos._chunks[0] is first.armadillos._chunks[0]
+    assert second.armadillos._chunks[1] is not first.armadillos._chunks[1]
+    assert second.get_by_id("x300").hunger == 70 and first.get_by_id("x300").hunger == 50
+    assert second.version > first.version
+    st.move_selected_to_habitat("h3")
+    third = st.snapshot()
+    assert third.habitats[0] is second.habitats[0] and third.habitat_of("x300").id == "h3"
+    assert "x300" not in second.habitats[2].occupants
+    assert second.habitat_of("x300") is None
+    a, b = third.to_dict(), st.to_dict()
+    assert sorted(a.pop("dex_colors")) == sorted(b.pop("dex_colors")) and a == b
+    # The occupant map is shared shard by shard like the herd chunks
+    st.select("d2")
+    assert st.move_selected_to_habitat("h1")
+    fourth = st.snapshot()
+    assert fourth.habitat_of("d2").id == "h1" and third.habitat_of("d2").id == "h2"
+    assert sum(a is b for a, b in zip(fourth._habitat_of, third._habitat_of)) >= len(third._habitat_of) - 1
+
+
+def test_save_writer_coalesces_to_the_newest_snapshot():
+    from services.save_writer import SaveWriter
+
+    written: List[object] = []
+
+    def write(snap: object) -> int:
+        written.append(snap)
+        return len(str(snap))
+
+    w = SaveWriter(write, min_interval_s=60.0, max_staleness_s=60.0)
+    w.start()
+    w.submit("a")
+    w.submit("bb")
+    w.submit("ccc")  # each submit replaces the one the debounce holds back
+    assert written == []
+    assert w.flush(timeout=2.0)
+    assert written == ["ccc"]
+    w.submit("dddd")
+    assert w.stop(timeout=2.0)
+    assert written == ["ccc", "dddd"]
+    m = w.metrics()
+    assert (m["writes"], m["coalesced"], m["bytes_written"], m["last_bytes"]) == (2, 2, 7, 4)
+
+
+def test_save_writer_caps_staleness_under_continuous_submits():
+    from services.save_writer import SaveWriter
+
+    now = [0.0]
+    written: List[float] = []
+
+    def write(snap: object) -> int:
+        written.append(now[0])
+        return 1
+
+    w = SaveWriter(write, min_interval_s=2.0, max_staleness_s=10.0, clock=lambda: now[0])
+    while now[0] < 25.0:
+        w.submit(now[0])  # never quiet for min_interval_s
+        w.poll()
+        now[0] += 0.5
+    assert written == [10.0, 20.5]
+    # Once submits stop, the debounce writes after min_interval_s of quiet.
+    w.submit("last")
+    now[0] += 1.5
+    assert not w.poll()
+    now[0] += 0.5
+    assert w.poll() and len(written) == 3
+
+
+def test_save_writer_flushes_inline_when_not_started():
+    from services.save_writer import SaveWriter
+
+    written: List[object] = []
+
+    def write(snap: object) -> int:
+        written.append(snap)
+        return 1
+
+    w = SaveWriter(write, 0.0, 0.0)
+    w.submit(1)
+    w.submit(2)
+    assert w.flush() and written == [2]
+
+
+def test_journal_replays_onto_the_last_snapshot(tmp_path):
+    from services import journal
+    from services.journal import Journal
+    from services.save_writer import SaveWriter
+
+    saved = {}
+    fail: List[bool] = []
+
+    def write(snap):
+        if fail:
+            raise OSError("disk full")
+        saved["d"] = snap.to_dict()
+        return 1
+
+    st = make_state()
+    w = SaveWriter(write, 0.0, 0.0)
+    jr = Journal(str(tmp_path / "save.journal"), 1 << 20, w)
+    jr.attach(st)
+    assert "d" not in saved and w.flush()
+    assert jr.compactions == 1 and jr.size == 0
+    st.select("d2")
+    st.feed_selected()
+    st.buy("food", 10)
+    st.move_selected_to_habitat("h3")
+    job = st.start_breeding("d1", "d2", 10)
+    st.breeding_tick(job.finish_ts)
+    assert jr.records > 0 and jr.compactions == 1
+
+    d = saved["d"]
+    assert journal.replay(jr.path, d) == jr.records
+    st2 = GameState()
+    st2.from_dict(d)
+    got, want = st2.to_dict(), st.to_dict()
+    assert sorted(got.pop("dex_colors")) == sorted(want.pop("dex_colors"))
+    assert got == want
+
+    # A torn tail (crash mid-write) is ignored
+    torn = tmp_path / "torn.journal"
+    torn.write_bytes((tmp_path / "save.journal").read_bytes() + b'{"op":"coins","v":9')
+    d2 = dict(saved["d"])
+    journal.replay(str(torn), d2)
+    assert d2["coins"] == st.coins
+    # ...and cut off when a journal is attached to that file, so new records replay
+    Journal(str(torn), 1 << 20, SaveWriter(write, 0.0, 0.0)).attach(make_state())
+    assert torn.read_bytes().endswith(b"\n")
+
+    # Past the threshold the journal is folded into a full save, but it is
+    # cut only once the writer has the snapshot on disk
+    jr.compact_bytes = 1
+    fail.append(True)
+    st.add_coins(5)
+    assert jr.size > 0 and w.flush()
+    assert jr.compactions == 1 and saved["d"]["coins"] != st.coins
+    d3 = dict(saved["d"])
+    journal.replay(jr.path, d3)
+    assert d3["coins"] == st.coins  # the failed write lost nothing
+    fail.clear()
+    st.add_coins(5)
+    st.add_coins(1)  # appended while the snapshot waits; kept after the cut
+    assert w.flush()
+    assert jr.compactions == 2 and jr.size > 0
+    d4 = dict(saved["d"])
+    assert journal.replay(jr.path, d4) == 1 and d4["coins"] == st.coins
+    jr.close()
+
+
+def test_streamed_load_shows_the_header_first_and_applies_the_journal(tmp_path):
+    from services.journal import Journal
+    from services.persistence import Persistence
+    from services.save_writer import SaveWriter
+    from services.stream_load import StreamingLoad
+
+    for schema in (1, 2):
+        root = tmp_path / f"v{schema}"
+        root.mkdir()
+        pers = Persistence(schema)
+        pers._base = str(root)
+        st = make_state()
+        w = SaveWriter(pers.write, 0.0, 0.0)
+        jr = Journal(pers.journal_path(), 1 << 20, w)
+        jr.attach(st)
+        w.flush()  # full save, then journal
+        st.add_coins(3)
+        job = st.start_breeding("d1", "d2", 10)
+        st.feed_many(["d3"])
+        st.breeding_tick(job.finish_ts)  # a baby that exists only in the journal
+        jr.close()
+
+        loaded = GameState()
+        progress: List[int] = []
+        ready: List[StreamingLoad] = []
+        loader = pers.stream(loaded, 1, on_progress=lambda f, n, seen=progress: seen.append(n),
+                             on_ready=ready.append)
+        assert loader is not None
+        loader.begin()
+        assert loaded.loading and loaded.coins == st.coins and not loaded.armadillos
+        assert len(loaded.habitats) == len(st.habitats)
+        assert loaded.breeding_tick(job.finish_ts + 100) == []  # nothing hatches mid-load
+        assert not loader.step()
+        assert [a.id for a in loaded.armadillos] == ["d1"]
+        loader.run()
+        assert ready == [loader] and not loaded.loading and loader.error is None
+        assert progress == [1, 2, 3, 4]  # the baby comes from the journal at the end
+        got, want = loaded.to_dict(), st.to_dict()
+        assert sorted(got.pop("dex_colors")) == sorted(want.pop("dex_colors"))
+        assert got == want
+
+
+def test_streamed_chunks_notify_once_per_chunk():
+    from services import events as ev
+
+    records = make_state().to_dict()["armadillos"]
+    st = GameState()
+    st.begin_load({})
+    added: List[ev.ChangeEvent] = []
+    calls: List[int] = []
+    st.subscribe(ev.ARMADILLO_ADDED, added.append)
+    st.add_observer(lambda: calls.append(len(added)))
+    assert st.add_armadillos(records[:2]) == 2
+    assert calls == [2]
+    assert st.add_armadillos(records[2:]) == 1
+    assert calls == [2, 3] and [e.key for e in added] == ["d1", "d2", "d3"]
+    assert st.add_armadillos([]) == 0 and calls == [2, 3]
+
+
+def test_json_walker_streams_the_herd_across_buffer_refills():
+    import io
+    import json
+
+    from services.stream_load import FIELD, ROW, JsonWalker
+
+    d = {"armadillos": [{"id": f"d{i}", "n": 10 ** 12 + i, "s": "é"} for i in range(20)],
+         "coins": 7, "meta": {"x": [1.5, None]}}
+    blob = json.dumps(d, indent=2, ensure_ascii=False).encode("utf-8")
+    for block in (1, 5, 64, 1 << 16):
+        events = list(JsonWalker(io.BytesIO(blob), block_size=block))
+        assert [v for kind, _, v in events if kind == ROW] == d["armadillos"]
+        assert {k: v for kind, k, v in events if kind == FIELD} == {"coins": 7, "meta": d["meta"]}
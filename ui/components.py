@@ -1,9 +1,11 @@
 # ui/components.py
 from __future__ import annotations
 
+import bisect
 import time
-from typing import Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple
 
+from kivy.app import App
 from kivy.lang import Builder
 from kivy.metrics import dp
 from kivy.properties import StringProperty, NumericProperty, BooleanProperty, ObjectProperty
@@ -15,8 +17,11 @@ from kivy.uix.widget import Widget
 from kivy.clock import Clock
 from kivy.core.window import Window
 
+from models.breeding import BreedingJob
 from services.state import GameState
 from services.economy import Economy
+from services import events as ev
+from services.events import ChangeEvent, by_topic
 
 # KivyMD fallback handling
 HAS_MD = True
@@ -65,6 +70,7 @@ def show_toast(text: str) -> None:
 class TopBar(MDBoxLayout):
     app = ObjectProperty(None)
     coin_text = StringProperty("0")
+    status_text = StringProperty("")
 
     def __init__(self, app, **kwargs):
         super().__init__(**kwargs)
@@ -75,10 +81,18 @@ class TopBar(MDBoxLayout):
         if HAS_MD and MDTopAppBar:
             # Built in KV adds toolbar; here we only use this for fallback if needed.
             pass
+        coin_label = MDLabel(text=self.coin_text, halign="left")
+        status_label = MDLabel(text=self.status_text, halign="right")
+        self.bind(coin_text=coin_label.setter("text"), status_text=status_label.setter("text"))
+        self.add_widget(coin_label)
+        self.add_widget(status_label)
 
     def update_coin_label(self, coins: int):
         self.coin_text = str(coins)
 
+    def update_load_progress(self, fraction: float):
+        self.status_text = "" if fraction >= 1.0 else f"Loading herd… {int(fraction * 100)}%"
+
 
 # ---- Screen Manager with bottom nav --------------------------------------
 
@@ -186,7 +200,7 @@ class ArmadilloCard(MDCard):
         else:
             if self.collide_point(*touch.pos):
                 # Select
-                GameState.instance().select(self.did)
+                App.get_running_app().run_command(GameState.instance().select, self.did)
                 show_toast(f"Selected: {self.name}")
         if self._long_press_ev:
             self._long_press_ev.cancel()
@@ -195,7 +209,7 @@ class ArmadilloCard(MDCard):
 
     def _start_drag(self, touch):
         # Only drag if this is currently selected (as per acceptance)
-        st = GameState.instance()
+        st = App.get_running_app().view()
         if st.selected_id != self.did:
             return
         self._drag_widget = DragShadow(self.name)
@@ -224,16 +238,13 @@ class ArmadilloCard(MDCard):
             root = self.parent
             while root.parent:
                 root = root.parent
-            dropped = False
             try:
                 habitat_screen = root.ids.get("habitats_screen")
                 if habitat_screen:
-                    dropped = habitat_screen.try_drop(touch.pos)
+                    habitat_screen.try_drop(touch.pos)
                     habitat_screen.highlight_dropzones(touch.pos, False)
             except Exception:
                 pass
-            if dropped:
-                show_toast("Moved to habitat")
             self.get_root_window().remove_widget(self._drag_widget)
             self._drag_widget = None
             touch.ungrab(self)
@@ -257,6 +268,7 @@ class DragShadow(FloatLayout):
 
 class BaseScreen(MDScreen):
     app = ObjectProperty(None)
+    topics: Tuple[str, ...] = ()  # event topics this screen shows
 
     def __init__(self, name: str, app, **kwargs):
         super().__init__(name=name, **kwargs)
@@ -265,11 +277,65 @@ class BaseScreen(MDScreen):
     def refresh(self):
         pass
 
+    def apply_events(self, events: List[ChangeEvent]) -> None:
+        """Update for a merged batch of state events; by default a full refresh."""
+        if any(e.topic == ev.STATE_RESET or e.topic in self.topics for e in events):
+            self.refresh()
+
+
+def _card_subtitle(a) -> str:
+    return f"{a.sex} • {a.color} • Hunger {a.hunger}% • Happy {a.happiness}%"
+
+
+def _inventory_text(st) -> str:
+    return f"Food: {st.inventory.get('food',0)} • Toys: {st.inventory.get('toy',0)}"
+
 
 class HomeScreen(BaseScreen):
+    def __init__(self, name: str, app, **kwargs):
+        super().__init__(name, app, **kwargs)
+        self._cards: Dict[str, ArmadilloCard] = {}
+
     def refresh(self):
+        st = self.app.view()
+        self._update_labels(st)
+        lst = self.ids.get("home_list")
+        if lst:
+            lst.clear_widgets()
+            self._cards = {}
+            for a in st.armadillos:
+                self._add_card(lst, a)
+
+    def apply_events(self, events: List[ChangeEvent]) -> None:
+        topics = by_topic(events)
+        if ev.STATE_RESET in topics:
+            self.refresh()
+            return
+        st = self.app.view()
+        if ev.SELECTION_CHANGED in topics or ev.INVENTORY_CHANGED in topics:
+            self._update_labels(st)
+        lst = self.ids.get("home_list")
+        for e in topics.get(ev.ARMADILLO_ADDED, ()):
+            if e.key is None:
+                continue
+            a = st.get_by_id(e.key)
+            if lst and a and e.key not in self._cards:
+                self._add_card(lst, a)
+        for e in topics.get(ev.ARMADILLO_UPDATED, ()):
+            if e.key is None:
+                continue
+            a, card = st.get_by_id(e.key), self._cards.get(e.key)
+            if a and card:
+                card.name = a.name
+                card.subtitle = _card_subtitle(a)
+
+    def _add_card(self, lst, a) -> None:
+        card = ArmadilloCard(a.id, a.name, _card_subtitle(a))
+        self._cards[a.id] = card
+        lst.add_widget(card)
+
+    def _update_labels(self, st) -> None:
         # Update selected label, enable/disable buttons in kv via ids
-        st = GameState.instance()
         sel = st.get_selected()
         lbl = self.ids.get("selected_label")
         feed_btn = self.ids.get("feed_btn")
@@ -278,32 +344,24 @@ class HomeScreen(BaseScreen):
         if lbl:
             lbl.text = f"Selected: {sel.name if sel else 'None'}"
         if inv_lbl:
-            inv_lbl.text = f"Food: {st.inventory.get('food',0)} • Toys: {st.inventory.get('toy',0)}"
+            inv_lbl.text = _inventory_text(st)
         enable = bool(sel)
         if feed_btn:
             feed_btn.disabled = not enable
         if pet_btn:
             pet_btn.disabled = not enable
-        # Rebuild list lazily (simple)
-        lst = self.ids.get("home_list")
-        if lst and len(lst.children) != len(st.armadillos):
-            lst.clear_widgets()
-            for a in st.armadillos:
-                subtitle = f"{a.sex} • {a.color} • Hunger {a.hunger}% • Happy {a.happiness}%"
-                card = ArmadilloCard(a.id, a.name, subtitle)
-                lst.add_widget(card)
 
     def on_feed(self):
-        if GameState.instance().feed_selected():
-            show_toast("Fed!")
-        else:
-            show_toast("Need food. Buy in Shop.")
+        self.app.run_command(
+            GameState.instance().feed_selected,
+            then=lambda ok: show_toast("Fed!" if ok else "Need food. Buy in Shop."),
+        )
 
     def on_pet(self):
-        if GameState.instance().pet_selected():
-            show_toast("Pet!")
-        else:
-            show_toast("Select an armadillo first.")
+        self.app.run_command(
+            GameState.instance().pet_selected,
+            then=lambda ok: show_toast("Pet!" if ok else "Select an armadillo first."),
+        )
 
 
 class HabitatsScreen(BaseScreen):
@@ -316,7 +374,7 @@ class HabitatsScreen(BaseScreen):
         self.dropzones = []
         for idx in (1, 2, 3):
             w = self.ids.get(f"hab_card_{idx}")
-            hlist = GameState.instance().habitats
+            hlist = self.app.view().habitats
             if w and len(hlist) >= idx:
                 self.dropzones.append((w, hlist[idx - 1].id))
 
@@ -326,69 +384,119 @@ class HabitatsScreen(BaseScreen):
                 w.opacity = 1.0 if active else 0.95
 
     def try_drop(self, pos) -> bool:
-        st = GameState.instance()
+        """Queue a move to the habitat under ``pos``; False if no habitat is there."""
         for w, hid in self.dropzones:
             if w.collide_point(*pos):
-                if st.move_selected_to_habitat(hid):
-                    return True
+                def moved(ok: bool) -> None:
+                    if ok:
+                        show_toast("Moved to habitat")
+
+                self.app.run_command(GameState.instance().move_selected_to_habitat, hid, then=moved)
+                return True
         return False
 
     def refresh(self):
-        # Update capacity / occupants
-        st = GameState.instance()
+        st = self.app.view()
         for idx in (1, 2, 3):
-            cap = self.ids.get(f"hab_cap_{idx}")
-            occ = self.ids.get(f"hab_occ_{idx}")
-            if cap and occ and len(st.habitats) >= idx:
-                h = st.habitats[idx - 1]
-                cap.text = f"Lv {h.level} • Cap {len(h.occupants)}/{h.capacity}"
-                occ.text = ", ".join([st.get_by_id(i).name for i in h.occupants if st.get_by_id(i)])
+            self._update_card(st, idx)
+
+    def apply_events(self, events: List[ChangeEvent]) -> None:
+        topics = by_topic(events)
+        if ev.STATE_RESET in topics:
+            self.refresh()
+            return
+        changed = {e.key for e in topics.get(ev.HABITAT_CHANGED, ())}
+        if not changed:
+            return
+        st = self.app.view()
+        for idx, h in enumerate(st.habitats[:3], start=1):
+            if h.id in changed:
+                self._update_card(st, idx)
+
+    def _update_card(self, st, idx: int) -> None:
+        # Update capacity / occupants of one habitat card
+        cap = self.ids.get(f"hab_cap_{idx}")
+        occ = self.ids.get(f"hab_occ_{idx}")
+        if cap and occ and len(st.habitats) >= idx:
+            h = st.habitats[idx - 1]
+            cap.text = f"Lv {h.level} • Cap {len(h.occupants)}/{h.capacity}"
+            names = (st.get_by_id(i) for i in h.occupants)
+            occ.text = ", ".join([d.name for d in names if d])
 
     def on_upgrade(self, hid_idx: int):
-        st = GameState.instance()
+        st = self.app.view()
         if len(st.habitats) >= hid_idx:
             hid = st.habitats[hid_idx - 1].id
-            ok = st.upgrade_habitat(hid, Economy.COST_HABITAT_UPGRADE, Economy.UPGRADE_CAPACITY_DELTA)
-            if ok:
-                show_toast("Habitat upgraded!")
-            else:
-                show_toast("Not enough coins.")
+            self.app.run_command(
+                GameState.instance().upgrade_habitat, hid,
+                Economy.COST_HABITAT_UPGRADE, Economy.UPGRADE_CAPACITY_DELTA,
+                then=lambda ok: show_toast("Habitat upgraded!" if ok else "Not enough coins."),
+            )
 
 
 class BreedingScreen(BaseScreen):
     dad_choice = StringProperty("")
     mom_choice = StringProperty("")
     countdown_text = StringProperty("")
+    # Armadillo fields that decide who shows up in the pickers
+    PICKER_FIELDS = frozenset({"name", "sex", "is_adult"})
+
+    def __init__(self, name: str, app, **kwargs):
+        super().__init__(name, app, **kwargs)
+        self._queue_labels: List[Tuple[BreedingJob, Widget]] = []
 
     def refresh(self):
-        st = GameState.instance()
+        st = self.app.view()
+        self._update_pickers(st)
+        self._rebuild_queue(st)
+
+    def apply_events(self, events: List[ChangeEvent]) -> None:
+        topics = by_topic(events)
+        if ev.STATE_RESET in topics:
+            self.refresh()
+            return
+        st = self.app.view()
+        if ev.ARMADILLO_ADDED in topics or any(
+            e.fields & self.PICKER_FIELDS for e in topics.get(ev.ARMADILLO_UPDATED, ())
+        ):
+            self._update_pickers(st)
+        if ev.BREEDING_QUEUE_CHANGED in topics:
+            self._rebuild_queue(st)
+
+    def update_countdowns(self) -> None:
+        """Re-label the queued eggs in place (time passes without state events)."""
+        for job, lbl in self._queue_labels:
+            lbl.text = f"Egg {job.id[-4:]} • {job.remaining()}s"
+
+    def _update_pickers(self, st) -> None:
         # Populate pickers display text
-        dads = [a for a in st.adults() if a.sex == "M"]
-        moms = [a for a in st.adults() if a.sex == "F"]
+        dads = st.eligible_sires()
+        moms = st.eligible_dams()
         self.ids.get("dad_spinner").values = [f"{a.name} ({a.id})" for a in dads]
         self.ids.get("mom_spinner").values = [f"{a.name} ({a.id})" for a in moms]
-        # Queue list
+
+    def _rebuild_queue(self, st) -> None:
         qbox = self.ids.get("queue_box")
+        self._queue_labels = []
         if qbox:
             qbox.clear_widgets()
             for job in st.breeding_queue:
-                rem = job.remaining()
-                lbl = MDLabel(text=f"Egg {job.id[-4:]} • {rem}s")
+                lbl = MDLabel(text="")
                 qbox.add_widget(lbl)
+                self._queue_labels.append((job, lbl))
+            self.update_countdowns()
 
     def on_start_breeding(self):
-        st = GameState.instance()
         dad_id = self._parse_id(self.ids.get("dad_spinner").text)
         mom_id = self._parse_id(self.ids.get("mom_spinner").text)
         if not dad_id or not mom_id:
             show_toast("Pick a male and a female adult.")
             return
         duration = Economy.INCUBATION_MIN_S
-        job = st.start_breeding(dad_id, mom_id, duration)
-        if job:
-            show_toast("Incubation started!")
-        else:
-            show_toast("Invalid pair.")
+        self.app.run_command(
+            GameState.instance().start_breeding, dad_id, mom_id, duration,
+            then=lambda job: show_toast("Incubation started!" if job else "Invalid pair."),
+        )
 
     @staticmethod
     def _parse_id(text: str) -> Optional[str]:
@@ -398,26 +506,53 @@ class BreedingScreen(BaseScreen):
 
 
 class DexScreen(BaseScreen):
+    def __init__(self, name: str, app, **kwargs):
+        super().__init__(name, app, **kwargs)
+        self._colors: List[str] = []
+
     def refresh(self):
-        st = GameState.instance()
+        st = self.app.view()
         grid = self.ids.get("dex_grid")
+        self._colors = []
         if grid:
             grid.clear_widgets()
             for color in sorted(list(st.dex_colors)):
-                grid.add_widget(MDLabel(text=color, halign="center"))
+                self._add_color(grid, color)
+
+    def apply_events(self, events: List[ChangeEvent]) -> None:
+        topics = by_topic(events)
+        if ev.STATE_RESET in topics:
+            self.refresh()
+            return
+        grid = self.ids.get("dex_grid")
+        for e in topics.get(ev.DEX_ADDED, ()):
+            if grid and e.key is not None and e.key not in self._colors:
+                self._add_color(grid, e.key)
+
+    def _add_color(self, grid, color: str) -> None:
+        # Kivy lays children out in reverse, so index counts from the end
+        pos = bisect.bisect(self._colors, color)
+        self._colors.insert(pos, color)
+        grid.add_widget(MDLabel(text=color, halign="center"), index=len(self._colors) - 1 - pos)
 
 
 class ShopScreen(BaseScreen):
+    topics = (ev.INVENTORY_CHANGED,)
+
     def on_buy_food(self):
-        ok = GameState.instance().buy("food", Economy.COST_FOOD)
-        show_toast("Bought food!" if ok else "Not enough coins.")
+        self.app.run_command(
+            GameState.instance().buy, "food", Economy.COST_FOOD,
+            then=lambda ok: show_toast("Bought food!" if ok else "Not enough coins."),
+        )
 
     def on_buy_toy(self):
-        ok = GameState.instance().buy("toy", Economy.COST_TOY)
-        show_toast("Bought toy!" if ok else "Not enough coins.")
+        self.app.run_command(
+            GameState.instance().buy, "toy", Economy.COST_TOY,
+            then=lambda ok: show_toast("Bought toy!" if ok else "Not enough coins."),
+        )
 
     def refresh(self):
-        st = GameState.instance()
+        st = self.app.view()
         inv = self.ids.get("shop_inv")
         if inv:
-            inv.text = f"Food: {st.inventory.get('food',0)} • Toys: {st.inventory.get('toy',0)}"
+            inv.text = _inventory_text(st)